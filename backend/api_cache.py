@@ -0,0 +1,114 @@
+"""
+接口响应缓存
+缓存序列化后的JSON响应，按数据版本号（每次数据更新提交时递增）整体失效，支持ETag
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+
+class CachedResponse:
+    """一条缓存的响应"""
+    
+    __slots__ = ('body', 'etag', 'generation', 'headers')
+    
+    def __init__(self, body: bytes, generation: int, headers: Dict[str, str] = None):
+        self.body = body
+        self.generation = generation
+        self.headers = headers or {}
+        self.etag = f'"{generation}-{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+class ApiResponseCache:
+    """带LRU淘汰和版本号失效的内存响应缓存"""
+    
+    def __init__(self, generation_source: Callable[[], Awaitable[int]], max_entries: int = 2048,
+                 check_interval: float = 5.0):
+        """
+        初始化缓存
+        
+        Args:
+            generation_source: 读取当前数据版本号的协程函数（不能阻塞事件循环）
+            max_entries: 最大缓存条数，超出时淘汰最久未使用的条目
+            check_interval: 重新读取数据版本号的最小间隔（秒），用于发现其他进程的更新
+        """
+        self.generation_source = generation_source
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+    
+    @property
+    def generation(self) -> Optional[int]:
+        """最近一次读取的数据版本号"""
+        return self._generation
+    
+    async def refresh(self) -> int:
+        """
+        距上次读取超过 check_interval 时重新读取数据版本号，版本号变化时清空缓存
+        
+        Returns:
+            当前数据版本号
+        """
+        now = time.monotonic()
+        if self._generation is None or now - self._checked_at >= self.check_interval:
+            # 先记下读取时间，并发请求不会同时去读
+            self._checked_at = now
+            generation = await self.generation_source()
+            with self._lock:
+                if generation != self._generation:
+                    self._entries.clear()
+                    self._generation = generation
+        return self._generation
+    
+    def invalidate(self):
+        """立即重新读取数据版本号（本进程完成数据更新后调用）"""
+        self._checked_at = 0.0
+    
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        """读取缓存，未命中时返回None（调用前先 await refresh()）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.generation != self._generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: Hashable, body: bytes, generation: int, headers: Dict[str, str] = None) -> CachedResponse:
+        """
+        写入缓存
+        
+        Args:
+            generation: 生成响应前读取的数据版本号，已过期的结果不会写入
+            headers: 随响应返回的额外响应头（如分页游标）
+        """
+        entry = CachedResponse(body, generation, headers)
+        with self._lock:
+            if generation != self._generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+    
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'entries': len(self._entries),
+            'generation': self._generation
+        }
@@ -0,0 +1,210 @@
+"""
+本地日线行情存储
+按字段保存全市场 (交易日 × 股票) 矩阵的二进制文件，通过内存映射零拷贝读取，新交易日追加写入
+"""
+
+import bisect
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ['open', 'high', 'low', 'close', 'vol', 'amount']
+VALUATION_FIELDS = ['pe_ttm', 'pb']
+DTYPE = np.float32
+
+# 股票列预留容量，新上市股票在容量范围内时无需重写文件
+CAPACITY_STEP = 512
+
+logger = logging.getLogger(__name__)
+
+
+def _round_capacity(n_codes: int) -> int:
+    return (n_codes // CAPACITY_STEP + 1) * CAPACITY_STEP
+
+
+class DailyBarStore:
+    """全市场日线行情存储"""
+    
+    def __init__(self, root: str, fields: List[str] = None):
+        """
+        初始化存储
+        
+        Args:
+            root: 存储目录，每个字段一个文件，另有 meta.json 记录交易日和股票代码
+            fields: 存储的字段，默认为日线行情字段 FIELDS
+        """
+        self.root = root
+        self.fields = list(fields or FIELDS)
+        os.makedirs(root, exist_ok=True)
+        self._load_meta()
+    
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.root, 'meta.json')
+    
+    def _field_path(self, field: str) -> str:
+        return os.path.join(self.root, f'{field}.f32')
+    
+    def _load_meta(self):
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        else:
+            meta = {'dates': [], 'codes': [], 'capacity': CAPACITY_STEP}
+        
+        self.dates: List[str] = meta['dates']
+        self.codes: List[str] = meta['codes']
+        self.capacity: int = meta['capacity']
+        self._code_index: Dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+        self._meta_mtime = os.path.getmtime(self._meta_path) if os.path.exists(self._meta_path) else None
+    
+    def _save_meta(self):
+        # 先写临时文件再替换，读取方只会看到完整的元数据
+        tmp_path = self._meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'dates': self.dates, 'codes': self.codes, 'capacity': self.capacity}, f)
+        os.replace(tmp_path, self._meta_path)
+        self._meta_mtime = os.path.getmtime(self._meta_path)
+    
+    def refresh(self):
+        """其他进程追加数据后重新读取元数据"""
+        mtime = os.path.getmtime(self._meta_path) if os.path.exists(self._meta_path) else None
+        if mtime != self._meta_mtime:
+            self._load_meta()
+    
+    def _open(self, field: str, mode: str = 'r') -> np.ndarray:
+        """以内存映射方式打开字段矩阵（交易日 × 容量）"""
+        shape = (len(self.dates), self.capacity)
+        if not self.dates:
+            return np.full(shape, np.nan, dtype=DTYPE)
+        return np.memmap(self._field_path(field), dtype=DTYPE, mode=mode, shape=shape)
+    
+    def read(self, field: str, start_date: str = None, end_date: str = None) -> Tuple[List[str], List[str], np.ndarray]:
+        """
+        读取字段矩阵（零拷贝）
+        
+        Args:
+            field: 字段名，如 close
+            start_date: 起始交易日（含），YYYYMMDD
+            end_date: 结束交易日（含），YYYYMMDD
+        
+        Returns:
+            (交易日列表, 股票代码列表, 交易日 × 股票 的只读矩阵视图)，缺失值为 NaN
+        """
+        if field not in self.fields:
+            raise ValueError(f"未知字段: {field}")
+        
+        self.refresh()
+        lo = bisect.bisect_left(self.dates, start_date) if start_date else 0
+        hi = bisect.bisect_right(self.dates, end_date) if end_date else len(self.dates)
+        matrix = self._open(field)[lo:hi, :len(self.codes)]
+        return self.dates[lo:hi], list(self.codes), matrix
+    
+    def read_frame(self, field: str, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        """读取字段矩阵为 DataFrame（行为交易日，列为股票代码）"""
+        dates, codes, matrix = self.read(field, start_date, end_date)
+        return pd.DataFrame(np.asarray(matrix), index=dates, columns=codes)
+    
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        写入日线数据，新交易日追加到文件末尾，已有交易日原地覆盖
+        
+        Args:
+            df: 包含 ts_code、trade_date 及行情字段的 DataFrame（可包含多个交易日）
+        
+        Returns:
+            写入的交易日数量
+        """
+        if df is None or df.empty:
+            return 0
+        
+        df = df.dropna(subset=['ts_code', 'trade_date']).copy()
+        df['trade_date'] = df['trade_date'].astype(str)
+        incoming_dates = sorted(df['trade_date'].unique())
+        
+        new_codes = [code for code in df['ts_code'].unique() if code not in self._code_index]
+        last_date = self.dates[-1] if self.dates else ''
+        existing = set(self.dates)
+        backfill = any(date not in existing and date < last_date for date in incoming_dates)
+        
+        if backfill or len(self.codes) + len(new_codes) > self.capacity:
+            self._rewrite(df, new_codes)
+            return len(incoming_dates)
+        
+        for code in new_codes:
+            self._code_index[code] = len(self.codes)
+            self.codes.append(code)
+        
+        # 截掉上次写入中断时残留在文件末尾、未记入元数据的数据
+        expected_size = len(self.dates) * self.capacity * np.dtype(DTYPE).itemsize
+        for field in self.fields:
+            path = self._field_path(field)
+            if os.path.exists(path) and os.path.getsize(path) > expected_size:
+                os.truncate(path, expected_size)
+        
+        columns = df['ts_code'].map(self._code_index).to_numpy()
+        date_groups = df.groupby('trade_date').indices
+        
+        # 已有交易日：原地覆盖
+        overwrite = [date for date in incoming_dates if date in existing]
+        if overwrite:
+            for field in self.fields:
+                matrix = self._open(field, mode='r+')
+                for date in overwrite:
+                    rows = date_groups[date]
+                    matrix[self.dates.index(date), columns[rows]] = df[field].to_numpy(dtype=DTYPE)[rows]
+                matrix.flush()
+                del matrix
+        
+        # 新交易日：按日期顺序追加到文件末尾
+        appended = [date for date in incoming_dates if date not in existing]
+        for field in self.fields:
+            values = df[field].to_numpy(dtype=DTYPE)
+            with open(self._field_path(field), 'ab') as f:
+                for date in appended:
+                    rows = date_groups[date]
+                    row = np.full(self.capacity, np.nan, dtype=DTYPE)
+                    row[columns[rows]] = values[rows]
+                    row.tofile(f)
+        
+        self.dates.extend(appended)
+        self._save_meta()
+        return len(incoming_dates)
+    
+    def _rewrite(self, df: pd.DataFrame, new_codes: List[str]):
+        """补写历史交易日或股票数超出容量时重写全部文件"""
+        codes = self.codes + new_codes
+        code_index = {code: i for i, code in enumerate(codes)}
+        dates = sorted(set(self.dates) | set(df['trade_date']))
+        date_index = {date: i for i, date in enumerate(dates)}
+        capacity = max(self.capacity, _round_capacity(len(codes)))
+        
+        old_rows = np.array([date_index[date] for date in self.dates], dtype=int)
+        rows = df['trade_date'].map(date_index).to_numpy()
+        columns = df['ts_code'].map(code_index).to_numpy()
+        
+        for field in self.fields:
+            matrix = np.full((len(dates), capacity), np.nan, dtype=DTYPE)
+            if self.dates:
+                matrix[old_rows, :len(self.codes)] = self._open(field)[:, :len(self.codes)]
+            matrix[rows, columns] = df[field].to_numpy(dtype=DTYPE)
+            
+            tmp_path = self._field_path(field) + '.tmp'
+            matrix.tofile(tmp_path)
+            os.replace(tmp_path, self._field_path(field))
+        
+        self.dates = dates
+        self.codes = codes
+        self.capacity = capacity
+        self._code_index = code_index
+        self._save_meta()
+        logger.info(f"行情存储已重写: {len(dates)} 个交易日, {len(codes)} 只股票")
+    
+    def last_date(self) -> Optional[str]:
+        """最新交易日"""
+        self.refresh()
+        return self.dates[-1] if self.dates else None
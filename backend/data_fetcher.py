@@ -2,35 +2,65 @@ import requests
 import pandas as pd
 import time
 import random
+import hashlib
+import json
 from datetime import datetime, timedelta
 import sqlite3
 import logging
 
+from bar_store import VALUATION_FIELDS, DailyBarStore
+from database import (bump_data_generation, connect, load_latest_scores, load_score_inputs, load_stock_prices,
+                      refresh_latest_score, save_score_inputs)
+from indicators import load_timing_signals
+from ranking import refresh_score_ranks
+from response_cache import create_default_cache
+from score_memo import create_default_memo, ruleset_version
+from tushare_client import recent_report_periods
+
+try:
+    from tushare_config import BATCH_SIZE
+except ImportError:
+    BATCH_SIZE = 100
+
+try:
+    from tushare_config import BAR_STORE_PATH, VALUATION_STORE_PATH
+except ImportError:
+    BAR_STORE_PATH = "bar_store"
+    VALUATION_STORE_PATH = "valuation_store"
+
 # Tushare基础接口配置
 TUSHARE_API_TOKEN = "你的Tushare Token"  # 需要到tushare.pro注册获取
 TUSHARE_API_URL = "http://api.tushare.pro"
 
 class TushareDataFetcher:
-    def __init__(self, token=None):
+    def __init__(self, token=None, cache=None):
         self.token = token or TUSHARE_API_TOKEN
+        self.cache = cache or create_default_cache()
         self.session = requests.Session()
         self.session.headers.update({
             'Content-Type': 'application/json',
             'User-Agent': 'StockScoringApp/1.0'
         })
-        
-    def _api_request(self, api_name, params=None):
+    
+    def _api_request(self, api_name, params=None, fields=None):
         """Tushare API请求"""
         if not self.token or self.token == "你的Tushare Token":
             # 如果没有配置Token，返回模拟数据
             return self._get_mock_data(api_name, params)
-            
+        
+        if self.cache is not None:
+            cached = self.cache.get(api_name, params, fields)
+            if cached is not None:
+                return cached['items']
+        
         try:
             payload = {
                 'api_name': api_name,
                 'token': self.token,
                 'params': params or {}
             }
+            if fields:
+                payload['fields'] = fields
             
             response = self.session.post(TUSHARE_API_URL, json=payload)
             response.raise_for_status()
@@ -39,9 +69,16 @@ class TushareDataFetcher:
             if data.get('code') != 0:
                 logging.warning(f"Tushare API返回错误: {data.get('msg')}")
                 return self._get_mock_data(api_name, params)
-                
-            return data.get('data', {}).get('items', [])
             
+            items = data.get('data', {}).get('items', [])
+            if self.cache is not None and items:
+                self.cache.set(api_name, params, fields, {
+                    'fields': data.get('data', {}).get('fields', []),
+                    'items': items
+                })
+            
+            return items
+        
         except Exception as e:
             logging.error(f"Tushare API请求失败: {e}")
             return self._get_mock_data(api_name, params)
@@ -63,13 +100,14 @@ class TushareDataFetcher:
             ]
         
         elif api_name == 'daily':
-            # 模拟日线数据
+            # 模拟日线数据（按股票代码固定取值，同一股票每次得到相同的行情）
             ts_code = params.get('ts_code', '000001.SZ')
-            base_price = random.uniform(10, 50)
+            rng = random.Random(ts_code)
+            base_price = rng.uniform(10, 50)
             return [
-                [ts_code, '20240923', base_price * random.uniform(0.98, 1.02), 
-                 base_price * random.uniform(0.98, 1.02), base_price * random.uniform(0.98, 1.02),
-                 base_price * random.uniform(0.98, 1.02), random.randint(100000, 1000000)]
+                [ts_code, '20240923', base_price * rng.uniform(0.98, 1.02), 
+                 base_price * rng.uniform(0.98, 1.02), base_price * rng.uniform(0.98, 1.02),
+                 base_price * rng.uniform(0.98, 1.02), rng.randint(100000, 1000000)]
             ]
         
         elif api_name == 'fina_indicator':
@@ -82,7 +120,7 @@ class TushareDataFetcher:
         return []
     
     def get_stock_list(self):
-        """获取股票列表"""
+        """获取股票列表（current_price 为None，由行情快照或已保存的价格补全）"""
         data = self._api_request('stock_basic')
         stocks = []
         
@@ -98,13 +136,13 @@ class TushareDataFetcher:
                     'name': name,
                     'industry': industry,
                     'list_date': list_date,
-                    'current_price': random.uniform(10, 200)
+                    'current_price': None
                 })
         
         return stocks
     
     def get_stock_price(self, ts_code):
-        """获取股票价格"""
+        """获取股票价格，没有行情数据时返回None"""
         data = self._api_request('daily', {
             'ts_code': ts_code,
             'limit': 1
@@ -113,7 +151,7 @@ class TushareDataFetcher:
         if data and len(data) > 0 and len(data[0]) >= 6:
             return float(data[0][5])  # 收盘价
         
-        return random.uniform(10, 200)
+        return None
     
     def get_financial_indicators(self, ts_code):
         """获取财务指标"""
@@ -135,10 +173,98 @@ class TushareDataFetcher:
                 }
         
         return indicators
+    
+    def get_market_snapshot(self, lookback_days=10, periods=2):
+        """
+        按交易日/报告期获取全市场最新行情和财务指标
+        
+        Returns:
+            以6位股票代码为键的字典，包含 trade_date、close、end_date、financials
+        """
+        snapshot = {}
+        
+        # 最近一个交易日的全市场收盘价
+        today = datetime.now()
+        for offset in range(lookback_days):
+            trade_date = (today - timedelta(days=offset)).strftime('%Y%m%d')
+            data = self._api_request('daily', {'trade_date': trade_date}, fields='ts_code,trade_date,close')
+            if data:
+                for item in data:
+                    snapshot.setdefault(item[0][:6], {}).update({
+                        'trade_date': str(item[1]),
+                        'close': float(item[2])
+                    })
+                break
+        
+        # 最近几个报告期的全市场财务指标，每只股票保留最新一期
+        fields = 'ts_code,end_date,roe,netprofit_ratio,grossprofit_ratio,debt_to_assets,current_ratio,quick_ratio'
+        for period in recent_report_periods(periods):
+            data = self._api_request('fina_indicator_vip', {'period': period}, fields=fields)
+            for item in data or []:
+                if len(item) < 8:
+                    continue
+                entry = snapshot.setdefault(item[0][:6], {})
+                if 'end_date' in entry:
+                    continue
+                entry['end_date'] = str(item[1])
+                entry['financials'] = {
+                    name: float(value) if value else 0
+                    for name, value in zip(fields.split(',')[2:], item[2:8])
+                }
+        
+        return snapshot
+
+# StockScorer 评分逻辑的版本，修改评分规则时加一，评分记忆表中旧版本的得分随之淘汰
+SCORER_VERSION = 1
+
+SCORE_DIMENSIONS = ['industry', 'competitiveness', 'growth', 'timing']
+
+def listed_years(stock):
+    """上市年数"""
+    return (datetime.now() - datetime.strptime(str(stock['list_date']), '%Y%m%d')).days / 365
+
+# StockScorer 评分用到的输入，增量更新时据此判断股票是否需要重新评分
+SCORE_INPUT_STOCK_FIELDS = ['name', 'industry', 'list_date', 'current_price']
+SCORE_INPUT_FINANCIAL_FIELDS = ['roe', 'netprofit_ratio', 'grossprofit_ratio', 'debt_to_assets']
+SCORE_INPUT_SIGNAL_FIELDS = ['technical_trend', 'valuation_level', 'valuation_percentile', 'rsi']
+
+def score_input_hash(stock, financials, signals=None):
+    """
+    一只股票评分输入（股票信息、价格、财务指标、时机信号）的指纹
+    
+    行业得分随上市年数变化，整年数也计入指纹；
+    财务数据未批量获取（评分时才逐只请求）时无法判断是否变化，返回None
+    """
+    if financials is None:
+        return None
+    signals = signals or {}
+    inputs = [
+        [stock.get(name) for name in SCORE_INPUT_STOCK_FIELDS],
+        [int(listed_years(stock)) if stock.get('list_date') else None],
+        [financials.get(name) for name in SCORE_INPUT_FINANCIAL_FIELDS],
+        [signals.get(name) for name in SCORE_INPUT_SIGNAL_FIELDS],
+    ]
+    raw = json.dumps(inputs, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
 
 class StockScorer:
-    def __init__(self, data_fetcher):
+    def __init__(self, data_fetcher, deterministic=True):
+        """
+        Args:
+            data_fetcher: 数据获取器
+            deterministic: 确定性模式，不在维度得分上叠加随机扰动，相同输入总是得到相同评分
+        """
         self.data_fetcher = data_fetcher
+        self.deterministic = deterministic
+    
+    @property
+    def ruleset(self):
+        """评分规则版本号，用作评分记忆表的版本"""
+        return ruleset_version('StockScorer', SCORER_VERSION)
+    
+    def _noise(self, spread):
+        """随机扰动，确定性模式下为0"""
+        return 0 if self.deterministic else random.uniform(-spread, spread)
     
     def calculate_industry_score(self, stock):
         """计算行业维度得分"""
@@ -157,13 +283,13 @@ class StockScorer:
         base_score = industry_scores.get(stock['industry'], 70)
         
         # 根据上市时间调整
-        list_years = (datetime.now() - datetime.strptime(str(stock['list_date']), '%Y%m%d')).days / 365
+        list_years = listed_years(stock)
         if list_years > 10:
             base_score += 5
         elif list_years < 3:
             base_score -= 5
         
-        return min(100, max(0, base_score + random.uniform(-5, 5)))
+        return min(100, max(0, base_score + self._noise(5)))
     
     def calculate_competitiveness_score(self, stock, financials):
         """计算企业竞争力得分"""
@@ -194,7 +320,7 @@ class StockScorer:
         elif debt_ratio > 0.7:
             score -= 10
         
-        return min(100, max(0, score + random.uniform(-10, 10)))
+        return min(100, max(0, score + self._noise(10)))
     
     def calculate_growth_score(self, stock, financials):
         """计算成长潜力得分"""
@@ -212,37 +338,70 @@ class StockScorer:
         if financials.get('grossprofit_ratio', 0) > 0.3:
             score += 10
         
-        return min(100, max(0, score + random.uniform(-8, 8)))
+        return min(100, max(0, score + self._noise(8)))
     
-    def calculate_timing_score(self, stock):
-        """计算时机维度得分"""
-        score = 70
+    def calculate_timing_score(self, stock, signals=None):
+        """
+        计算时机维度得分
         
-        # 根据价格区间调整
-        price = stock.get('current_price', 50)
-        if price < 20:
-            score += 10  # 低价股有上涨空间
-        elif price > 100:
-            score -= 5   # 高价股风险较大
+        Args:
+            stock: 股票信息
+            signals: 该股票的时机信号（technical_trend、valuation_level、rsi），
+                     由 indicators.load_timing_signals 批量计算；为None时按价格区间估算
+        """
+        score = 70
         
         # 行业周期调整
         cyclical_industries = ['房地产', '银行', '汽车']
         if stock['industry'] in cyclical_industries:
             score -= 5
         
-        return min(100, max(0, score + random.uniform(-10, 10)))
+        if signals is not None:
+            # 技术趋势（均线/MACD）
+            score += {'up': 15, 'down': -15}.get(signals.get('technical_trend'), 0)
+            
+            # 估值水平（PE/PB百分位）
+            score += {'low': 10, 'high': -10}.get(signals.get('valuation_level'), 0)
+            
+            # RSI超买超卖
+            rsi = signals.get('rsi')
+            if rsi is not None and rsi > 80:
+                score -= 5
+            elif rsi is not None and rsi < 20:
+                score += 5
+            
+            return min(100, max(0, score))
+        
+        # 根据价格区间调整（没有价格时不调整）
+        price = stock.get('current_price')
+        if price is not None and price < 20:
+            score += 10  # 低价股有上涨空间
+        elif price is not None and price > 100:
+            score -= 5   # 高价股风险较大
+        
+        return min(100, max(0, score + self._noise(10)))
     
-    def calculate_total_score(self, stock):
+    def calculate_total_score(self, stock, financials=None, signals=None):
         """计算总分"""
-        # 获取财务数据
-        ts_code = f"{stock['code']}.{'SH' if stock['code'].startswith('6') else 'SZ'}"
-        financials = self.data_fetcher.get_financial_indicators(ts_code)
+        # 获取财务数据（未提供批量获取的数据时逐只请求）
+        if financials is None:
+            ts_code = f"{stock['code']}.{'SH' if stock['code'].startswith('6') else 'SZ'}"
+            financials = self.data_fetcher.get_financial_indicators(ts_code)
         
         # 计算各维度得分
-        industry_score = self.calculate_industry_score(stock)
-        competitiveness_score = self.calculate_competitiveness_score(stock, financials)
-        growth_score = self.calculate_growth_score(stock, financials)
-        timing_score = self.calculate_timing_score(stock)
+        return self.build_score_result(stock, {
+            'industry': self.calculate_industry_score(stock),
+            'competitiveness': self.calculate_competitiveness_score(stock, financials),
+            'growth': self.calculate_growth_score(stock, financials),
+            'timing': self.calculate_timing_score(stock, signals)
+        })
+    
+    def build_score_result(self, stock, dimension_scores):
+        """由四个维度得分计算总分和潜力等级，生成评分结果"""
+        industry_score = dimension_scores['industry']
+        competitiveness_score = dimension_scores['competitiveness']
+        growth_score = dimension_scores['growth']
+        timing_score = dimension_scores['timing']
         
         # 计算总分
         total_score = (
@@ -276,8 +435,245 @@ class StockScorer:
             'score_date': datetime.now().strftime("%Y-%m-%d")
         }
 
-def update_database_with_real_data():
-    """使用真实数据更新数据库"""
+# 评分明细模板：(指标代码, 指标名称, 维度, 指标值, 文本值, 相对维度得分的系数, 满分, 权重)
+SCORE_DETAIL_TEMPLATE = [
+    ("IND001", "行业生命周期阶段", "industry", None, "成长期", 1.0, 100, 0.15),
+    ("IND002", "行业市场规模增速", "industry", 15.2, None, 0.9, 100, 0.10),
+    ("IND003", "行业集中度", "industry", None, "高集中度", 0.85, 100, 0.05),
+    ("IND004", "市场份额", "competitiveness", 12.5, None, 0.95, 100, 0.15),
+    ("IND005", "营收增速", "competitiveness", 18.6, None, 0.9, 100, 0.10),
+    ("IND006", "净利润率", "competitiveness", 15.8, None, 0.85, 100, 0.08),
+    ("IND007", "净资产收益率", "competitiveness", 22.3, None, 0.9, 100, 0.07),
+    ("IND008", "未来3年预期增速", "growth", 25.4, None, 0.95, 100, 0.12),
+    ("IND009", "研发投入强度", "growth", 8.5, None, 0.9, 100, 0.05),
+    ("IND010", "估值水平", "timing", None, None, 0.9, 100, 0.06),
+    ("IND011", "市场情绪", "timing", None, None, 0.95, 100, 0.04),
+    ("IND012", "技术趋势", "timing", None, None, 0.9, 100, 0.03)
+]
+
+TREND_LABELS = {'up': '上升', 'sideways': '震荡', 'down': '下降'}
+VALUATION_LABELS = {'low': '低估', 'medium': '合理', 'high': '高估'}
+NO_SIGNAL_TEXT = '数据不足'
+
+def _rsi_label(rsi):
+    """RSI 作为市场情绪：与 calculate_timing_score 相同的超买超卖阈值"""
+    if rsi is None:
+        return None
+    if rsi > 80:
+        return '超买'
+    if rsi < 20:
+        return '超卖'
+    return '中性'
+
+# 时机维度明细的 (指标值, 文本值)，取自该股票的时机信号
+TIMING_DETAILS = {
+    'IND010': lambda s: (
+        None if s.get('valuation_percentile') is None else round(s['valuation_percentile'] * 100, 1),
+        VALUATION_LABELS.get(s.get('valuation_level'))
+    ),
+    'IND011': lambda s: (s.get('rsi'), _rsi_label(s.get('rsi'))),
+    'IND012': lambda s: (None, TREND_LABELS.get(s.get('technical_trend'))),
+}
+
+def build_score_details(score_result, signals=None, deterministic=True):
+    """
+    根据维度得分生成评分明细行（确定性模式下不加随机扰动）
+    
+    时机维度的估值水平、市场情绪、技术趋势按该股票的时机信号（_signal_records 的记录）填写，
+    没有信号时文本值为“数据不足”
+    """
+    rows = []
+    for ind_code, ind_name, dimension, value, value_text, factor, max_score, weight in SCORE_DETAIL_TEMPLATE:
+        if ind_code in TIMING_DETAILS:
+            value, value_text = TIMING_DETAILS[ind_code](signals or {})
+            value_text = value_text or NO_SIGNAL_TEXT
+        base_score = score_result[f'{dimension}_score'] * factor
+        score_variation = 0 if deterministic else random.uniform(-5, 5)
+        final_score = max(0, min(100, base_score + score_variation))
+        rows.append((score_result['stock_code'], ind_code, ind_name, dimension, value, value_text,
+                     final_score, max_score, weight))
+    return rows
+
+def _signal_records(signals):
+    """信号 DataFrame 转为 {股票代码: 信号字典}，NaN 转为 None"""
+    if signals is None or signals.empty:
+        return {}
+    signals = signals.reindex(columns=SCORE_INPUT_SIGNAL_FIELDS).astype(object)
+    signals = signals.where(signals.notna(), None)
+    return signals.to_dict(orient='index')
+
+def score_stocks(scorer, stocks, logger, market=None, signals=None, progress=None, score_inputs=None, memo=None):
+    """
+    评分阶段：逐只股票计算评分（不持有数据库事务）
+    
+    StockScorer 每只股票只有几次比较运算，全市场在当前进程内评分即可；
+    启动进程池和序列化输入的开销比评分本身还大
+    
+    Args:
+        market: 批量获取的全市场行情和财务指标
+        signals: 全市场时机信号 DataFrame（以6位股票代码为索引）
+        progress: 进度对象（UpdateJob），每评完一只股票调用 advance，任务取消时中止
+        score_inputs: 每只股票的 (交易日, 报告期, 输入指纹)，与 memo 一起使用
+        memo: 评分记忆表（score_memo.ScoreMemo），输入指纹与上次相同的股票直接复用四个维度得分
+    """
+    market = market or {}
+    timing = _signal_records(signals)
+    score_inputs = score_inputs or {}
+    score_results = []
+    
+    financials = [market.get(stock['code'], {}).get('financials') for stock in stocks]
+    for stock, stock_financials in zip(stocks, financials):
+        logger.info(f"处理股票: {stock['name']} ({stock['code']})")
+        input_hash = score_inputs.get(stock['code'], (None, None, None))[2] if memo is not None else None
+        if input_hash is not None:
+            dimension_scores = {
+                dimension: memo.get_dimension(stock['code'], dimension, input_hash) for dimension in SCORE_DIMENSIONS
+            }
+            if None not in dimension_scores.values():
+                score_results.append(scorer.build_score_result(stock, dimension_scores))
+                if progress is not None:
+                    progress.advance()
+                continue
+        
+        result = scorer.calculate_total_score(stock, stock_financials, timing.get(stock['code']))
+        if input_hash is not None:
+            for dimension in SCORE_DIMENSIONS:
+                memo.put_dimension(stock['code'], dimension, input_hash, result[f'{dimension}_score'])
+        score_results.append(result)
+        if progress is not None:
+            progress.advance()
+        
+        # 逐只请求财务数据时避免请求过于频繁
+        if stock_financials is None:
+            time.sleep(0.1)
+    
+    return score_results
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def _dimension_scores(r):
+    return (r['industry_score'], r['competitiveness_score'], r['growth_score'], r['timing_score'])
+
+def _inputs_changed(code, score_inputs, previous_inputs):
+    input_hash = score_inputs.get(code, (None, None, None))[2]
+    return input_hash is None or previous_inputs.get(code) != input_hash
+
+def write_scores(conn, stocks, score_results, score_inputs=None, batch_size=None, deterministic=True, progress=None,
+                 signals=None):
+    """
+    写入阶段：在一个短事务内按批次写入股票信息、评分结果和评分明细
+    
+    确定性评分下，与最新一期完全相同的评分结果不重写；维度得分和评分输入指纹都未变的股票不重写评分明细
+    
+    Args:
+        conn: 数据库连接
+        stocks: 股票列表
+        score_results: 与 stocks 一一对应的评分结果
+        score_inputs: 每只股票评分所用的 (交易日, 报告期, 输入指纹)，用于增量更新
+        batch_size: 每批 executemany 的股票数，默认使用配置中的 BATCH_SIZE
+        deterministic: 评分是否为确定性的（否则每次都全部重写）
+        progress: 进度对象（UpdateJob），按写入的评分结果计数，任务取消时回滚
+        signals: {股票代码: 时机信号记录}，用于填写时机维度的评分明细
+    """
+    batch_size = batch_size or BATCH_SIZE
+    
+    stock_rows = [
+        (stock['code'], stock['name'], stock['industry'], stock['current_price'],
+         None if stock['current_price'] is None else stock['current_price'] * 1000)  # 简化的市值计算
+        for stock in stocks
+    ]
+    
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    
+    signals = signals or {}
+    previous = load_latest_scores(conn) if deterministic else {}
+    changed_results = [
+        r for r in score_results
+        if previous.get(r['stock_code']) != (r['score_date'], r['current_price'], r['total_score']) + _dimension_scores(r)
+    ]
+    # 明细的文本值来自时机信号，信号变化而得分不变时也要重写
+    previous_inputs = load_score_inputs(conn) if deterministic and score_inputs is not None else {}
+    detail_results = [
+        r for r in score_results
+        if previous.get(r['stock_code'], ())[3:] != _dimension_scores(r)
+        or (score_inputs is not None and _inputs_changed(r['stock_code'], score_inputs, previous_inputs))
+    ]
+    
+    score_rows = [
+        (r['stock_code'], r['stock_name'], r['industry'], r['current_price'],
+         r['total_score'], r['industry_score'], r['competitiveness_score'],
+         r['growth_score'], r['timing_score'], r['potential_level'], r['score_date'])
+        for r in changed_results
+    ]
+    detail_rows = [
+        row for r in detail_results
+        for row in build_score_details(r, signals.get(r['stock_code']), deterministic)
+    ]
+    if progress is not None:
+        progress.begin('write', len(score_rows))
+    
+    for batch in _chunks(stock_rows, batch_size):
+        cursor.executemany('''
+            INSERT OR REPLACE INTO stock_info (code, name, industry, current_price, market_cap)
+            VALUES (?, ?, ?, ?, ?)
+        ''', batch)
+    
+    for batch in _chunks(score_rows, batch_size):
+        cursor.executemany('''
+            INSERT OR REPLACE INTO score_result 
+            (stock_code, stock_name, industry, current_price, total_score, 
+             industry_score, competitiveness_score, growth_score, timing_score, 
+             potential_level, score_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+        if progress is not None:
+            progress.advance(len(batch))
+    
+    # 清除旧的评分明细
+    for batch in _chunks([(r['stock_code'],) for r in detail_results], batch_size):
+        cursor.executemany('DELETE FROM score_details WHERE stock_code = ?', batch)
+    
+    # 插入新的评分明细
+    for batch in _chunks(detail_rows, batch_size * len(SCORE_DETAIL_TEMPLATE)):
+        cursor.executemany('''
+            INSERT INTO score_details
+            (stock_code, code, name, dimension, value, value_text, score, max_score, weight)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+    
+    # 记录评分输入的版本
+    if score_inputs is not None:
+        save_score_inputs(conn, [
+            (stock['code'],) + score_inputs.get(stock['code'], (None, None, None))
+            for stock in stocks
+        ])
+    
+    # 刷新最新评分表（只看本次写入的评分日期）和截面排名
+    for score_date in sorted({r['score_date'] for r in changed_results}):
+        refresh_latest_score(conn, score_date)
+    refresh_score_ranks(conn)
+    bump_data_generation(conn)
+    
+    conn.commit()
+    logging.getLogger(__name__).info(
+        f"写入 {len(score_rows)} 条评分结果（{len(score_results) - len(score_rows)} 条未变化跳过），"
+        f"{len(detail_results)} 只股票的评分明细"
+    )
+
+def update_database_with_real_data(incremental=False, progress=None):
+    """
+    使用真实数据更新数据库
+    
+    Args:
+        incremental: 增量模式，只重新评分评分输入（价格、财务指标、时机信号等）有变化的股票
+        progress: 进度对象（UpdateJob），按获取、评分、写入阶段报告进度；任务取消时中止并回滚
+    
+    Raises:
+        更新失败（或被取消）时回滚后重新抛出异常
+    """
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
     
@@ -286,99 +682,68 @@ def update_database_with_real_data():
     scorer = StockScorer(fetcher)
     
     # 连接数据库
-    conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
-    cursor = conn.cursor()
+    conn = connect()
     
     try:
-        # 获取股票列表
+        # 获取阶段：获取股票列表
+        if progress is not None:
+            progress.begin('fetch')
         logger.info("获取股票列表...")
         stocks = fetcher.get_stock_list()
         
+        # 批量获取全市场最新行情和财务指标
+        market = fetcher.get_market_snapshot()
+        
+        # 从本地行情存储批量计算全市场时机信号（均线、MACD、RSI、估值百分位）
+        signals = load_timing_signals(
+            DailyBarStore(BAR_STORE_PATH),
+            DailyBarStore(VALUATION_STORE_PATH, fields=VALUATION_FIELDS)
+        )
+        timing = _signal_records(signals)
+        
+        # 没有最新收盘价（停牌、行情缺失）的股票沿用已保存的价格
+        stored_prices = load_stock_prices(conn)
+        score_inputs = {}
         for stock in stocks:
-            logger.info(f"处理股票: {stock['name']} ({stock['code']})")
-            
-            # 计算评分
-            score_result = scorer.calculate_total_score(stock)
-            
-            # 插入股票基本信息
-            cursor.execute('''
-                INSERT OR REPLACE INTO stock_info (code, name, industry, current_price, market_cap)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                stock['code'], stock['name'], stock['industry'], 
-                stock['current_price'], stock['current_price'] * 1000  # 简化的市值计算
-            ))
-            
-            # 插入评分结果
-            cursor.execute('''
-                INSERT OR REPLACE INTO score_result 
-                (stock_code, stock_name, industry, current_price, total_score, 
-                 industry_score, competitiveness_score, growth_score, timing_score, 
-                 potential_level, score_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                score_result['stock_code'], score_result['stock_name'], 
-                score_result['industry'], score_result['current_price'],
-                score_result['total_score'], score_result['industry_score'],
-                score_result['competitiveness_score'], score_result['growth_score'],
-                score_result['timing_score'], score_result['potential_level'],
-                score_result['score_date']
-            ))
-            
-            # 生成评分明细
-            indicators = [
-                ("IND001", "行业生命周期阶段", "industry", None, "成长期", 
-                 score_result['industry_score'], 100, 0.15),
-                ("IND002", "行业市场规模增速", "industry", 15.2, None, 
-                 score_result['industry_score'] * 0.9, 100, 0.10),
-                ("IND003", "行业集中度", "industry", None, "高集中度", 
-                 score_result['industry_score'] * 0.85, 100, 0.05),
-                ("IND004", "市场份额", "competitiveness", 12.5, None, 
-                 score_result['competitiveness_score'] * 0.95, 100, 0.15),
-                ("IND005", "营收增速", "competitiveness", 18.6, None, 
-                 score_result['competitiveness_score'] * 0.9, 100, 0.10),
-                ("IND006", "净利润率", "competitiveness", 15.8, None, 
-                 score_result['competitiveness_score'] * 0.85, 100, 0.08),
-                ("IND007", "净资产收益率", "competitiveness", 22.3, None, 
-                 score_result['competitiveness_score'] * 0.9, 100, 0.07),
-                ("IND008", "未来3年预期增速", "growth", 25.4, None, 
-                 score_result['growth_score'] * 0.95, 100, 0.12),
-                ("IND009", "研发投入强度", "growth", 8.5, None, 
-                 score_result['growth_score'] * 0.9, 100, 0.05),
-                ("IND010", "估值水平", "timing", None, "合理", 
-                 score_result['timing_score'] * 0.9, 100, 0.06),
-                ("IND011", "市场情绪", "timing", None, "乐观", 
-                 score_result['timing_score'] * 0.95, 100, 0.04),
-                ("IND012", "技术趋势", "timing", None, "上升", 
-                 score_result['timing_score'] * 0.9, 100, 0.03)
+            snapshot = market.get(stock['code'], {})
+            stock['current_price'] = snapshot.get('close', stored_prices.get(stock['code']))
+            score_inputs[stock['code']] = (
+                snapshot.get('trade_date'), snapshot.get('end_date'),
+                score_input_hash(stock, snapshot.get('financials'), timing.get(stock['code']))
+            )
+        if progress is not None:
+            progress.advance(len(stocks))
+        
+        if incremental:
+            previous = load_score_inputs(conn)
+            stocks = [
+                stock for stock in stocks
+                if score_inputs[stock['code']][2] is None or previous.get(stock['code']) != score_inputs[stock['code']][2]
             ]
-            
-            # 清除旧的评分明细
-            cursor.execute('DELETE FROM score_details WHERE stock_code = ?', (stock['code'],))
-            
-            # 插入新的评分明细
-            for indicator in indicators:
-                ind_code, ind_name, dimension, value, value_text, base_score, max_score, weight = indicator
-                
-                score_variation = random.uniform(-5, 5)
-                final_score = max(0, min(100, base_score + score_variation))
-                
-                cursor.execute('''
-                    INSERT INTO score_details
-                    (stock_code, code, name, dimension, value, value_text, score, max_score, weight)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (stock['code'], ind_code, ind_name, dimension, value, value_text, 
-                      final_score, max_score, weight))
-            
-            # 避免请求过于频繁
-            time.sleep(0.1)
+            logger.info(f"增量更新: {len(stocks)} 只股票的评分输入有变化")
+            if not stocks:
+                logger.info("没有需要更新的股票")
+                return
         
-        conn.commit()
-        logger.info("数据库更新完成!")
+        # 评分阶段：网络请求和计算都在事务之外完成
+        if progress is not None:
+            progress.begin('score', len(stocks))
+        memo = create_default_memo(scorer.ruleset) if scorer.deterministic else None
+        score_results = score_stocks(scorer, stocks, logger, market, signals, progress=progress,
+                                     score_inputs=score_inputs, memo=memo)
+        if memo is not None:
+            memo.flush()
+            logger.info(f"评分记忆表统计: {memo.stats()}")
         
+        # 写入阶段：短事务批量写入，不阻塞读取
+        write_scores(conn, stocks, score_results, score_inputs, deterministic=scorer.deterministic,
+                     progress=progress, signals=timing)
+        logger.info("数据库更新完成!")
+    
     except Exception as e:
         logger.error(f"更新数据库失败: {e}")
         conn.rollback()
+        raise
     finally:
         conn.close()
 
@@ -0,0 +1,271 @@
+"""
+SQLite数据库访问层
+提供共享连接池（WAL模式 + 调优参数），并在线程池中执行查询，避免阻塞事件循环
+"""
+
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DATABASE_PATH = 'stock_scoring.db'
+POOL_SIZE = 8
+POOL_TIMEOUT = 30  # 等待空闲连接的最长时间（秒）
+
+# 连接参数
+PRAGMAS = {
+    'journal_mode': 'WAL',       # 读写互不阻塞
+    'synchronous': 'NORMAL',     # WAL模式下兼顾安全与写入速度
+    'cache_size': -64000,        # 页缓存64MB（负数表示KB）
+    'mmap_size': 268435456,      # 内存映射256MB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000         # 写锁等待5秒
+}
+
+
+def connect(path: str = DATABASE_PATH) -> sqlite3.Connection:
+    """创建一个已设置调优参数的数据库连接"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class ConnectionPool:
+    """SQLite连接池"""
+    
+    def __init__(self, path: str = DATABASE_PATH, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        """
+        初始化连接池
+        
+        Args:
+            path: 数据库文件路径
+            size: 最大连接数
+            timeout: 连接全部借出时等待归还的最长时间（秒）
+        """
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _acquire(self) -> sqlite3.Connection:
+        """取出一个空闲连接，没有空闲连接且未达上限时新建"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return connect(self.path)
+        
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"等待数据库连接超时（{self.timeout} 秒内没有空闲连接）")
+    
+    def _release(self, conn: sqlite3.Connection):
+        """归还连接"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+    
+    @contextmanager
+    def connection(self):
+        """以上下文管理器的方式借用连接"""
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+    
+    def close(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+DATA_GENERATION_DDL = '''
+    CREATE TABLE IF NOT EXISTS data_generation (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        generation INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+'''
+
+
+def bump_data_generation(conn: sqlite3.Connection):
+    """
+    数据版本号加一，接口缓存据此失效
+    
+    需要在写入数据的同一事务中调用，由调用方提交
+    """
+    conn.execute(DATA_GENERATION_DDL)
+    conn.execute('''
+        INSERT INTO data_generation (id, generation, updated_at)
+        VALUES (1, 1, datetime('now', 'localtime'))
+        ON CONFLICT(id) DO UPDATE SET
+            generation = generation + 1,
+            updated_at = excluded.updated_at
+    ''')
+
+
+async def read_data_generation() -> int:
+    """读取当前数据版本号（在数据库线程池中执行，不阻塞事件循环）"""
+    row = await fetch_one('SELECT generation FROM data_generation WHERE id = 1')
+    return row[0] if row else 0
+
+
+SCORE_INPUTS_DDL = '''
+    CREATE TABLE IF NOT EXISTS score_inputs (
+        stock_code TEXT PRIMARY KEY,
+        trade_date TEXT,
+        end_date TEXT,
+        input_hash TEXT,
+        scored_at TEXT NOT NULL
+    )
+'''
+
+
+def create_score_inputs_table(conn: sqlite3.Connection):
+    """创建评分输入记录表（旧版本的表补上 input_hash 列）"""
+    conn.execute(SCORE_INPUTS_DDL)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(score_inputs)')}
+    if 'input_hash' not in columns:
+        conn.execute('ALTER TABLE score_inputs ADD COLUMN input_hash TEXT')
+
+
+def load_score_inputs(conn: sqlite3.Connection) -> Dict[str, Optional[str]]:
+    """读取每只股票上次评分所用输入的指纹"""
+    create_score_inputs_table(conn)
+    rows = conn.execute('SELECT stock_code, input_hash FROM score_inputs').fetchall()
+    return {code: input_hash for code, input_hash in rows}
+
+
+def save_score_inputs(conn: sqlite3.Connection,
+                      rows: Sequence[Tuple[str, Optional[str], Optional[str], Optional[str]]]):
+    """
+    记录每只股票本次评分的 (股票代码, 交易日, 报告期, 输入指纹)
+    
+    需要在写入评分的同一事务中调用，由调用方提交
+    """
+    create_score_inputs_table(conn)
+    conn.executemany('''
+        INSERT OR REPLACE INTO score_inputs (stock_code, trade_date, end_date, input_hash, scored_at)
+        VALUES (?, ?, ?, ?, datetime('now', 'localtime'))
+    ''', rows)
+
+
+def load_stock_prices(conn: sqlite3.Connection) -> Dict[str, Optional[float]]:
+    """读取 stock_info 中保存的每只股票的价格"""
+    return dict(conn.execute('SELECT code, current_price FROM stock_info').fetchall())
+
+
+def load_latest_scores(conn: sqlite3.Connection) -> Dict[str, tuple]:
+    """
+    读取每只股票最新一期的评分
+    
+    Returns:
+        {股票代码: (评分日期, 价格, 总分, 行业, 竞争力, 成长, 时机得分)}
+    """
+    rows = conn.execute('''
+        SELECT stock_code, score_date, current_price, total_score,
+               industry_score, competitiveness_score, growth_score, timing_score
+        FROM latest_score
+    ''').fetchall()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def refresh_latest_score(conn: sqlite3.Connection, score_date: str = None):
+    """
+    用 score_result 中每只股票最新一期的评分刷新 latest_score 表
+    
+    需要在写入评分的同一事务中调用，由调用方提交
+    
+    Args:
+        score_date: 只用该评分日期刚写入的评分刷新（已有更新一期评分的股票不受影响），
+                    走评分日期索引；为None时扫描整个 score_result 重建（用于初始化和修复）
+    """
+    if score_date is not None:
+        conn.execute('''
+            INSERT OR REPLACE INTO latest_score
+            (stock_code, stock_name, industry, current_price, total_score,
+             industry_score, competitiveness_score, growth_score, timing_score,
+             potential_level, score_date)
+            SELECT stock_code, stock_name, industry, current_price, total_score,
+                   industry_score, competitiveness_score, growth_score, timing_score,
+                   potential_level, score_date
+            FROM score_result r
+            WHERE r.score_date = ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM latest_score l
+                  WHERE l.stock_code = r.stock_code AND l.score_date > r.score_date
+              )
+        ''', (score_date,))
+        return
+    
+    conn.execute('''
+        INSERT OR REPLACE INTO latest_score
+        (stock_code, stock_name, industry, current_price, total_score,
+         industry_score, competitiveness_score, growth_score, timing_score,
+         potential_level, score_date)
+        SELECT stock_code, stock_name, industry, current_price, total_score,
+               industry_score, competitiveness_score, growth_score, timing_score,
+               potential_level, score_date
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY stock_code ORDER BY score_date DESC, id DESC
+            ) AS rn
+            FROM score_result
+        )
+        WHERE rn = 1
+    ''')
+
+
+pool = ConnectionPool()
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='sqlite')
+
+
+def _run_with_connection(func: Callable, *args) -> Any:
+    with pool.connection() as conn:
+        return func(conn, *args)
+
+
+async def run_in_db(func: Callable, *args) -> Any:
+    """
+    在数据库线程池中执行 func(conn, *args)
+    
+    Args:
+        func: 第一个参数为数据库连接的函数
+    
+    Returns:
+        func 的返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(_run_with_connection, func, *args))
+
+
+async def fetch_all(sql: str, params: Sequence = ()) -> List[tuple]:
+    """执行查询并返回所有行"""
+    return await run_in_db(lambda conn: conn.execute(sql, params).fetchall())
+
+
+async def fetch_one(sql: str, params: Sequence = ()) -> Optional[tuple]:
+    """执行查询并返回第一行"""
+    return await run_in_db(lambda conn: conn.execute(sql, params).fetchone())
@@ -0,0 +1,284 @@
+"""
+向量化技术指标库
+所有指标都在全市场 (交易日 × 股票) 矩阵上按列同时计算，缺失值为 NaN（停牌、未上市等）
+"""
+
+import logging
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# 时机维度信号参数
+SHORT_MA = 20
+LONG_MA = 60
+RSI_PERIOD = 14
+VALUATION_WINDOW = 750         # 估值百分位回看窗口（约3年交易日）
+VALUATION_MIN_PERIODS = 120    # 估值百分位最少样本数
+VALUATION_BANDS = (0.3, 0.7)   # 百分位低于/高于该值视为低估/高估
+
+
+def _as_matrix(values) -> np.ndarray:
+    """转换为 float64 的二维矩阵，一维输入视为单只股票"""
+    matrix = np.asarray(values, dtype=float)
+    if matrix.ndim == 1:
+        matrix = matrix[:, None]
+    return matrix
+
+
+def sma(values, window: int, min_periods: int = None) -> np.ndarray:
+    """
+    简单移动平均
+    
+    用累计和相减得到每个窗口的和，按窗口内的有效值求平均
+    
+    Args:
+        values: 交易日 × 股票 矩阵
+        window: 窗口长度
+        min_periods: 窗口内最少有效值数量，默认为 window，不足时结果为 NaN
+    
+    Returns:
+        与输入同形状的矩阵
+    """
+    matrix = _as_matrix(values)
+    min_periods = min_periods or window
+    out = np.full(matrix.shape, np.nan)
+    if window <= 0 or len(matrix) < window:
+        return out
+    
+    valid = ~np.isnan(matrix)
+    zeros = np.zeros((1, matrix.shape[1]))
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, matrix, 0), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[window - 1:] = np.where(window_counts >= min_periods, window_sums / window_counts, np.nan)
+    return out
+
+
+def ema(values, span: int = None, alpha: float = None) -> np.ndarray:
+    """
+    指数移动平均
+    
+    按交易日递推、所有股票同时计算；以每只股票第一个有效值为初值，缺失的交易日沿用前值
+    
+    Args:
+        values: 交易日 × 股票 矩阵
+        span: 周期，alpha = 2 / (span + 1)
+        alpha: 平滑系数，指定时忽略 span
+    
+    Returns:
+        与输入同形状的矩阵
+    """
+    matrix = _as_matrix(values)
+    if alpha is None:
+        alpha = 2.0 / (span + 1)
+    
+    out = np.empty(matrix.shape)
+    state = np.full(matrix.shape[1], np.nan)
+    for t, row in enumerate(matrix):
+        updated = state + alpha * (row - state)
+        state = np.where(np.isnan(state), row, np.where(np.isnan(row), state, updated))
+        out[t] = state
+    return out
+
+
+def macd(values, fast: int = 12, slow: int = 26, signal: int = 9):
+    """
+    MACD 指标
+    
+    Returns:
+        (DIF, DEA, 柱状值) 三个矩阵，柱状值为 DIF - DEA
+    """
+    dif = ema(values, span=fast) - ema(values, span=slow)
+    dea = ema(dif, span=signal)
+    return dif, dea, dif - dea
+
+
+def rsi(values, period: int = RSI_PERIOD) -> np.ndarray:
+    """
+    相对强弱指标（Wilder 平滑）
+    
+    Returns:
+        0-100 的矩阵，前 period 个交易日为 NaN
+    """
+    matrix = _as_matrix(values)
+    out = np.full(matrix.shape, np.nan)
+    if len(matrix) <= period:
+        return out
+    
+    change = np.diff(matrix, axis=0)
+    gain = ema(np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0)), alpha=1.0 / period)
+    loss = ema(np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0)), alpha=1.0 / period)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+    value[np.isnan(gain) | np.isnan(loss)] = np.nan
+    out[period:] = value[period - 1:]
+    return out
+
+
+def rolling_percentile(values, window: int, min_periods: int = None, chunk: int = 64) -> np.ndarray:
+    """
+    滚动百分位：当日值在过去 window 个交易日（含当日）中的分位（0-1）
+    
+    用滑动窗口视图一次比较整个窗口，按交易日分块以限制内存占用
+    
+    Args:
+        values: 交易日 × 股票 矩阵
+        window: 窗口长度
+        min_periods: 窗口内最少有效值数量，默认为 window
+        chunk: 每块处理的交易日数
+    
+    Returns:
+        与输入同形状的矩阵，当日值缺失或样本不足时为 NaN
+    """
+    matrix = _as_matrix(values)
+    min_periods = min_periods or window
+    out = np.full(matrix.shape, np.nan)
+    
+    # 顶部补 NaN，使前 window - 1 个交易日也有完整窗口
+    padded = np.concatenate([np.full((window - 1, matrix.shape[1]), np.nan), matrix])
+    for start in range(0, len(matrix), chunk):
+        stop = min(len(matrix), start + chunk)
+        windows = sliding_window_view(padded[start:stop + window - 1], window, axis=0)
+        current = matrix[start:stop, :, None]
+        
+        valid = ~np.isnan(windows)
+        counts = valid.sum(axis=-1)
+        below = ((windows <= current) & valid).sum(axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = below / counts
+        pct[(counts < min_periods) | np.isnan(matrix[start:stop])] = np.nan
+        out[start:stop] = pct
+    return out
+
+
+def latest_percentile(values, window: int, min_periods: int = None) -> np.ndarray:
+    """最后一个交易日的滚动百分位（只计算最后一个窗口），结果与 rolling_percentile 的最后一行一致"""
+    matrix = _as_matrix(values)[-window:]
+    min_periods = min_periods or window
+    current = matrix[-1]
+    
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+    below = ((matrix <= current) & valid).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = below / counts
+    pct[(counts < min_periods) | np.isnan(current)] = np.nan
+    return pct
+
+
+def classify_trend(close, ma_short, ma_long, macd_hist) -> np.ndarray:
+    """
+    技术趋势分类：均线多头排列且 MACD 柱为正为上升，空头排列且柱为负为下降，其余为震荡
+    
+    Returns:
+        'up' / 'sideways' / 'down' 数组，数据不足时为 None
+    """
+    up = (close > ma_short) & (ma_short > ma_long) & (macd_hist > 0)
+    down = (close < ma_short) & (ma_short < ma_long) & (macd_hist < 0)
+    trend = np.select([up, down], ['up', 'down'], default='sideways').astype(object)
+    trend[np.isnan(close) | np.isnan(ma_long)] = None
+    return trend
+
+
+def classify_valuation(percentile, bands=VALUATION_BANDS) -> np.ndarray:
+    """
+    估值水平分类：按 PE/PB 百分位分为 'low' / 'medium' / 'high'
+    
+    Returns:
+        分类数组，百分位缺失时为 None
+    """
+    percentile = np.asarray(percentile, dtype=float)
+    level = np.select([percentile < bands[0], percentile > bands[1]], ['low', 'high'], default='medium').astype(object)
+    level[np.isnan(percentile)] = None
+    return level
+
+
+def timing_signals(close, codes: List[str], pe=None, pb=None) -> pd.DataFrame:
+    """
+    计算全市场最新一个交易日的时机维度信号
+    
+    Args:
+        close: 收盘价矩阵（交易日 × 股票）
+        codes: 与矩阵列对应的股票代码
+        pe: 市盈率矩阵，与 close 同形状，可为 None
+        pb: 市净率矩阵，与 close 同形状，可为 None
+    
+    Returns:
+        以股票代码为索引的 DataFrame，包含均线、MACD柱、RSI、估值百分位，
+        以及 technical_trend（up/sideways/down）和 valuation_level（low/medium/high）
+    """
+    close = _as_matrix(close)
+    last_close = close[-1]
+    # 允许窗口内有少量停牌日
+    ma_short = sma(close[-SHORT_MA:], SHORT_MA, int(SHORT_MA * 0.8))[-1]
+    ma_long = sma(close[-LONG_MA:], LONG_MA, int(LONG_MA * 0.8))[-1]
+    hist = macd(close)[2][-1]
+    rsi_value = rsi(close)[-1]
+    
+    signals = pd.DataFrame({
+        'close': last_close,
+        'ma_short': ma_short,
+        'ma_long': ma_long,
+        'macd_hist': hist,
+        'rsi': rsi_value,
+        'technical_trend': classify_trend(last_close, ma_short, ma_long, hist)
+    }, index=pd.Index(codes, name='code'))
+    
+    # PE 为负（亏损）时百分位没有意义，按缺失处理
+    percentiles = []
+    for name, matrix in (('pe_percentile', pe), ('pb_percentile', pb)):
+        if matrix is None:
+            signals[name] = np.nan
+            continue
+        matrix = _as_matrix(matrix)
+        matrix = np.where(matrix > 0, matrix, np.nan)
+        signals[name] = latest_percentile(matrix, VALUATION_WINDOW, VALUATION_MIN_PERIODS)
+        percentiles.append(signals[name].to_numpy())
+    
+    # PE、PB 百分位取平均，只有一项有效时取该项
+    if percentiles:
+        stacked = np.vstack(percentiles)
+        counts = (~np.isnan(stacked)).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            combined = np.where(counts > 0, np.nansum(stacked, axis=0) / counts, np.nan)
+    else:
+        combined = np.full(len(codes), np.nan)
+    signals['valuation_percentile'] = combined
+    signals['valuation_level'] = classify_valuation(combined)
+    return signals
+
+
+def load_timing_signals(bar_store, valuation_store=None) -> Optional[pd.DataFrame]:
+    """
+    从本地行情存储读取数据并计算时机维度信号
+    
+    Args:
+        bar_store: 日线行情存储（DailyBarStore）
+        valuation_store: 估值存储（字段 pe_ttm、pb），可为 None
+    
+    Returns:
+        以6位股票代码为索引的信号 DataFrame，存储为空时返回 None
+    """
+    bar_store.refresh()
+    if len(bar_store.dates) < LONG_MA:
+        return None
+    
+    dates, codes, close = bar_store.read('close', start_date=bar_store.dates[-VALUATION_WINDOW:][0])
+    
+    pe = pb = None
+    if valuation_store is not None and valuation_store.dates:
+        # 估值矩阵按行情的交易日和股票代码对齐
+        pe = valuation_store.read_frame('pe_ttm', start_date=dates[0]).reindex(index=dates, columns=codes).to_numpy()
+        pb = valuation_store.read_frame('pb', start_date=dates[0]).reindex(index=dates, columns=codes).to_numpy()
+    
+    signals = timing_signals(close, [code[:6] for code in codes], pe, pb)
+    logger.info(f"时机信号计算完成: {len(signals)} 只股票, {len(dates)} 个交易日")
+    return signals[~signals.index.duplicated(keep='last')]
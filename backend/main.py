@@ -1,13 +1,41 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
-import sqlite3
 import json
 from datetime import datetime, timedelta
 import random
 import logging
 
+from api_cache import ApiResponseCache
+from database import (DATA_GENERATION_DDL, bump_data_generation, connect, create_score_inputs_table, fetch_all,
+                      fetch_one, pool, read_data_generation, refresh_latest_score, run_in_db)
+from ranking import RANK_METRICS, create_score_rank_table, refresh_score_ranks
+from rule_compiler import seed_indicator_definitions
+from pagination import NEXT_CURSOR_HEADER, Page, decode_cursor, make_page, seek_condition
+from screener import run_screen
+from score_export import DETAIL_COLUMNS, EXPORT_FORMATS, SCORE_COLUMNS, export_chunks, pa
+from search_index import StockSearchIndex
+from update_jobs import UpdateJobManager
+
+try:
+    import orjson
+except ImportError:
+    # 未安装orjson时使用标准库json序列化
+    orjson = None
+
+try:
+    from tushare_config import VALIDATE_RESPONSES
+except ImportError:
+    VALIDATE_RESPONSES = False
+
+try:
+    from tushare_config import UPDATE_INTERVAL, SCHEDULED_UPDATE
+except ImportError:
+    UPDATE_INTERVAL = 86400
+    SCHEDULED_UPDATE = False
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -19,6 +47,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "X-Query-Time-Ms", "X-Query-Plan"],
 )
 
 class StockInfo(BaseModel):
@@ -51,9 +80,35 @@ class IndicatorDetail(BaseModel):
     max_score: float
     weight: float
 
+class BatchScoreRequest(BaseModel):
+    codes: List[str]
+    include_details: bool = False
+
+# 响应模型校验器（只在 VALIDATE_RESPONSES 开启时使用）
+STOCK_INFO_LIST = TypeAdapter(List[StockInfo])
+SCORE_RESULT = TypeAdapter(ScoreResult)
+INDICATOR_DETAIL_LIST = TypeAdapter(List[IndicatorDetail])
+
+# 评分历史的时间粒度，值为分组周期起始日的SQL表达式
+HISTORY_PERIODS = {
+    'day': "score_date",
+    'week': "date(score_date, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', score_date)",
+}
+
+class ScreenRequest(BaseModel):
+    filter: Optional[dict] = None
+    sort: str = "total_score"
+    descending: bool = True
+    limit: int = 50
+    cursor: Optional[str] = None
+
+# 批量查询一次最多的股票数
+MAX_BATCH_CODES = 500
+
 # 初始化数据库
 def init_database():
-    conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
+    conn = connect()
     cursor = conn.cursor()
     
     # 创建股票信息表
@@ -103,6 +158,69 @@ def init_database():
         )
     ''')
     
+    # 创建最新评分表（每只股票一行，由数据更新流程维护）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS latest_score (
+            stock_code TEXT PRIMARY KEY,
+            stock_name TEXT NOT NULL,
+            industry TEXT NOT NULL,
+            current_price REAL,
+            total_score REAL NOT NULL,
+            industry_score REAL NOT NULL,
+            competitiveness_score REAL NOT NULL,
+            growth_score REAL NOT NULL,
+            timing_score REAL NOT NULL,
+            potential_level TEXT NOT NULL,
+            score_date TEXT NOT NULL,
+            FOREIGN KEY (stock_code) REFERENCES stock_info(code)
+        )
+    ''')
+    
+    # 去除同一股票同一日期的重复评分，以便建立唯一索引
+    cursor.execute('''
+        DELETE FROM score_result
+        WHERE id NOT IN (SELECT MAX(id) FROM score_result GROUP BY stock_code, score_date)
+    ''')
+    
+    # 创建索引
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_info_industry ON stock_info(industry)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_info_name ON stock_info(name)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS uk_score_result_stock_date ON score_result(stock_code, score_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_score_result_total_score ON score_result(total_score)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_score_result_potential_level ON score_result(potential_level)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_score_result_date ON score_result(score_date)")
+    # 评分历史查询的覆盖索引，按股票读取时间序列不需要回表
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_score_result_history
+        ON score_result(stock_code, score_date, total_score, industry_score,
+                        competitiveness_score, growth_score, timing_score)
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_score_details_stock_code ON score_details(stock_code)")
+    # 按 (总分, 代码) 游标分页，替代只有总分的旧索引
+    cursor.execute("DROP INDEX IF EXISTS idx_latest_score_total_score")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_latest_score_total_score_code ON latest_score(total_score, stock_code)")
+    # 选股筛选条件常用的列
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_latest_score_industry ON latest_score(industry)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_latest_score_industry_score ON latest_score(industry_score)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_latest_score_competitiveness_score ON latest_score(competitiveness_score)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_latest_score_growth_score ON latest_score(growth_score)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_latest_score_timing_score ON latest_score(timing_score)")
+    
+    # 创建数据版本号表
+    cursor.execute(DATA_GENERATION_DDL)
+    
+    # 创建评分输入记录表（增量更新用）
+    create_score_inputs_table(conn)
+    
+    # 创建指标定义表（评分标准由 rule_compiler 编译为评分规则）
+    seed_indicator_definitions(conn)
+    
+    # 创建评分截面排名表
+    create_score_rank_table(conn)
+    
+    refresh_latest_score(conn)
+    refresh_score_ranks(conn)
+    
     conn.commit()
     conn.close()
 
@@ -136,7 +254,7 @@ def generate_sample_data():
         ("IND012", "技术趋势", "timing", None, "上升", 76.0, 100, 0.03)
     ]
     
-    conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
+    conn = connect()
     cursor = conn.cursor()
     
     # 检查是否已有数据
@@ -152,6 +270,7 @@ def generate_sample_data():
     ''', stocks)
     
     # 生成评分结果和明细
+    score_date = datetime.now().strftime("%Y-%m-%d")
     for stock in stocks:
         code, name, industry, price, market_cap = stock
         
@@ -186,7 +305,7 @@ def generate_sample_data():
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (code, name, industry, price, total_score, 
               industry_score, competitiveness_score, growth_score, timing_score,
-              potential_level, datetime.now().strftime("%Y-%m-%d")))
+              potential_level, score_date))
         
         # 插入评分明细
         for indicator in indicators:
@@ -202,12 +321,91 @@ def generate_sample_data():
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (code, ind_code, ind_name, dimension, value, value_text, final_score, max_score, weight))
     
+    refresh_latest_score(conn, score_date)
+    refresh_score_ranks(conn)
+    bump_data_generation(conn)
+    
     conn.commit()
     conn.close()
 
+# 股票搜索索引
+search_index = StockSearchIndex()
+
+def rebuild_search_index():
+    with pool.connection() as conn:
+        search_index.rebuild(conn)
+
+# 评分接口响应缓存（数据更新后按版本号失效）
+score_cache = ApiResponseCache(read_data_generation)
+
+def encode_json(payload) -> bytes:
+    """将由字典、列表和基本类型组成的数据序列化为JSON字节"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+def checked(adapter: TypeAdapter, payload):
+    """
+    调试模式下按响应模型校验数据后原样返回
+    
+    列表接口直接返回行字典并预先序列化，不再逐行构造Pydantic对象，
+    response_model 只用于接口文档
+    """
+    if VALIDATE_RESPONSES:
+        adapter.validate_python(payload)
+    return payload
+
+async def cached_json_response(request: Request, key, build) -> Response:
+    """
+    返回缓存的JSON响应，未命中时调用 build 生成；支持 If-None-Match 返回304
+    
+    Args:
+        request: 当前请求
+        key: 缓存键
+        build: 生成响应数据的协程函数，返回可直接序列化的字典或列表；
+               分页接口返回 Page，下一页游标放在 X-Next-Cursor 响应头中
+    """
+    generation = await score_cache.refresh()
+    entry = score_cache.get(key)
+    if entry is None:
+        payload = await build()
+        extra_headers = None
+        if isinstance(payload, Page):
+            extra_headers = {NEXT_CURSOR_HEADER: payload.next_cursor} if payload.next_cursor else None
+            payload = payload.items
+        body = encode_json(payload)
+        entry = score_cache.put(key, body, generation, extra_headers)
+    
+    headers = {'ETag': entry.etag, 'Cache-Control': 'no-cache', **entry.headers}
+    if request.headers.get('if-none-match') == entry.etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=entry.body, media_type='application/json', headers=headers)
+
+def parse_cursor(cursor: Optional[str], size: int) -> Optional[list]:
+    """解码分页游标，无效时返回400"""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def run_update_job(job):
+    """执行一次数据更新任务，完成后重建搜索索引并使接口缓存失效"""
+    from data_fetcher import update_database_with_real_data
+    
+    update_database_with_real_data(incremental=job.incremental, progress=job)
+    rebuild_search_index()
+    score_cache.invalidate()
+
+# 数据更新任务管理（同一时间只运行一个更新任务）
+update_jobs = UpdateJobManager(run_update_job)
+
 # 启动时初始化数据库
 init_database()
 generate_sample_data()
+rebuild_search_index()
 
 # API端点
 @app.get("/")
@@ -215,135 +413,362 @@ async def root():
     return {"message": "十倍股潜力评分API v1.0"}
 
 @app.get("/api/stocks/search", response_model=List[StockInfo])
-async def search_stocks(q: str = Query(..., description="搜索关键词")):
-    """搜索股票"""
+async def search_stocks(
+    q: str = Query(..., description="搜索关键词"),
+    limit: int = Query(10, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 中的游标")
+):
+    """搜索股票（按匹配程度排序，游标分页；数据更新重建索引后旧游标返回400）"""
+    after = parse_cursor(cursor, 3)
     try:
-        conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT code, name, industry, current_price, market_cap 
-            FROM stock_info 
-            WHERE name LIKE ? OR code LIKE ?
-            LIMIT 10
-        ''', (f"%{q}%", f"%{q}%"))
-        
-        results = cursor.fetchall()
-        conn.close()
+        page = make_page(search_index.search_page(q, limit + 1, after), limit, lambda item: item[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        results = [row for _, row in page.items]
         
-        return [
-            StockInfo(
-                code=row[0],
-                name=row[1],
-                industry=row[2],
-                current_price=row[3],
-                market_cap=row[4]
-            )
+        payload = checked(STOCK_INFO_LIST, [
+            {
+                "code": row[0],
+                "name": row[1],
+                "industry": row[2],
+                "current_price": row[3],
+                "market_cap": row[4]
+            }
             for row in results
-        ]
+        ])
+        headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+        return Response(content=encode_json(payload), media_type='application/json', headers=headers)
     except Exception as e:
         logger.error(f"搜索股票失败: {e}")
         raise HTTPException(status_code=500, detail="搜索股票失败")
 
+@app.get("/api/scores/export")
+async def export_scores(format: str = Query("ndjson", description="导出格式: ndjson、csv 或 parquet")):
+    """流式导出全部最新评分及评分明细"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+    if format == 'parquet' and pa is None:
+        raise HTTPException(status_code=400, detail="Parquet导出需要安装pyarrow")
+    
+    def stream():
+        # 导出耗时较长，使用独立连接，避免长时间占用连接池
+        conn = connect()
+        try:
+            yield from export_chunks(conn, format)
+        except Exception as e:
+            logger.error(f"导出评分数据失败: {e}")
+            raise
+        finally:
+            conn.close()
+    
+    filename = f"scores_{datetime.now().strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+def load_batch_scores(conn, codes: List[str], include_details: bool):
+    """用一条 IN 查询读取多只股票的最新评分（及评分明细），按请求顺序返回"""
+    placeholders = ','.join('?' * len(codes))
+    rows = conn.execute(f'''
+        SELECT {', '.join(SCORE_COLUMNS)}
+        FROM latest_score
+        WHERE stock_code IN ({placeholders})
+    ''', codes).fetchall()
+    scores = {row[0]: dict(zip(SCORE_COLUMNS, row)) for row in rows}
+    
+    details = {}
+    if include_details:
+        for row in conn.execute(f'''
+            SELECT stock_code, {', '.join(DETAIL_COLUMNS)}
+            FROM score_details
+            WHERE stock_code IN ({placeholders})
+            ORDER BY stock_code, dimension, code
+        ''', codes):
+            details.setdefault(row[0], []).append(dict(zip(DETAIL_COLUMNS, row[1:])))
+    
+    results = []
+    for code in codes:
+        if code in scores:
+            item = scores[code]
+            if include_details:
+                item['details'] = details.get(code, [])
+            results.append(item)
+    
+    return {
+        "scores": results,
+        "missing": [code for code in codes if code not in scores]
+    }
+
+@app.post("/api/scores/batch")
+async def get_batch_scores(body: BatchScoreRequest, request: Request):
+    """批量获取多只股票的评分结果（可选评分明细）"""
+    # 去重并保持请求顺序
+    codes = list(dict.fromkeys(code.strip() for code in body.codes if code.strip()))
+    if len(codes) > MAX_BATCH_CODES:
+        raise HTTPException(status_code=400, detail=f"一次最多查询 {MAX_BATCH_CODES} 只股票")
+    
+    async def build():
+        if not codes:
+            return {"scores": [], "missing": []}
+        return await run_in_db(load_batch_scores, codes, body.include_details)
+    
+    try:
+        return await cached_json_response(request, ('batch', tuple(codes), body.include_details), build)
+    except Exception as e:
+        logger.error(f"批量获取股票评分失败: {e}")
+        raise HTTPException(status_code=500, detail="批量获取股票评分失败")
+
 @app.get("/api/scores/{stock_code}", response_model=ScoreResult)
-async def get_score_result(stock_code: str):
+async def get_score_result(stock_code: str, request: Request):
     """获取股票评分结果"""
-    try:
-        conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+    async def build():
+        result = await fetch_one('''
             SELECT stock_code, stock_name, industry, current_price, total_score,
                    industry_score, competitiveness_score, growth_score, timing_score,
                    potential_level, score_date
-            FROM score_result 
+            FROM latest_score 
             WHERE stock_code = ?
-            ORDER BY score_date DESC
-            LIMIT 1
         ''', (stock_code,))
         
-        result = cursor.fetchone()
-        conn.close()
-        
         if not result:
             raise HTTPException(status_code=404, detail="股票评分结果未找到")
         
-        return ScoreResult(
-            stock_code=result[0],
-            stock_name=result[1],
-            industry=result[2],
-            current_price=result[3],
-            total_score=result[4],
-            industry_score=result[5],
-            competitiveness_score=result[6],
-            growth_score=result[7],
-            timing_score=result[8],
-            potential_level=result[9],
-            score_date=result[10]
-        )
+        return checked(SCORE_RESULT, dict(zip(SCORE_COLUMNS, result)))
+    
+    try:
+        return await cached_json_response(request, ('score', stock_code), build)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取股票评分失败: {e}")
         raise HTTPException(status_code=500, detail="获取股票评分失败")
 
 @app.get("/api/scores/{stock_code}/details", response_model=List[IndicatorDetail])
-async def get_score_details(stock_code: str):
+async def get_score_details(stock_code: str, request: Request):
     """获取股票评分明细"""
-    try:
-        conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+    async def build():
+        results = await fetch_all('''
             SELECT code, name, dimension, value, value_text, score, max_score, weight
             FROM score_details 
             WHERE stock_code = ?
             ORDER BY dimension, code
         ''', (stock_code,))
         
-        results = cursor.fetchall()
-        conn.close()
-        
-        return [
-            IndicatorDetail(
-                code=row[0],
-                name=row[1],
-                dimension=row[2],
-                value=row[3],
-                value_text=row[4],
-                score=row[5],
-                max_score=row[6],
-                weight=row[7]
+        return checked(INDICATOR_DETAIL_LIST, [dict(zip(DETAIL_COLUMNS, row)) for row in results])
+    
+    try:
+        return await cached_json_response(request, ('details', stock_code), build)
+    except Exception as e:
+        logger.error(f"获取评分明细失败: {e}")
+        raise HTTPException(status_code=500, detail="获取评分明细失败")
+
+def parse_date_param(value: Optional[str], name: str) -> Optional[str]:
+    """校验 YYYY-MM-DD 格式的日期参数"""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} 日期格式应为 YYYY-MM-DD")
+
+@app.get("/api/scores/{stock_code}/history")
+async def get_score_history(
+    stock_code: str,
+    request: Request,
+    from_date: Optional[str] = Query(None, alias="from", description="开始日期 YYYY-MM-DD"),
+    to_date: Optional[str] = Query(None, alias="to", description="结束日期 YYYY-MM-DD"),
+    resolution: str = Query("day", description="时间粒度: day、week 或 month")
+):
+    """
+    获取股票评分历史
+    
+    week/month 粒度在SQL中按周期分组，每个周期取最后一个评分日的各维度得分，
+    并给出周期内总分的平均、最低、最高值和评分次数
+    """
+    if resolution not in HISTORY_PERIODS:
+        raise HTTPException(status_code=400, detail=f"不支持的时间粒度: {resolution}")
+    start = parse_date_param(from_date, "from") or '0000-01-01'
+    end = parse_date_param(to_date, "to") or '9999-12-31'
+    
+    async def build():
+        period = HISTORY_PERIODS[resolution]
+        results = await fetch_all(f'''
+            SELECT period, score_date, total_score, industry_score, competitiveness_score,
+                   growth_score, timing_score, avg_total, min_total, max_total, samples
+            FROM (
+                SELECT {period} AS period, score_date, total_score, industry_score,
+                       competitiveness_score, growth_score, timing_score,
+                       AVG(total_score) OVER w AS avg_total,
+                       MIN(total_score) OVER w AS min_total,
+                       MAX(total_score) OVER w AS max_total,
+                       COUNT(*) OVER w AS samples,
+                       ROW_NUMBER() OVER (PARTITION BY {period} ORDER BY score_date DESC) AS rn
+                FROM score_result
+                WHERE stock_code = ? AND score_date BETWEEN ? AND ?
+                WINDOW w AS (PARTITION BY {period})
             )
+            WHERE rn = 1
+            ORDER BY period
+        ''', (stock_code, start, end))
+        
+        return {
+            "stock_code": stock_code,
+            "resolution": resolution,
+            "points": [
+                {
+                    "period": row[0],
+                    "score_date": row[1],
+                    "total_score": row[2],
+                    "industry_score": row[3],
+                    "competitiveness_score": row[4],
+                    "growth_score": row[5],
+                    "timing_score": row[6],
+                    "avg_total_score": row[7],
+                    "min_total_score": row[8],
+                    "max_total_score": row[9],
+                    "samples": row[10]
+                }
+                for row in results
+            ]
+        }
+    
+    try:
+        return await cached_json_response(request, ('history', stock_code, start, end, resolution), build)
+    except Exception as e:
+        logger.error(f"获取评分历史失败: {e}")
+        raise HTTPException(status_code=500, detail="获取评分历史失败")
+
+@app.get("/api/rankings")
+async def get_rankings(
+    request: Request,
+    metric: str = Query("total_score", description="排名的评分列: total_score、industry_score、competitiveness_score、growth_score 或 timing_score"),
+    industry: Optional[str] = Query(None, description="行业，指定时返回行业内排名"),
+    limit: int = Query(20, ge=1, le=500, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 中的游标")
+):
+    """获取全市场或行业内某项评分的前若干名（按排名游标分页）"""
+    if metric not in RANK_METRICS:
+        raise HTTPException(status_code=400, detail=f"不支持的排名评分列: {metric}")
+    after = parse_cursor(cursor, 2)
+    
+    async def build():
+        # 按排名索引直接定位到游标之后的 limit 名
+        if industry:
+            where, order, params = "r.metric = ? AND r.industry = ?", "r.industry_rank", [metric, industry]
+        else:
+            where, order, params = "r.metric = ?", "r.market_rank", [metric]
+        if after:
+            where += " AND " + seek_condition([order, "r.stock_code"], descending=False)
+            params += after
+        
+        results = await fetch_all(f'''
+            SELECT r.stock_code, l.stock_name, r.industry, r.score,
+                   r.market_rank, r.market_size, r.market_percentile,
+                   r.industry_rank, r.industry_size, r.industry_percentile, r.score_date
+            FROM score_rank r
+            JOIN latest_score l ON l.stock_code = r.stock_code
+            WHERE {where}
+            ORDER BY {order}, r.stock_code
+            LIMIT ?
+        ''', params + [limit + 1])
+        
+        page = [
+            {
+                "stock_code": row[0],
+                "stock_name": row[1],
+                "industry": row[2],
+                "score": row[3],
+                "market_rank": row[4],
+                "market_size": row[5],
+                "market_percentile": row[6],
+                "industry_rank": row[7],
+                "industry_size": row[8],
+                "industry_percentile": row[9],
+                "score_date": row[10]
+            }
             for row in results
         ]
+        rank = 'industry_rank' if industry else 'market_rank'
+        return make_page(page, limit, lambda item: (item[rank], item['stock_code']))
+    
+    try:
+        return await cached_json_response(request, ('rankings', metric, industry, limit, cursor), build)
     except Exception as e:
-        logger.error(f"获取评分明细失败: {e}")
-        raise HTTPException(status_code=500, detail="获取评分明细失败")
+        logger.error(f"获取评分排名失败: {e}")
+        raise HTTPException(status_code=500, detail="获取评分排名失败")
+
+@app.get("/api/rankings/{stock_code}")
+async def get_stock_rankings(stock_code: str, request: Request):
+    """获取股票总分及各维度得分在全市场和行业内的排名、百分位"""
+    async def build():
+        results = await fetch_all('''
+            SELECT metric, industry, score, market_rank, market_size, market_percentile,
+                   industry_rank, industry_size, industry_percentile, score_date
+            FROM score_rank
+            WHERE stock_code = ?
+        ''', (stock_code,))
+        
+        if not results:
+            raise HTTPException(status_code=404, detail="股票排名未找到")
+        
+        rankings = {
+            row[0]: {
+                "score": row[2],
+                "market_rank": row[3],
+                "market_size": row[4],
+                "market_percentile": row[5],
+                "industry_rank": row[6],
+                "industry_size": row[7],
+                "industry_percentile": row[8]
+            }
+            for row in results
+        }
+        return {
+            "stock_code": stock_code,
+            "industry": results[0][1],
+            "score_date": results[0][9],
+            "rankings": {metric: rankings[metric] for metric in RANK_METRICS if metric in rankings}
+        }
+    
+    try:
+        return await cached_json_response(request, ('stock_rankings', stock_code), build)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取股票排名失败: {e}")
+        raise HTTPException(status_code=500, detail="获取股票排名失败")
 
 @app.get("/api/stocks/high-potential")
 async def get_high_potential_stocks(
+    request: Request,
     min_score: float = Query(80, description="最低分数"),
-    limit: int = Query(20, description="返回数量限制")
+    limit: int = Query(20, ge=1, le=500, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 中的游标")
 ):
-    """获取高潜力股票列表"""
-    try:
-        conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
-        cursor = conn.cursor()
+    """获取高潜力股票列表（按总分降序，游标分页）"""
+    after = parse_cursor(cursor, 2)
+    
+    async def build():
+        # 游标为上一页最后一条的 (总分, 代码)，在 (total_score, stock_code) 索引上直接定位
+        where, params = "total_score >= ?", [min_score]
+        if after:
+            where += " AND " + seek_condition(["total_score", "stock_code"])
+            params += after
         
-        cursor.execute('''
-            SELECT sr.stock_code, sr.stock_name, sr.industry, sr.current_price, 
-                   sr.total_score, sr.potential_level, sr.score_date
-            FROM score_result sr
-            WHERE sr.total_score >= ? AND sr.score_date = (
-                SELECT MAX(score_date) FROM score_result WHERE stock_code = sr.stock_code
-            )
-            ORDER BY sr.total_score DESC
+        results = await fetch_all(f'''
+            SELECT stock_code, stock_name, industry, current_price, 
+                   total_score, potential_level, score_date
+            FROM latest_score
+            WHERE {where}
+            ORDER BY total_score DESC, stock_code DESC
             LIMIT ?
-        ''', (min_score, limit))
+        ''', params + [limit + 1])
         
-        results = cursor.fetchall()
-        conn.close()
-        
-        return [
+        page = [
             {
                 "stock_code": row[0],
                 "stock_name": row[1], 
@@ -355,10 +780,42 @@ async def get_high_potential_stocks(
             }
             for row in results
         ]
+        return make_page(page, limit, lambda item: (item['total_score'], item['stock_code']))
+    
+    try:
+        return await cached_json_response(request, ('high_potential', min_score, limit, cursor), build)
     except Exception as e:
         logger.error(f"获取高潜力股票失败: {e}")
         raise HTTPException(status_code=500, detail="获取高潜力股票失败")
 
+@app.post("/api/stocks/screen")
+async def screen_stocks(body: ScreenRequest):
+    """
+    多条件选股
+    
+    filter 为条件或 and/or/not 的嵌套表达式，条件形如 {"field": "growth_score", "op": ">=", "value": 70}；
+    与其他列表接口一样，下一页游标放在 X-Next-Cursor 响应头中，
+    响应头 X-Query-Time-Ms、X-Query-Plan 给出查询耗时和查询计划
+    """
+    if not 1 <= body.limit <= 500:
+        raise HTTPException(status_code=400, detail="limit 应在 1 到 500 之间")
+    
+    try:
+        result = await run_in_db(run_screen, body.filter, body.sort, body.descending, body.limit, body.cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"选股查询失败: {e}")
+        raise HTTPException(status_code=500, detail="选股查询失败")
+    
+    headers = {
+        'X-Query-Time-Ms': f"{result['elapsed_ms']:.2f}",
+        'X-Query-Plan': ' | '.join(result['plan']).encode('ascii', 'replace').decode('ascii')
+    }
+    if result['next_cursor']:
+        headers[NEXT_CURSOR_HEADER] = result['next_cursor']
+    return Response(content=encode_json(result['items']), media_type='application/json', headers=headers)
+
 @app.get("/api/indicators/explanations")
 async def get_indicator_explanations():
     """获取指标说明"""
@@ -394,58 +851,79 @@ async def get_indicator_explanations():
     }
     return explanations
 
+@app.on_event("startup")
+def start_update_schedule():
+    if SCHEDULED_UPDATE and UPDATE_INTERVAL:
+        update_jobs.start_schedule(UPDATE_INTERVAL)
+
+@app.on_event("shutdown")
+def stop_update_schedule():
+    update_jobs.stop_schedule()
+
 @app.post("/api/data/update")
-async def update_data():
-    """更新股票数据（使用Tushare接口）"""
+async def update_data(incremental: bool = Query(False, description="是否只更新输入数据有变化的股票")):
+    """更新股票数据（使用Tushare接口），已有更新任务在运行时返回该任务"""
+    # 检查数据更新所需的依赖是否可用
     try:
-        from data_fetcher import update_database_with_real_data
-        import threading
-        
-        # 在后台线程中执行数据更新
-        update_thread = threading.Thread(target=update_database_with_real_data)
-        update_thread.start()
-        
-        return {
-            "message": "数据更新已启动",
-            "status": "processing",
-            "note": "这是一个耗时的操作，请稍后检查数据是否更新"
-        }
+        import data_fetcher
     except ImportError:
         return {
             "message": "数据更新功能不可用",
             "status": "error",
             "note": "请确保已安装所需依赖包"
         }
+    
+    try:
+        job, created = update_jobs.submit(incremental=incremental)
     except Exception as e:
         logger.error(f"启动数据更新失败: {e}")
         raise HTTPException(status_code=500, detail="启动数据更新失败")
+    
+    return {
+        "message": "数据更新已启动" if created else "数据更新正在进行中",
+        "status": "processing",
+        "job_id": job.id,
+        "note": "这是一个耗时的操作，可通过 /api/data/status 查看进度",
+        "job": job.to_dict()
+    }
+
+@app.get("/api/data/update/{job_id}")
+async def get_update_job(job_id: str):
+    """获取数据更新任务的状态和进度"""
+    job = update_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="更新任务未找到")
+    return job.to_dict()
+
+@app.post("/api/data/update/{job_id}/cancel")
+async def cancel_update_job(job_id: str):
+    """取消数据更新任务（在下一个检查点停止，已写入的事务会回滚）"""
+    cancelled = update_jobs.cancel(job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=404, detail="更新任务未找到")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail="更新任务已结束")
+    return {"message": "已请求取消更新任务", "job": update_jobs.get(job_id).to_dict()}
 
 @app.get("/api/data/status")
 async def get_data_status():
     """获取数据状态"""
     try:
-        conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
-        cursor = conn.cursor()
-        
         # 获取股票数量
-        cursor.execute("SELECT COUNT(*) FROM stock_info")
-        stock_count = cursor.fetchone()[0]
+        stock_count = (await fetch_one("SELECT COUNT(*) FROM stock_info"))[0]
         
         # 获取最新评分日期
-        cursor.execute("SELECT MAX(score_date) FROM score_result")
-        latest_date = cursor.fetchone()[0]
+        latest_date = (await fetch_one("SELECT MAX(score_date) FROM score_result"))[0]
         
         # 获取高潜力股票数量
-        cursor.execute("SELECT COUNT(*) FROM score_result WHERE total_score >= 80 AND score_date = (SELECT MAX(score_date) FROM score_result WHERE stock_code = score_result.stock_code)")
-        high_potential_count = cursor.fetchone()[0]
-        
-        conn.close()
+        high_potential_count = (await fetch_one("SELECT COUNT(*) FROM latest_score WHERE total_score >= 80"))[0]
         
         return {
             "stock_count": stock_count,
             "latest_score_date": latest_date,
             "high_potential_count": high_potential_count,
-            "database_status": "normal"
+            "database_status": "normal",
+            **update_jobs.status()
         }
     except Exception as e:
         logger.error(f"获取数据状态失败: {e}")
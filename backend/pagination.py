@@ -0,0 +1,72 @@
+"""
+游标分页（keyset）
+游标是最后一行排序键的不透明编码，下一页用 (排序键) < (游标值) 的条件直接从索引定位，
+翻到多深的页面开销都与第一页相同
+"""
+
+import base64
+import json
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+
+# 携带下一页游标的响应头
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class Page(NamedTuple):
+    """一页结果及下一页的游标（没有下一页时为None）"""
+    items: list
+    next_cursor: Optional[str]
+
+
+def encode_cursor(*values) -> str:
+    """把排序键编码为URL安全的游标字符串"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int = None) -> List:
+    """
+    解码游标
+    
+    Args:
+        cursor: encode_cursor 生成的游标
+        size: 期望的排序键个数，不一致时视为无效游标
+    
+    Raises:
+        ValueError: 游标无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, list) or (size is not None and len(values) != size):
+        raise ValueError("无效的分页游标")
+    if any(isinstance(value, (list, dict)) for value in values):
+        raise ValueError("无效的分页游标")
+    return values
+
+
+def seek_condition(columns: Sequence[str], descending: bool = True) -> str:
+    """
+    游标之后的行的SQL条件（参数为游标值）
+    
+    所有排序列同一方向，用行值比较，SQLite可以直接在 (columns) 索引上定位
+    """
+    return f"({', '.join(columns)}) {'<' if descending else '>'} ({', '.join('?' * len(columns))})"
+
+
+def make_page(items: list, limit: int, key: Callable) -> Page:
+    """
+    从多取一行的查询结果生成一页
+    
+    Args:
+        items: 最多 limit + 1 条结果
+        limit: 每页数量
+        key: 由一条结果得到排序键（元组）的函数
+    """
+    if len(items) <= limit:
+        return Page(items, None)
+    items = items[:limit]
+    return Page(items, encode_cursor(*key(items[-1])))
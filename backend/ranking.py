@@ -0,0 +1,104 @@
+"""
+评分截面排名
+按最新评分计算每只股票在全市场和所属行业内的排名和百分位，覆盖总分及四个维度得分，
+结果存入 score_rank 表，按排名有索引，可直接取前 k 名
+"""
+
+import logging
+import sqlite3
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 参与排名的评分列
+RANK_METRICS = ['total_score', 'industry_score', 'competitiveness_score', 'growth_score', 'timing_score']
+
+SCORE_RANK_DDL = '''
+    CREATE TABLE IF NOT EXISTS score_rank (
+        metric TEXT NOT NULL,
+        stock_code TEXT NOT NULL,
+        industry TEXT NOT NULL,
+        score REAL NOT NULL,
+        market_rank INTEGER NOT NULL,
+        market_size INTEGER NOT NULL,
+        market_percentile REAL NOT NULL,
+        industry_rank INTEGER NOT NULL,
+        industry_size INTEGER NOT NULL,
+        industry_percentile REAL NOT NULL,
+        score_date TEXT,
+        PRIMARY KEY (metric, stock_code)
+    )
+'''
+
+SCORE_RANK_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_score_rank_market ON score_rank(metric, market_rank, stock_code)",
+    "CREATE INDEX IF NOT EXISTS idx_score_rank_industry ON score_rank(metric, industry, industry_rank, stock_code)",
+]
+
+
+def create_score_rank_table(conn: sqlite3.Connection):
+    """创建排名表及其索引"""
+    conn.execute(SCORE_RANK_DDL)
+    for sql in SCORE_RANK_INDEXES:
+        conn.execute(sql)
+
+
+def compute_score_ranks(scores: pd.DataFrame) -> pd.DataFrame:
+    """
+    计算截面排名
+    
+    得分最高的排名为1，同分并列取最好名次；百分位为得分不高于该股票的比例（0-100，最高分为100）
+    
+    Args:
+        scores: 每只股票一行，包含 stock_code、industry、score_date 及 RANK_METRICS 各列
+    
+    Returns:
+        每个 (评分列, 股票) 一行的长表，列与 score_rank 表一致
+    """
+    long = scores.melt(
+        id_vars=['stock_code', 'industry', 'score_date'], value_vars=RANK_METRICS,
+        var_name='metric', value_name='score'
+    ).dropna(subset=['score'])
+    
+    market = long.groupby('metric')['score']
+    industry = long.groupby(['metric', 'industry'])['score']
+    
+    long['market_rank'] = market.rank(method='min', ascending=False).astype(int)
+    long['market_size'] = market.transform('size')
+    long['market_percentile'] = (market.rank(method='max', pct=True) * 100).round(2)
+    long['industry_rank'] = industry.rank(method='min', ascending=False).astype(int)
+    long['industry_size'] = industry.transform('size')
+    long['industry_percentile'] = (industry.rank(method='max', pct=True) * 100).round(2)
+    return long
+
+
+def refresh_score_ranks(conn: sqlite3.Connection) -> int:
+    """
+    按 latest_score 重新计算并替换 score_rank 表
+    
+    增量更新时只有部分股票重新评分，排名始终基于全部股票的最新评分；
+    需要在刷新 latest_score 之后、同一事务中调用，由调用方提交
+    
+    Returns:
+        写入的行数
+    """
+    create_score_rank_table(conn)
+    scores = pd.read_sql_query(
+        f"SELECT stock_code, industry, score_date, {', '.join(RANK_METRICS)} FROM latest_score", conn
+    )
+    ranks = compute_score_ranks(scores)
+    
+    conn.execute('DELETE FROM score_rank')
+    conn.executemany('''
+        INSERT INTO score_rank
+        (metric, stock_code, industry, score, market_rank, market_size, market_percentile,
+         industry_rank, industry_size, industry_percentile, score_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ranks[[
+        'metric', 'stock_code', 'industry', 'score', 'market_rank', 'market_size', 'market_percentile',
+        'industry_rank', 'industry_size', 'industry_percentile', 'score_date'
+    ]].itertuples(index=False, name=None))
+    
+    logger.info(f"评分排名已刷新: {len(scores)} 只股票, {len(ranks)} 条排名")
+    return len(ranks)
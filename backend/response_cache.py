@@ -0,0 +1,249 @@
+"""
+Tushare响应本地缓存
+将接口返回数据持久化到本地SQLite文件，按接口设置过期时间，超出容量时按LRU淘汰
+"""
+
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Union
+
+# 特殊TTL：按报告期的披露截止日决定，披露已截止的报告期缓存到下一个季度报告期（季末）为止，
+# 仍在披露中（或未指定报告期）的数据只短期缓存，后续披露的公司才能及时获取
+TTL_REPORT_PERIOD = 'report_period'
+
+# 披露中的报告期的缓存时间（秒）
+DEFAULT_OPEN_PERIOD_TTL = 86400
+
+# 各报告期的法定披露截止日（月, 日, 相对报告期的年份偏移）：一季报4月30日、半年报8月31日、
+# 三季报10月31日、年报次年4月30日
+DISCLOSURE_DEADLINES = {
+    '0331': (4, 30, 0),
+    '0630': (8, 31, 0),
+    '0930': (10, 31, 0),
+    '1231': (4, 30, 1),
+}
+
+# 默认配置（tushare_config.py 中未配置时使用）
+DEFAULT_CACHE_PATH = 'tushare_cache.db'
+DEFAULT_CACHE_MAX_SIZE_MB = 200
+DEFAULT_CACHE_TTL = {
+    'stock_basic': 86400,
+    'fina_indicator': TTL_REPORT_PERIOD,
+    'fina_indicator_vip': TTL_REPORT_PERIOD
+}
+
+
+def next_report_period_timestamp(now: datetime = None) -> float:
+    """下一个季度报告期（季末次日零点）的时间戳"""
+    now = now or datetime.now()
+    quarter = (now.month - 1) // 3
+    if quarter == 3:
+        boundary = datetime(now.year + 1, 1, 1)
+    else:
+        boundary = datetime(now.year, quarter * 3 + 4, 1)
+    return boundary.timestamp()
+
+
+def disclosure_deadline(period: str) -> Optional[datetime]:
+    """
+    报告期（YYYYMMDD 季末日期）的披露截止时间（截止日次日零点），不是季末日期时返回None
+    """
+    period = str(period or '')
+    if len(period) != 8 or not period.isdigit() or period[4:] not in DISCLOSURE_DEADLINES:
+        return None
+    month, day, year_offset = DISCLOSURE_DEADLINES[period[4:]]
+    return datetime(int(period[:4]) + year_offset, month, day) + timedelta(days=1)
+
+
+def report_period_expires_at(params: Dict = None, now: datetime = None,
+                             open_ttl: float = DEFAULT_OPEN_PERIOD_TTL) -> float:
+    """
+    按请求的报告期计算过期时间戳
+    
+    报告期披露已截止时缓存到下一个季度报告期；仍在披露中，或请求未指定报告期（取最新一期）时
+    缓存 open_ttl 秒，且不超过披露截止时间
+    """
+    now = now or datetime.now()
+    params = params or {}
+    deadline = disclosure_deadline(params.get('period') or params.get('end_date'))
+    
+    if deadline is not None and deadline <= now:
+        return next_report_period_timestamp(now)
+    
+    expires_at = now.timestamp() + open_ttl
+    if deadline is not None:
+        expires_at = min(expires_at, deadline.timestamp())
+    return expires_at
+
+
+class ResponseCache:
+    """基于SQLite文件的接口响应缓存"""
+    
+    def __init__(self, path: str, ttl: Dict[str, Union[int, str]] = None, max_size_mb: float = 200,
+                 open_period_ttl: float = DEFAULT_OPEN_PERIOD_TTL):
+        """
+        初始化缓存
+        
+        Args:
+            path: 缓存文件路径
+            ttl: 各接口的过期时间（秒），或 'report_period' 表示按请求的报告期是否已过披露截止日决定；
+                 未配置的接口不缓存
+            max_size_mb: 缓存容量上限（MB）
+            open_period_ttl: 'report_period' 接口中仍在披露的报告期的缓存时间（秒）
+        """
+        self.path = path
+        self.ttl = ttl or {}
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.open_period_ttl = open_period_ttl
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                api_name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_last_access ON response_cache(last_access)')
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(api_name: str, params: Dict = None, fields: str = None) -> str:
+        """根据 (api_name, params, fields) 生成缓存键"""
+        raw = json.dumps([api_name, params or {}, fields or ''], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def _expires_at(self, api_name: str, params: Dict = None) -> Optional[float]:
+        """计算接口数据的过期时间戳，未配置TTL时返回None"""
+        ttl = self.ttl.get(api_name)
+        if not ttl:
+            return None
+        if ttl == TTL_REPORT_PERIOD:
+            return report_period_expires_at(params, open_ttl=self.open_period_ttl)
+        return time.time() + float(ttl)
+    
+    def get(self, api_name: str, params: Dict = None, fields: str = None) -> Optional[Dict]:
+        """
+        读取缓存
+        
+        Returns:
+            包含 fields 和 items 的字典，未命中或已过期时返回None
+        """
+        if api_name not in self.ttl:
+            return None
+        
+        key = self.make_key(api_name, params, fields)
+        now = time.time()
+        
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, expires_at FROM response_cache WHERE key = ?', (key,)
+            ).fetchone()
+            
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            
+            self._conn.execute('UPDATE response_cache SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+        
+        return json.loads(row[0])
+    
+    def set(self, api_name: str, params: Dict, fields: str, data: Dict):
+        """
+        写入缓存
+        
+        Args:
+            data: 包含 fields 和 items 的接口返回数据
+        """
+        expires_at = self._expires_at(api_name, params)
+        if expires_at is None:
+            return
+        
+        key = self.make_key(api_name, params, fields)
+        payload = json.dumps(data, ensure_ascii=False)
+        now = time.time()
+        
+        with self._lock:
+            try:
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO response_cache (key, api_name, payload, size, expires_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (key, api_name, payload, len(payload), expires_at, now))
+                self._evict(now)
+                self._conn.commit()
+            except Exception as e:
+                self.logger.error(f"写入缓存失败 [{api_name}]: {e}")
+                self._conn.rollback()
+    
+    def _evict(self, now: float):
+        """清除过期数据，并按最近访问时间淘汰超出容量的数据"""
+        self._conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (now,))
+        
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM response_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        cursor = self._conn.execute('SELECT key, size FROM response_cache ORDER BY last_access')
+        evict_keys = []
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            evict_keys.append((key,))
+            total -= size
+        
+        self._conn.executemany('DELETE FROM response_cache WHERE key = ?', evict_keys)
+        self.logger.info(f"缓存超出容量，淘汰 {len(evict_keys)} 条数据")
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache')
+            self._conn.commit()
+    
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache'
+            ).fetchone()
+        
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'entries': entries,
+            'size_bytes': size
+        }
+
+
+def create_default_cache() -> Optional[ResponseCache]:
+    """按 tushare_config.py 中的配置创建缓存，未启用时返回None"""
+    try:
+        import tushare_config as config
+    except ImportError:
+        config = None
+    
+    if not getattr(config, 'CACHE_ENABLED', True):
+        return None
+    
+    return ResponseCache(
+        getattr(config, 'CACHE_PATH', DEFAULT_CACHE_PATH),
+        ttl=getattr(config, 'CACHE_TTL', DEFAULT_CACHE_TTL),
+        max_size_mb=getattr(config, 'CACHE_MAX_SIZE_MB', DEFAULT_CACHE_MAX_SIZE_MB),
+        open_period_ttl=getattr(config, 'CACHE_OPEN_PERIOD_TTL', DEFAULT_OPEN_PERIOD_TTL)
+    )
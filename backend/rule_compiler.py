@@ -0,0 +1,303 @@
+"""
+评分规则编译器
+将 indicator_definitions.scoring_criteria 中的评分标准（如 ">30%:12-15分,15-30%:8-11分,<15%:0-7分"）
+编译为有序的 NumPy 分档数组，所有指标通过同一条向量化路径（searchsorted）评分
+"""
+
+import logging
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database import DATABASE_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+# 未配置评分标准的指标使用的默认得分区间
+DEFAULT_BAND = (5.0, 8.0)
+
+# 指标定义：(指标代码, 指标名称, 维度, 权重, 满分, 评分标准)，与 database/schema.sql 一致
+DEFAULT_INDICATOR_DEFINITIONS = [
+    ('industry_lifecycle', '行业生命周期阶段', 'industry', 0.30, 20, '成长期:18-20分,成熟期:12-17分,衰退期:0-11分'),
+    ('market_growth_rate', '市场规模增速', 'industry', 0.25, 15, '>30%:12-15分,15-30%:8-11分,<15%:0-7分'),
+    ('industry_concentration', '行业集中度', 'industry', 0.20, 10, '高集中度:8-10分,中等集中度:5-7分,低集中度:0-4分'),
+    ('policy_support', '政策支持度', 'industry', 0.15, 8, '强支持:6-8分,一般支持:3-5分,无支持:0-2分'),
+    ('barrier_to_entry', '行业进入壁垒', 'industry', 0.10, 7, '高壁垒:5-7分,中等壁垒:3-4分,低壁垒:0-2分'),
+    ('market_share', '市场份额', 'competitiveness', 0.20, 15, '>20%:12-15分,10-20%:8-11分,<10%:0-7分'),
+    ('revenue_growth', '营收增速', 'competitiveness', 0.15, 12, '>30%:10-12分,15-30%:6-9分,<15%:0-5分'),
+    ('profit_margin', '利润率水平', 'competitiveness', 0.15, 10, '>20%:8-10分,10-20%:5-7分,<10%:0-4分'),
+    ('roe', '净资产收益率', 'competitiveness', 0.15, 10, '>15%:8-10分,8-15%:5-7分,<8%:0-4分'),
+    ('r_d_intensity', '研发投入强度', 'competitiveness', 0.10, 8, '>10%:6-8分,5-10%:3-5分,<5%:0-2分'),
+    ('brand_value', '品牌价值', 'competitiveness', 0.10, 8, '强品牌:6-8分,中等品牌:3-5分,弱品牌:0-2分'),
+    ('management_team', '管理团队', 'competitiveness', 0.15, 12, '优秀:10-12分,良好:6-9分,一般:0-5分'),
+    ('future_growth', '未来3年预期增速', 'growth', 0.30, 15, '>25%:12-15分,15-25%:8-11分,<15%:0-7分'),
+    ('new_business', '新业务增长', 'growth', 0.25, 12, '高潜力:10-12分,中等潜力:6-9分,低潜力:0-5分'),
+    ('market_expansion', '市场扩张能力', 'growth', 0.20, 10, '强扩张:8-10分,中等扩张:5-7分,弱扩张:0-4分'),
+    ('innovation_capability', '创新能力', 'growth', 0.25, 13, '强创新:10-13分,中等创新:6-9分,弱创新:0-5分'),
+    ('valuation_level', '估值水平', 'timing', 0.40, 15, '低估:12-15分,合理:8-11分,高估:0-7分'),
+    ('market_sentiment', '市场情绪', 'timing', 0.30, 10, '积极:8-10分,中性:5-7分,消极:0-4分'),
+    ('technical_trend', '技术趋势', 'timing', 0.30, 10, '上升趋势:8-10分,震荡趋势:5-7分,下降趋势:0-4分'),
+]
+
+# 评分流程中使用的英文分类值与评分标准中文标签的对应关系
+LABEL_ALIASES = {
+    'industry_lifecycle': {'growth': '成长期', 'mature': '成熟期', 'decline': '衰退期'},
+    'valuation_level': {'low': '低估', 'medium': '合理', 'high': '高估'},
+    'technical_trend': {'up': '上升趋势', 'sideways': '震荡趋势', 'down': '下降趋势'},
+}
+
+# 数值型指标的分档（按取值升序）也可用 low / medium / high 文本值指定
+NUMERIC_BAND_LABELS = ['low', 'medium', 'high']
+
+INDICATOR_DEFINITIONS_DDL = '''
+    CREATE TABLE IF NOT EXISTS indicator_definitions (
+        code TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        weight REAL NOT NULL,
+        max_score REAL NOT NULL,
+        scoring_criteria TEXT
+    )
+'''
+
+_BAND_RE = re.compile(r'^\s*(?P<cond>[^:：]+?)\s*[:：]\s*(?P<low>-?\d+(?:\.\d+)?)\s*-\s*(?P<high>-?\d+(?:\.\d+)?)\s*分?\s*$')
+_GT_RE = re.compile(r'^[>≥]=?\s*(-?\d+(?:\.\d+)?)%?$')
+_LT_RE = re.compile(r'^[<≤]=?\s*(-?\d+(?:\.\d+)?)%?$')
+_RANGE_RE = re.compile(r'^(-?\d+(?:\.\d+)?)%?\s*-\s*(-?\d+(?:\.\d+)?)%?$')
+
+
+class CompiledRule:
+    """编译后的单个指标评分规则，分档按取值（数值型）或标签（分类型）组织"""
+    
+    __slots__ = ('code', 'criteria', 'breakpoints', 'bounds', 'band_low', 'band_high', 'labels')
+    
+    def __init__(self, code: str, criteria: str, band_low: Sequence[float], band_high: Sequence[float],
+                 breakpoints: Sequence[float] = None, labels: Dict[str, int] = None):
+        """
+        Args:
+            code: 指标代码
+            criteria: 原始评分标准文本
+            band_low: 各分档得分下限
+            band_high: 各分档得分上限
+            breakpoints: 数值型指标的分档阈值（升序，比分档数少一个），分类型为None
+            labels: 文本值到分档序号的映射
+        """
+        self.code = code
+        self.criteria = criteria
+        self.band_low = np.asarray(band_low, dtype=float)
+        self.band_high = np.asarray(band_high, dtype=float)
+        self.breakpoints = None if breakpoints is None else np.asarray(breakpoints, dtype=float)
+        self.labels = labels or {}
+        
+        # 数值型指标各分档的取值区间，用于在得分区间内插值；两端的开放区间按相邻分档宽度外推
+        self.bounds = None
+        if self.breakpoints is not None and len(self.breakpoints):
+            points = self.breakpoints
+            width = points[-1] - points[0] if len(points) > 1 else abs(points[0]) or 1.0
+            lower = 0.0 if points[0] > 0 else points[0] - width
+            self.bounds = np.concatenate([[lower], points, [points[-1] + width / max(1, len(points) - 1)]])
+    
+    @property
+    def numeric(self) -> bool:
+        return self.breakpoints is not None
+    
+    def score(self, values, value_texts=None, deterministic: bool = True) -> np.ndarray:
+        """
+        向量化评分
+        
+        Args:
+            values: 数值型指标值数组，缺失值为 NaN
+            value_texts: 文本值数组，可为 None；有文本值的项按标签评分
+            deterministic: True 时数值型按取值在分档内的位置插值、分类型取区间中点，否则在区间内随机取值
+        
+        Returns:
+            与输入等长的得分数组
+        """
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        band = np.full(n, -1)
+        fraction = np.full(n, 0.5)
+        texts, has_text = _split_texts(n, value_texts)
+        
+        # 数值型
+        if self.numeric:
+            numeric = ~has_text & ~np.isnan(values)
+            idx = np.searchsorted(self.breakpoints, values[numeric], side='left')
+            band[numeric] = idx
+            # 只有一个分档时没有取值区间可插值，取得分区间中点
+            if self.bounds is not None:
+                lo = self.bounds[idx]
+                hi = self.bounds[idx + 1]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    fraction[numeric] = np.clip((values[numeric] - lo) / (hi - lo), 0, 1)
+        
+        # 分类型
+        if has_text.any():
+            band[has_text] = [self.labels.get(t, -1) for t in texts[has_text]]
+        
+        low = np.where(band >= 0, self.band_low[band], DEFAULT_BAND[0])
+        high = np.where(band >= 0, self.band_high[band], DEFAULT_BAND[1])
+        
+        # 缺失的数值无法评分
+        if self.numeric:
+            missing = ~has_text & np.isnan(values)
+            low[missing] = 0
+            high[missing] = 0
+        
+        if deterministic:
+            return low + (high - low) * fraction
+        return np.random.uniform(low, high)
+    
+    def recognized(self, values, value_texts=None) -> np.ndarray:
+        """
+        哪些输入能按本规则评分：数值型规则为非 NaN 的数值，或能识别的文本值；
+        缺失值和无法识别的文本返回False，评分时应跳过（不计入维度权重）
+        """
+        values = np.asarray(values, dtype=float)
+        texts, has_text = _split_texts(len(values), value_texts)
+        
+        valid = np.zeros(len(values), dtype=bool)
+        if self.numeric:
+            valid |= ~has_text & ~np.isnan(values)
+        if has_text.any():
+            valid[has_text] = [t in self.labels for t in texts[has_text]]
+        return valid
+
+
+def _split_texts(n: int, value_texts) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """文本值数组及哪些项有非空文本"""
+    if value_texts is None:
+        return None, np.zeros(n, dtype=bool)
+    texts = np.asarray(value_texts, dtype=object)
+    return texts, np.array([isinstance(t, str) and t != '' for t in texts], dtype=bool)
+
+
+def _parse_bands(criteria: str) -> List[Tuple[str, float, float]]:
+    bands = []
+    for part in re.split(r'[,，;；]', criteria or ''):
+        if not part.strip():
+            continue
+        match = _BAND_RE.match(part)
+        if not match:
+            raise ValueError(f"无法解析评分标准: {part}")
+        bands.append((match.group('cond').strip(), float(match.group('low')), float(match.group('high'))))
+    return bands
+
+
+def _parse_range(cond: str) -> Optional[Tuple[float, float]]:
+    """数值条件转为取值区间，不是数值条件时返回None"""
+    if _GT_RE.match(cond):
+        return float(_GT_RE.match(cond).group(1)), np.inf
+    if _LT_RE.match(cond):
+        return -np.inf, float(_LT_RE.match(cond).group(1))
+    if _RANGE_RE.match(cond):
+        match = _RANGE_RE.match(cond)
+        return float(match.group(1)), float(match.group(2))
+    return None
+
+
+def compile_rule(code: str, criteria: str) -> CompiledRule:
+    """
+    编译单个指标的评分标准
+    
+    数值型（">30%:12-15分,15-30%:8-11分,<15%:0-7分"）按区间下界排序得到分档阈值；
+    分类型（"成长期:18-20分,成熟期:12-17分"）按标签建立映射
+    """
+    bands = _parse_bands(criteria)
+    if not bands:
+        raise ValueError(f"评分标准为空: {code}")
+    
+    ranges = [_parse_range(cond) for cond, _, _ in bands]
+    if all(r is not None for r in ranges):
+        order = sorted(range(len(bands)), key=lambda i: ranges[i][0])
+        breakpoints = [ranges[i][0] for i in order[1:]]
+        band_low = [bands[i][1] for i in order]
+        band_high = [bands[i][2] for i in order]
+        labels = {}
+        if len(order) == len(NUMERIC_BAND_LABELS):
+            labels = {label: i for i, label in enumerate(NUMERIC_BAND_LABELS)}
+        return CompiledRule(code, criteria, band_low, band_high, breakpoints=breakpoints, labels=labels)
+    
+    if any(r is not None for r in ranges):
+        raise ValueError(f"评分标准混合了数值和分类条件: {code}")
+    
+    labels = {cond: i for i, (cond, _, _) in enumerate(bands)}
+    for alias, label in LABEL_ALIASES.get(code, {}).items():
+        if label in labels:
+            labels[alias] = labels[label]
+    return CompiledRule(
+        code, criteria,
+        [low for _, low, _ in bands],
+        [high for _, _, high in bands],
+        labels=labels
+    )
+
+
+def compile_rules(definitions: Sequence[tuple]) -> Dict[str, CompiledRule]:
+    """
+    编译指标定义列表
+    
+    Args:
+        definitions: (指标代码, 指标名称, 维度, 权重, 满分, 评分标准) 列表
+    
+    Returns:
+        {指标代码: 编译后的规则}，评分标准为空或无法解析的指标跳过（使用默认得分区间）
+    """
+    rules = {}
+    for code, _, _, _, _, criteria in definitions:
+        if not criteria:
+            continue
+        try:
+            rules[code] = compile_rule(code, criteria)
+        except ValueError as e:
+            logger.warning(f"跳过评分标准 {code}: {e}")
+    return rules
+
+
+def seed_indicator_definitions(conn: sqlite3.Connection):
+    """
+    创建指标定义表并写入默认定义（已有的定义保留）
+    
+    由调用方提交
+    """
+    conn.execute(INDICATOR_DEFINITIONS_DDL)
+    conn.executemany('''
+        INSERT OR IGNORE INTO indicator_definitions (code, name, dimension, weight, max_score, scoring_criteria)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', DEFAULT_INDICATOR_DEFINITIONS)
+
+
+def load_rule_table(conn: sqlite3.Connection = None) -> Dict[str, CompiledRule]:
+    """
+    从 indicator_definitions 表读取并编译评分规则，表不存在或为空时使用默认定义
+    """
+    definitions = []
+    if conn is not None:
+        try:
+            definitions = conn.execute('''
+                SELECT code, name, dimension, weight, max_score, scoring_criteria
+                FROM indicator_definitions
+            ''').fetchall()
+        except sqlite3.OperationalError:
+            definitions = []
+    
+    return compile_rules(definitions or DEFAULT_INDICATOR_DEFINITIONS)
+
+
+def load_default_rules(path: str = DATABASE_PATH) -> Dict[str, CompiledRule]:
+    """
+    从应用数据库读取评分规则，数据库文件不存在时使用默认定义
+    
+    修改 indicator_definitions 表中的评分标准后，新建的评分计算器即按新标准评分
+    """
+    if not os.path.exists(path):
+        return compile_rules(DEFAULT_INDICATOR_DEFINITIONS)
+    
+    conn = connect(path)
+    try:
+        return load_rule_table(conn)
+    finally:
+        conn.close()
@@ -2,14 +2,34 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
 import logging
+import sqlite3
 from datetime import datetime
 
+from rule_compiler import DEFAULT_BAND, CompiledRule, load_default_rules, load_rule_table
+from score_memo import ScoreMemo, ruleset_version
+
 logger = logging.getLogger(__name__)
 
 class StockScoreCalculator:
     """股票评分计算器"""
     
-    def __init__(self):
+    def __init__(self, deterministic: bool = True, rules: Dict[str, CompiledRule] = None,
+                 conn: sqlite3.Connection = None, memo: ScoreMemo = None):
+        """
+        初始化评分计算器
+        
+        Args:
+            deterministic: 确定性模式，指标得分按指标值在分档区间内线性插值（分类型取区间中点），
+                           相同输入总是得到相同得分；为False时在区间内随机取值
+            rules: {指标代码: 编译后的评分规则}，为None时从 indicator_definitions 表读取
+            conn: 读取 indicator_definitions 表的数据库连接，为None时使用应用数据库；
+                  表不存在或为空时使用默认指标定义
+            memo: 评分记忆表（可由 score_memo.create_default_memo 创建），batch_calculate_scores
+                  据此跳过输入未变化的指标和维度；仅在确定性模式下使用
+        """
+        self.deterministic = deterministic
+        self.memo = memo if deterministic else None
+        
         self.indicator_weights = {
             'industry': 0.30,
             'competitiveness': 0.40,
@@ -17,78 +37,60 @@ class StockScoreCalculator:
             'timing': 0.10
         }
         
-        self.scoring_rules = {
-            'industry_lifecycle': {
-                'growth': (18, 20),
-                'mature': (12, 17),
-                'decline': (0, 11)
-            },
-            'market_growth_rate': {
-                'high': (12, 15),
-                'medium': (8, 11),
-                'low': (0, 7)
-            },
-            'revenue_growth': {
-                'high': (10, 12),
-                'medium': (6, 9),
-                'low': (0, 5)
-            },
-            'roe': {
-                'high': (8, 10),
-                'medium': (5, 7),
-                'low': (0, 4)
-            },
-            'valuation_level': {
-                'low': (12, 15),
-                'medium': (8, 11),
-                'high': (0, 7)
-            }
-        }
+        # 编译后的评分规则（按 indicator_definitions 表中的评分标准）
+        if rules is None:
+            rules = load_rule_table(conn) if conn is not None else load_default_rules()
+        self.rules = rules
+        
+        if self.memo is not None and self.memo.ruleset != self.ruleset:
+            raise ValueError(f"评分记忆表的规则版本 {self.memo.ruleset} 与当前规则 {self.ruleset} 不一致")
+    
+    @property
+    def ruleset(self) -> str:
+        """评分规则版本号，规则或权重变化时改变"""
+        return ruleset_version(self.indicator_weights, {code: rule.criteria for code, rule in self.rules.items()})
     
     def calculate_indicator_score(self, indicator_code: str, value: float, value_text: str = None) -> float:
         """计算单个指标得分"""
         try:
-            if indicator_code in self.scoring_rules:
-                rules = self.scoring_rules[indicator_code]
-                
-                if value_text:
-                    # 分类型指标
-                    if value_text in rules:
-                        min_score, max_score = rules[value_text]
-                        return np.random.uniform(min_score, max_score)
-                else:
-                    # 数值型指标
-                    if indicator_code == 'market_growth_rate':
-                        if value > 30:
-                            return np.random.uniform(12, 15)
-                        elif value > 15:
-                            return np.random.uniform(8, 11)
-                        else:
-                            return np.random.uniform(0, 7)
-                    
-                    elif indicator_code == 'revenue_growth':
-                        if value > 30:
-                            return np.random.uniform(10, 12)
-                        elif value > 15:
-                            return np.random.uniform(6, 9)
-                        else:
-                            return np.random.uniform(0, 5)
-                    
-                    elif indicator_code == 'roe':
-                        if value > 15:
-                            return np.random.uniform(8, 10)
-                        elif value > 8:
-                            return np.random.uniform(5, 7)
-                        else:
-                            return np.random.uniform(0, 4)
-            
-            # 默认评分规则
-            return np.random.uniform(5, 8)
-            
+            return float(self.calculate_indicator_scores(
+                indicator_code, [np.nan if value is None else value], [value_text]
+            )[0])
+        
         except Exception as e:
             logger.error(f"计算指标得分失败 {indicator_code}: {e}")
             return 0
     
+    def indicator_validity(self, indicator_code: str, values, value_texts=None) -> np.ndarray:
+        """
+        哪些指标值可以参与评分
+        
+        缺失的数值和无法识别的文本值不参与评分，不计入所在维度的权重，
+        与股票的指标列表中没有该指标时相同
+        """
+        values = np.asarray(values, dtype=float)
+        
+        rule = self.rules.get(indicator_code)
+        if rule is not None:
+            return rule.recognized(values, value_texts)
+        
+        # 未配置评分标准的指标：有值即可按默认得分区间评分
+        valid = ~np.isnan(values)
+        if value_texts is not None:
+            valid |= np.array([isinstance(t, str) and t != '' for t in value_texts], dtype=bool)
+        return valid
+    
+    def scorable_indicators(self, indicators: List[Dict]) -> List[Dict]:
+        """过滤掉缺失或无法识别的指标"""
+        return [
+            indicator for indicator in indicators
+            if self.indicator_validity(
+                indicator['code'],
+                [np.nan if indicator.get('value') is None else indicator['value']],
+                [indicator.get('value_text')]
+            )[0]
+        ]
+    
     def calculate_dimension_score(self, indicators: List[Dict], dimension: str) -> float:
         """计算维度得分"""
         dimension_indicators = [i for i in indicators if i['dimension'] == dimension]
@@ -118,31 +120,72 @@ class StockScoreCalculator:
             for dimension in ['industry', 'competitiveness', 'growth', 'timing']:
                 dimension_scores[dimension] = self.calculate_dimension_score(indicators, dimension)
             
-            # 计算总分
-            total_score = sum(dimension_scores[dim] * self.indicator_weights[dim] 
-                            for dim in dimension_scores)
-            
-            # 确定潜力等级
-            if total_score >= 80:
-                potential_level = 'very_high'
-            elif total_score >= 60:
-                potential_level = 'high'
-            elif total_score >= 40:
-                potential_level = 'medium'
-            else:
-                potential_level = 'low'
+            return self._build_score_result(stock_code, dimension_scores)
+        
+        except Exception as e:
+            logger.error(f"计算总分失败 {stock_code}: {e}")
+            return None
+    
+    def _build_score_result(self, stock_code: str, dimension_scores: Dict[str, float]) -> Dict:
+        """由各维度得分计算总分和潜力等级"""
+        # 计算总分
+        total_score = sum(dimension_scores[dim] * self.indicator_weights[dim] 
+                        for dim in dimension_scores)
+        
+        # 确定潜力等级
+        if total_score >= 80:
+            potential_level = 'very_high'
+        elif total_score >= 60:
+            potential_level = 'high'
+        elif total_score >= 40:
+            potential_level = 'medium'
+        else:
+            potential_level = 'low'
+        
+        return {
+            'stock_code': stock_code,
+            'total_score': round(total_score, 2),
+            'industry_score': round(dimension_scores['industry'], 2),
+            'competitiveness_score': round(dimension_scores['competitiveness'], 2),
+            'growth_score': round(dimension_scores['growth'], 2),
+            'timing_score': round(dimension_scores['timing'], 2),
+            'potential_level': potential_level,
+            'score_date': datetime.now().strftime('%Y-%m-%d')
+        }
+    
+    def calculate_total_score_memoized(self, stock_code: str, indicators: List[Dict]) -> Dict:
+        """
+        使用记忆表计算总分
+        
+        指标得分按 (指标代码, 值分桶, 文本值) 复用；某个维度所有指标的输入指纹与上次相同时
+        直接复用该维度得分，只有输入变化的维度才重新计算
+        """
+        try:
+            memo = self.memo
+            keys_by_dimension = {}
+            for indicator in indicators:
+                key = memo.indicator_key(indicator['code'], indicator.get('value'), indicator.get('value_text'))
+                score = memo.get_indicator(key)
+                if score is None:
+                    value = memo.bucket_value(key[1])
+                    score = self.calculate_indicator_score(indicator['code'], value, indicator.get('value_text'))
+                    memo.put_indicator(key, score)
+                indicator['score'] = score
+                keys_by_dimension.setdefault(indicator['dimension'], []).append(
+                    list(key) + [indicator.get('weight', 1.0)]
+                )
             
-            return {
-                'stock_code': stock_code,
-                'total_score': round(total_score, 2),
-                'industry_score': round(dimension_scores['industry'], 2),
-                'competitiveness_score': round(dimension_scores['competitiveness'], 2),
-                'growth_score': round(dimension_scores['growth'], 2),
-                'timing_score': round(dimension_scores['timing'], 2),
-                'potential_level': potential_level,
-                'score_date': datetime.now().strftime('%Y-%m-%d')
-            }
+            dimension_scores = {}
+            for dimension in ['industry', 'competitiveness', 'growth', 'timing']:
+                fingerprint = memo.fingerprint(keys_by_dimension.get(dimension, []))
+                score = memo.get_dimension(stock_code, dimension, fingerprint)
+                if score is None:
+                    score = self.calculate_dimension_score(indicators, dimension)
+                    memo.put_dimension(stock_code, dimension, fingerprint, score)
+                dimension_scores[dimension] = score
             
+            return self._build_score_result(stock_code, dimension_scores)
+        
         except Exception as e:
             logger.error(f"计算总分失败 {stock_code}: {e}")
             return None
@@ -169,8 +212,13 @@ class StockScoreCalculator:
         
         for stock_code in stock_codes:
             try:
-                stock_indicators = indicator_data.get(stock_code, [])
-                if stock_indicators:
+                stock_indicators = self.scorable_indicators(indicator_data.get(stock_code, []))
+                if stock_indicators and self.memo is not None:
+                    score_result = self.calculate_total_score_memoized(stock_code, stock_indicators)
+                    if score_result:
+                        results.append(score_result)
+                
+                elif stock_indicators:
                     # 计算每个指标的得分
                     for indicator in stock_indicators:
                         score = self.calculate_indicator_score(
@@ -184,9 +232,160 @@ class StockScoreCalculator:
                     score_result = self.calculate_total_score(stock_code, stock_indicators)
                     if score_result:
                         results.append(score_result)
-                        
+            
             except Exception as e:
                 logger.error(f"批量计算评分失败 {stock_code}: {e}")
                 continue
         
-        return results
\ No newline at end of file
+        if self.memo is not None:
+            self.memo.flush()
+            logger.info(f"评分记忆表统计: {self.memo.stats()}")
+        
+        return results
+    
+    def calculate_indicator_scores(self, indicator_code: str, values, value_texts=None) -> np.ndarray:
+        """
+        向量化计算单个指标在所有股票上的得分
+        
+        按编译后的分档数组一次 searchsorted 完成，未配置评分标准的指标使用默认得分区间
+        
+        Args:
+            indicator_code: 指标代码
+            values: 数值型指标值数组，缺失值为 NaN
+            value_texts: 分类型指标文本数组，可为 None
+        
+        Returns:
+            与输入等长的得分数组
+        """
+        values = np.asarray(values, dtype=float)
+        
+        rule = self.rules.get(indicator_code)
+        if rule is not None:
+            return rule.score(values, value_texts, self.deterministic)
+        
+        # 默认评分规则
+        low, high = DEFAULT_BAND
+        if self.deterministic:
+            return np.full(len(values), (low + high) / 2)
+        return np.random.uniform(low, high, len(values))
+    
+    def calculate_indicator_score_matrix(self, data, indicators: List[Dict], stock_codes: List[str] = None) -> pd.DataFrame:
+        """
+        计算指标得分矩阵
+        
+        Args:
+            data: DataFrame（行索引为股票代码，列为指标代码）或 NumPy 矩阵（股票 × 指标）
+            indicators: 指标定义列表，每项包含 code、dimension、weight
+            stock_codes: data 为 NumPy 矩阵时对应的股票代码
+        
+        Returns:
+            行为股票、列为指标代码的得分 DataFrame，缺失或无法识别的指标值得分为 NaN
+        """
+        codes = [indicator['code'] for indicator in indicators]
+        
+        if isinstance(data, pd.DataFrame):
+            frame = data.reindex(columns=codes)
+        else:
+            frame = pd.DataFrame(np.asarray(data), index=stock_codes, columns=codes)
+        
+        scores = np.empty((len(frame), len(codes)), dtype=float)
+        for j, code in enumerate(codes):
+            column = frame[code]
+            if not pd.api.types.is_numeric_dtype(column):
+                # 分类型与数值型混合的列：字符串作为文本值，其余转为数值
+                is_text = column.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+                column = column.astype(object)
+                value_texts = column.where(is_text)
+                values = pd.to_numeric(column.mask(is_text), errors='coerce').to_numpy(dtype=float)
+            else:
+                value_texts = None
+                values = column.to_numpy(dtype=float)
+            scores[:, j] = self.calculate_indicator_scores(code, values, value_texts)
+            scores[~self.indicator_validity(code, values, value_texts), j] = np.nan
+        
+        return pd.DataFrame(scores, index=frame.index, columns=codes)
+    
+    def batch_calculate_scores_columnar(self, data, indicators: List[Dict], stock_codes: List[str] = None) -> List[Dict]:
+        """
+        列式批量计算评分
+        
+        一次性对整个股票 × 指标矩阵计算指标得分、维度得分、总分和潜力等级，
+        返回结果与 batch_calculate_scores 相同
+        
+        Args:
+            data: DataFrame（行索引为股票代码，列为指标代码）或 NumPy 矩阵（股票 × 指标）
+            indicators: 指标定义列表，每项包含 code、dimension、weight
+            stock_codes: data 为 NumPy 矩阵时对应的股票代码
+        
+        Returns:
+            评分结果列表
+        """
+        try:
+            scores = self.calculate_indicator_score_matrix(data, indicators, stock_codes)
+            return self.score_results_from_matrix(scores, indicators)
+        
+        except Exception as e:
+            logger.error(f"列式批量计算评分失败: {e}")
+            return []
+    
+    def score_results_from_matrix(self, scores: pd.DataFrame, indicators: List[Dict]) -> List[Dict]:
+        """
+        由指标得分矩阵计算维度得分、总分和潜力等级
+        
+        Args:
+            scores: calculate_indicator_score_matrix 返回的得分 DataFrame
+            indicators: 指标定义列表，每项包含 code、dimension、weight
+        
+        Returns:
+            评分结果列表
+        """
+        # 得分为 NaN 的指标不参与评分：加权和与权重合计都只计有效的指标
+        score_values = scores.to_numpy()
+        valid = ~np.isnan(score_values)
+        score_values = np.where(valid, score_values, 0.0)
+        
+        weights = np.array([indicator.get('weight', 1.0) for indicator in indicators], dtype=float)
+        dimensions = np.array([indicator['dimension'] for indicator in indicators], dtype=object)
+        
+        # 计算各维度得分（维度内加权平均）
+        dimension_names = ['industry', 'competitiveness', 'growth', 'timing']
+        dimension_scores = np.zeros((len(scores), len(dimension_names)), dtype=float)
+        for k, dimension in enumerate(dimension_names):
+            mask = dimensions == dimension
+            total_weight = valid[:, mask] @ weights[mask]
+            weighted = score_values[:, mask] @ weights[mask]
+            nonzero = total_weight != 0
+            dimension_scores[nonzero, k] = weighted[nonzero] / total_weight[nonzero]
+        
+        # 计算总分
+        dimension_weights = np.array([self.indicator_weights[dim] for dim in dimension_names])
+        total_scores = dimension_scores @ dimension_weights
+        
+        # 确定潜力等级
+        potential_levels = np.select(
+            [total_scores >= 80, total_scores >= 60, total_scores >= 40],
+            ['very_high', 'high', 'medium'],
+            default='low'
+        )
+        
+        score_date = datetime.now().strftime('%Y-%m-%d')
+        rounded = np.round(dimension_scores, 2).tolist()
+        
+        return [
+            {
+                'stock_code': stock_code,
+                'total_score': total,
+                'industry_score': dims[0],
+                'competitiveness_score': dims[1],
+                'growth_score': dims[2],
+                'timing_score': dims[3],
+                'potential_level': level,
+                'score_date': score_date
+            }
+            for stock_code, total, dims, level in zip(
+                scores.index.tolist(),
+                np.round(total_scores, 2).tolist(),
+                rounded,
+                potential_levels.tolist()
+            )
+        ]
@@ -0,0 +1,156 @@
+"""
+评分数据流式导出
+用一条查询按股票顺序遍历最新评分及其评分明细，逐块生成 NDJSON / CSV / Parquet 字节流，内存占用与数据量无关
+"""
+
+import csv
+import io
+import json
+import sqlite3
+from typing import Iterator, List, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # 未安装pyarrow时不支持Parquet导出
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# 每次从游标读取的行数
+EXPORT_CHUNK_ROWS = 2000
+
+SCORE_COLUMNS = [
+    'stock_code', 'stock_name', 'industry', 'current_price', 'total_score',
+    'industry_score', 'competitiveness_score', 'growth_score', 'timing_score',
+    'potential_level', 'score_date'
+]
+DETAIL_COLUMNS = ['code', 'name', 'dimension', 'value', 'value_text', 'score', 'max_score', 'weight']
+
+EXPORT_SQL = f'''
+    SELECT {', '.join('l.' + column for column in SCORE_COLUMNS)},
+           {', '.join('d.' + column for column in DETAIL_COLUMNS)}
+    FROM latest_score l
+    LEFT JOIN score_details d ON d.stock_code = l.stock_code
+    ORDER BY l.stock_code, d.dimension, d.code
+'''
+
+
+def iter_export_rows(conn: sqlite3.Connection, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[List[tuple]]:
+    """按块遍历 (评分列 + 明细列) 的扁平行，每只股票的明细行相邻"""
+    cursor = conn.execute(EXPORT_SQL)
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        yield rows
+
+
+def _group_by_stock(chunks: Iterator[List[tuple]]) -> Iterator[List[Tuple[tuple, List[tuple]]]]:
+    """把扁平行合并为 (评分行, [明细行]) ，按块输出；跨块的股票留到下一块"""
+    n_scores = len(SCORE_COLUMNS)
+    pending = None
+    for rows in chunks:
+        grouped = []
+        for row in rows:
+            score, detail = row[:n_scores], row[n_scores:]
+            if pending is None or pending[0][0] != score[0]:
+                if pending is not None:
+                    grouped.append(pending)
+                pending = (score, [])
+            if detail[0] is not None:
+                pending[1].append(detail)
+        if grouped:
+            yield grouped
+    if pending is not None:
+        yield [pending]
+
+
+def ndjson_chunks(conn: sqlite3.Connection, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """每只股票一行JSON，details 为其评分明细列表"""
+    for grouped in _group_by_stock(iter_export_rows(conn, chunk_rows)):
+        lines = []
+        for score, details in grouped:
+            record = dict(zip(SCORE_COLUMNS, score))
+            record['details'] = [dict(zip(DETAIL_COLUMNS, detail)) for detail in details]
+            lines.append(json.dumps(record, ensure_ascii=False))
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def csv_chunks(conn: sqlite3.Connection, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """每条评分明细一行，评分列在每行重复；没有明细的股票输出一行空明细"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SCORE_COLUMNS + ['detail_' + column for column in DETAIL_COLUMNS])
+    
+    # UTF-8 BOM，方便Excel直接打开
+    yield ('﻿' + buffer.getvalue()).encode('utf-8')
+    
+    for rows in iter_export_rows(conn, chunk_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """只追加的文件对象，ParquetWriter 写入的字节在每个行组后取走"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_chunks(conn: sqlite3.Connection, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """每条评分明细一行，每块写为一个行组"""
+    if pa is None:
+        raise RuntimeError("Parquet导出需要安装pyarrow")
+    
+    columns = SCORE_COLUMNS + ['detail_' + column for column in DETAIL_COLUMNS]
+    text = {'stock_code', 'stock_name', 'industry', 'potential_level', 'score_date',
+            'detail_code', 'detail_name', 'detail_dimension', 'detail_value_text'}
+    schema = pa.schema([(column, pa.string() if column in text else pa.float64()) for column in columns])
+    
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in iter_export_rows(conn, chunk_rows):
+            writer.write_table(pa.Table.from_pylist([dict(zip(columns, row)) for row in rows], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(conn: sqlite3.Connection, fmt: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """按格式生成导出字节流"""
+    if fmt == 'ndjson':
+        return ndjson_chunks(conn, chunk_rows)
+    if fmt == 'csv':
+        return csv_chunks(conn, chunk_rows)
+    if fmt == 'parquet':
+        return parquet_chunks(conn, chunk_rows)
+    raise ValueError(f"不支持的导出格式: {fmt}")
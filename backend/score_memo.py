@@ -0,0 +1,225 @@
+"""
+指标评分记忆表
+按 (指标代码, 指标值分桶, 文本值, 规则版本) 持久化指标得分，按股票和维度记录输入指纹与维度得分，
+输入未变化的股票不再重新计算；评分规则变化后旧版本的数据自动淘汰
+"""
+
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+# 默认配置（tushare_config.py 中未配置时使用）
+DEFAULT_MEMO_PATH = 'score_memo.db'
+DEFAULT_BUCKET_RESOLUTION = 0.01   # 数值型指标值的分桶精度
+
+IndicatorKey = Tuple[str, str, str]
+
+
+def ruleset_version(*rules) -> str:
+    """根据评分规则生成版本号，规则任何变化都会得到新的版本号"""
+    raw = json.dumps(rules, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class ScoreMemo:
+    """基于SQLite文件的评分记忆表，运行时全部载入内存，新结果在 flush 时批量写回"""
+    
+    def __init__(self, path: str, ruleset: str, resolution: float = DEFAULT_BUCKET_RESOLUTION):
+        """
+        初始化记忆表
+        
+        Args:
+            path: 记忆表文件路径
+            ruleset: 当前评分规则版本号，其他版本的数据在打开时淘汰
+            resolution: 数值型指标值的分桶精度，同一桶内的值视为相同输入
+        """
+        self.path = path
+        self.ruleset = ruleset
+        self.resolution = resolution
+        self.indicator_hits = 0
+        self.indicator_misses = 0
+        self.dimension_hits = 0
+        self.dimension_misses = 0
+        self.logger = logging.getLogger(__name__)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS indicator_score_memo (
+                indicator_code TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                value_text TEXT NOT NULL,
+                ruleset TEXT NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (indicator_code, bucket, value_text, ruleset)
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS dimension_score_memo (
+                stock_code TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                ruleset TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (stock_code, dimension, ruleset)
+            )
+        ''')
+        self.evict_stale()
+        
+        self._indicators: Dict[IndicatorKey, float] = {
+            (code, bucket, text): score
+            for code, bucket, text, score in self._conn.execute(
+                'SELECT indicator_code, bucket, value_text, score FROM indicator_score_memo WHERE ruleset = ?',
+                (ruleset,)
+            )
+        }
+        self._dimensions: Dict[Tuple[str, str], Tuple[str, float]] = {
+            (stock_code, dimension): (fingerprint, score)
+            for stock_code, dimension, fingerprint, score in self._conn.execute(
+                'SELECT stock_code, dimension, fingerprint, score FROM dimension_score_memo WHERE ruleset = ?',
+                (ruleset,)
+            )
+        }
+        self._pending_indicators: Dict[IndicatorKey, float] = {}
+        self._pending_dimensions: Dict[Tuple[str, str], Tuple[str, float]] = {}
+    
+    def evict_stale(self) -> int:
+        """删除其他规则版本的数据，返回删除的行数"""
+        with self._lock:
+            deleted = self._conn.execute(
+                'DELETE FROM indicator_score_memo WHERE ruleset != ?', (self.ruleset,)
+            ).rowcount
+            deleted += self._conn.execute(
+                'DELETE FROM dimension_score_memo WHERE ruleset != ?', (self.ruleset,)
+            ).rowcount
+            self._conn.commit()
+        
+        if deleted:
+            self.logger.info(f"评分规则已变化，淘汰 {deleted} 条旧版本记忆数据")
+        return deleted
+    
+    def bucket(self, value: Optional[float]) -> str:
+        """数值分桶（分桶序号的字符串），缺失值返回空串"""
+        if value is None or math.isnan(float(value)):
+            return ''
+        return str(int(round(float(value) / self.resolution)))
+    
+    def bucket_value(self, bucket: str) -> Optional[float]:
+        """分桶对应的代表值（用于计算得分），缺失值返回None"""
+        return int(bucket) * self.resolution if bucket else None
+    
+    def indicator_key(self, indicator_code: str, value: Optional[float], value_text: str = None) -> IndicatorKey:
+        """指标得分的记忆键，分类型指标只按文本值区分"""
+        return (indicator_code, '' if value_text else self.bucket(value), value_text or '')
+    
+    def get_indicator(self, key: IndicatorKey) -> Optional[float]:
+        """读取指标得分，未命中时返回None"""
+        with self._lock:
+            score = self._indicators.get(key)
+            if score is None:
+                self.indicator_misses += 1
+            else:
+                self.indicator_hits += 1
+        return score
+    
+    def put_indicator(self, key: IndicatorKey, score: float):
+        """记录指标得分"""
+        with self._lock:
+            self._indicators[key] = score
+            self._pending_indicators[key] = score
+    
+    @staticmethod
+    def fingerprint(keys: Iterable[Tuple]) -> str:
+        """维度输入指纹：由该维度所有指标的记忆键和权重生成"""
+        raw = json.dumps(sorted(keys, key=repr), ensure_ascii=False)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    def get_dimension(self, stock_code: str, dimension: str, fingerprint: str) -> Optional[float]:
+        """读取维度得分，指纹不一致（输入有变化）时返回None"""
+        with self._lock:
+            entry = self._dimensions.get((stock_code, dimension))
+            if entry is None or entry[0] != fingerprint:
+                self.dimension_misses += 1
+                return None
+            self.dimension_hits += 1
+        return entry[1]
+    
+    def put_dimension(self, stock_code: str, dimension: str, fingerprint: str, score: float):
+        """记录维度得分及其输入指纹"""
+        with self._lock:
+            self._dimensions[(stock_code, dimension)] = (fingerprint, score)
+            self._pending_dimensions[(stock_code, dimension)] = (fingerprint, score)
+    
+    def flush(self):
+        """将新记录的得分批量写回文件"""
+        with self._lock:
+            if not self._pending_indicators and not self._pending_dimensions:
+                return
+            try:
+                self._conn.executemany('''
+                    INSERT OR REPLACE INTO indicator_score_memo (indicator_code, bucket, value_text, ruleset, score)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(code, bucket, text, self.ruleset, score)
+                      for (code, bucket, text), score in self._pending_indicators.items()])
+                self._conn.executemany('''
+                    INSERT OR REPLACE INTO dimension_score_memo (stock_code, dimension, ruleset, fingerprint, score)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(stock_code, dimension, self.ruleset, fingerprint, score)
+                      for (stock_code, dimension), (fingerprint, score) in self._pending_dimensions.items()])
+                self._conn.commit()
+                self._pending_indicators.clear()
+                self._pending_dimensions.clear()
+            except Exception as e:
+                self.logger.error(f"写入评分记忆表失败: {e}")
+                self._conn.rollback()
+    
+    def clear(self):
+        """清空记忆表"""
+        with self._lock:
+            self._conn.execute('DELETE FROM indicator_score_memo')
+            self._conn.execute('DELETE FROM dimension_score_memo')
+            self._conn.commit()
+            self._indicators.clear()
+            self._dimensions.clear()
+            self._pending_indicators.clear()
+            self._pending_dimensions.clear()
+    
+    def stats(self) -> Dict:
+        """命中率统计"""
+        def rate(hits, misses):
+            total = hits + misses
+            return round(hits / total, 4) if total else 0.0
+        
+        with self._lock:
+            return {
+                'ruleset': self.ruleset,
+                'indicator_hits': self.indicator_hits,
+                'indicator_misses': self.indicator_misses,
+                'indicator_hit_rate': rate(self.indicator_hits, self.indicator_misses),
+                'dimension_hits': self.dimension_hits,
+                'dimension_misses': self.dimension_misses,
+                'dimension_hit_rate': rate(self.dimension_hits, self.dimension_misses),
+                'indicator_entries': len(self._indicators),
+                'dimension_entries': len(self._dimensions)
+            }
+
+
+def create_default_memo(ruleset: str) -> Optional[ScoreMemo]:
+    """按 tushare_config.py 中的配置创建评分记忆表，未启用时返回None"""
+    try:
+        import tushare_config as config
+    except ImportError:
+        config = None
+    
+    if not getattr(config, 'SCORE_MEMO_ENABLED', True):
+        return None
+    
+    return ScoreMemo(
+        getattr(config, 'SCORE_MEMO_PATH', DEFAULT_MEMO_PATH),
+        ruleset,
+        resolution=getattr(config, 'SCORE_MEMO_RESOLUTION', DEFAULT_BUCKET_RESOLUTION)
+    )
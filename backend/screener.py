@@ -0,0 +1,195 @@
+"""
+多条件选股
+把结构化的筛选表达式编译为参数化SQL，在最新评分和股票信息上执行，支持排序和游标分页
+
+表达式是条件或 and/or 组合的嵌套结构，例如：
+    {"and": [
+        {"field": "competitiveness_score", "op": ">=", "value": 80},
+        {"field": "growth_score", "op": ">=", "value": 70},
+        {"field": "industry", "op": "in", "value": ["白酒", "银行业"]},
+        {"field": "market_cap", "op": "<", "value": 500}
+    ]}
+"""
+
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+from pagination import decode_cursor, make_page, seek_condition
+
+# 可筛选的字段及对应的列
+FIELDS = {
+    'stock_code': 'l.stock_code',
+    'stock_name': 'l.stock_name',
+    'industry': 'l.industry',
+    'current_price': 'l.current_price',
+    'market_cap': 's.market_cap',
+    'total_score': 'l.total_score',
+    'industry_score': 'l.industry_score',
+    'competitiveness_score': 'l.competitiveness_score',
+    'growth_score': 'l.growth_score',
+    'timing_score': 'l.timing_score',
+    'potential_level': 'l.potential_level',
+    'score_date': 'l.score_date',
+}
+
+# 可排序的字段
+SORT_FIELDS = [
+    'total_score', 'industry_score', 'competitiveness_score', 'growth_score', 'timing_score',
+    'current_price', 'market_cap'
+]
+
+COMPARISONS = {'=': '=', '!=': '!=', '>': '>', '>=': '>=', '<': '<', '<=': '<='}
+
+# 可以作为查询参数的取值类型
+SCALAR_TYPES = (str, int, float, bool)
+
+MAX_CONDITIONS = 50    # 表达式中最多的条件数
+MAX_IN_VALUES = 1000   # in / not in 最多的取值个数
+MAX_DEPTH = 8          # 最大嵌套层数
+
+SELECT_COLUMNS = [
+    'stock_code', 'stock_name', 'industry', 'current_price', 'market_cap', 'total_score',
+    'industry_score', 'competitiveness_score', 'growth_score', 'timing_score',
+    'potential_level', 'score_date'
+]
+
+
+class FilterCompiler:
+    """把筛选表达式编译为 WHERE 子句和参数"""
+    
+    def __init__(self):
+        self.params: List = []
+        self.conditions = 0
+    
+    def compile(self, node: Dict, depth: int = 0) -> str:
+        if not isinstance(node, dict):
+            raise ValueError("筛选条件必须是对象")
+        if depth > MAX_DEPTH:
+            raise ValueError(f"筛选表达式嵌套不能超过 {MAX_DEPTH} 层")
+        
+        for combinator in ('and', 'or'):
+            if combinator in node:
+                children = node[combinator]
+                if not isinstance(children, list) or not children:
+                    raise ValueError(f"{combinator} 需要非空的条件列表")
+                parts = [self.compile(child, depth + 1) for child in children]
+                return '(' + f' {combinator.upper()} '.join(parts) + ')'
+        
+        if 'not' in node:
+            return f"NOT {self.compile(node['not'], depth + 1)}"
+        
+        return self.condition(node)
+    
+    def condition(self, node: Dict) -> str:
+        self.conditions += 1
+        if self.conditions > MAX_CONDITIONS:
+            raise ValueError(f"筛选条件不能超过 {MAX_CONDITIONS} 个")
+        
+        field, op, value = node.get('field'), str(node.get('op', '')).lower(), node.get('value')
+        if field not in FIELDS:
+            raise ValueError(f"不支持的筛选字段: {field}")
+        column = FIELDS[field]
+        
+        if op in COMPARISONS:
+            if not isinstance(value, SCALAR_TYPES):
+                raise ValueError(f"{field} {op} 需要单个取值")
+            self.params.append(value)
+            return f"{column} {COMPARISONS[op]} ?"
+        
+        if op in ('in', 'not in'):
+            if not isinstance(value, list) or not value:
+                raise ValueError(f"{field} {op} 需要非空的取值列表")
+            if len(value) > MAX_IN_VALUES:
+                raise ValueError(f"{op} 的取值不能超过 {MAX_IN_VALUES} 个")
+            if not all(isinstance(item, SCALAR_TYPES) for item in value):
+                raise ValueError(f"{field} {op} 的取值只能是字符串或数值")
+            self.params.extend(value)
+            return f"{column} {op.upper()} ({', '.join('?' * len(value))})"
+        
+        if op == 'between':
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError(f"{field} between 需要 [下限, 上限]")
+            if not all(isinstance(item, SCALAR_TYPES) for item in value):
+                raise ValueError(f"{field} between 的上下限只能是字符串或数值")
+            self.params.extend(value)
+            return f"{column} BETWEEN ? AND ?"
+        
+        if op in ('is null', 'is not null'):
+            return f"{column} {op.upper()}"
+        
+        raise ValueError(f"不支持的比较运算: {op}")
+
+
+def compile_screen(expression: Optional[Dict], sort: str = 'total_score', descending: bool = True,
+                   limit: int = 50, cursor: str = None) -> Tuple[str, List]:
+    """
+    编译选股查询
+    
+    排序按 (排序字段, 股票代码) 同方向进行，排序字段为空的股票不参与排序和返回
+    
+    Args:
+        expression: 筛选表达式，为空时不筛选
+        sort: 排序字段
+        descending: 是否降序
+        limit: 每页数量（查询多取一行用于判断是否还有下一页）
+        cursor: 上一页返回的游标
+    
+    Returns:
+        (SQL, 参数)
+    
+    Raises:
+        ValueError: 表达式、排序字段或游标无效
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"不支持的排序字段: {sort}")
+    
+    compiler = FilterCompiler()
+    where = [compiler.compile(expression)] if expression else []
+    params = compiler.params
+    
+    sort_column = FIELDS[sort]
+    where.append(f"{sort_column} IS NOT NULL")
+    if cursor:
+        # 游标中带有排序方式，换了排序后旧游标无效
+        cursor_sort, cursor_desc, value, code = decode_cursor(cursor, 4)
+        if cursor_sort != sort or cursor_desc != descending:
+            raise ValueError("分页游标与排序方式不一致")
+        if not isinstance(code, str):
+            raise ValueError("无效的分页游标")
+        where.append(seek_condition([sort_column, 'l.stock_code'], descending))
+        params = params + [value, code]
+    
+    direction = 'DESC' if descending else 'ASC'
+    sql = f'''
+        SELECT {', '.join(FIELDS[column] for column in SELECT_COLUMNS)}
+        FROM latest_score l
+        LEFT JOIN stock_info s ON s.code = l.stock_code
+        WHERE {' AND '.join(where)}
+        ORDER BY {sort_column} {direction}, l.stock_code {direction}
+        LIMIT ?
+    '''
+    return sql, params + [limit + 1]
+
+
+def run_screen(conn: sqlite3.Connection, expression: Optional[Dict], sort: str = 'total_score',
+               descending: bool = True, limit: int = 50, cursor: str = None) -> Dict:
+    """
+    执行选股查询
+    
+    Returns:
+        {'items': 结果行, 'next_cursor': 下一页游标（没有下一页时为None）,
+         'plan': 查询计划, 'elapsed_ms': 查询耗时（毫秒）}
+    """
+    sql, params = compile_screen(expression, sort, descending, limit, cursor)
+    plan = [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+    
+    start = time.perf_counter()
+    rows = conn.execute(sql, params).fetchall()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    page = make_page(
+        [dict(zip(SELECT_COLUMNS, row)) for row in rows], limit,
+        lambda item: (sort, descending, item[sort], item['stock_code'])
+    )
+    return {'items': page.items, 'next_cursor': page.next_cursor, 'plan': plan, 'elapsed_ms': elapsed_ms}
@@ -0,0 +1,211 @@
+"""
+股票搜索索引
+内存索引，支持代码前缀、名称子串和拼音首字母（如 gzmt → 贵州茅台）检索，数据更新后重建
+"""
+
+import bisect
+import heapq
+import logging
+import sqlite3
+from typing import Dict, List, Set, Tuple
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    # 未安装pypinyin时使用GB2312编码区间推算首字母（覆盖一级常用汉字）
+    lazy_pinyin = None
+    Style = None
+
+logger = logging.getLogger(__name__)
+
+# GB2312一级汉字按拼音排序，各首字母的起始编码
+_GB2312_INITIALS = [
+    (45217, 'a'), (45253, 'b'), (45761, 'c'), (46318, 'd'), (46826, 'e'),
+    (47010, 'f'), (47297, 'g'), (47614, 'h'), (48119, 'j'), (49062, 'k'),
+    (49324, 'l'), (49896, 'm'), (50371, 'n'), (50614, 'o'), (50622, 'p'),
+    (50906, 'q'), (51387, 'r'), (51446, 's'), (52218, 't'), (52698, 'w'),
+    (52980, 'x'), (53689, 'y'), (54481, 'z')
+]
+_GB2312_LEVEL1_END = 55289
+_GB2312_STARTS = [start for start, _ in _GB2312_INITIALS]
+
+
+def _char_initial(char: str) -> str:
+    """单个字符的拼音首字母，字母数字原样返回（小写），无法识别时返回空串"""
+    if char.isascii():
+        return char.lower() if char.isalnum() else ''
+    
+    try:
+        raw = char.encode('gb2312')
+    except UnicodeEncodeError:
+        return ''
+    if len(raw) != 2:
+        return ''
+    
+    value = raw[0] * 256 + raw[1]
+    if value < _GB2312_STARTS[0] or value >= _GB2312_LEVEL1_END:
+        return ''
+    return _GB2312_INITIALS[bisect.bisect_right(_GB2312_STARTS, value) - 1][1]
+
+
+def pinyin_initials(text: str) -> str:
+    """获取文本的拼音首字母串，如 贵州茅台 → gzmt"""
+    if lazy_pinyin is not None:
+        return ''.join(
+            syllable[0].lower() for syllable in lazy_pinyin(text, style=Style.FIRST_LETTER, errors='default')
+            if syllable and syllable[0].isalnum()
+        )
+    return ''.join(_char_initial(char) for char in text)
+
+
+class _SortedKeys:
+    """有序 (key, idx) 列表，支持二分查找前缀区间"""
+    
+    def __init__(self, pairs):
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.indices = [idx for _, idx in pairs]
+    
+    def prefix(self, prefix: str) -> List[int]:
+        """所有以 prefix 开头的项"""
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', start)
+        return self.indices[start:end]
+
+
+class _Snapshot:
+    """一次构建的不可变索引数据"""
+    
+    def __init__(self, rows: List[tuple], generation: int = 0):
+        self.rows = rows
+        self.generation = generation
+        self.names = [str(row[1]).lower() for row in rows]
+        self.codes = [str(row[0]).lower() for row in rows]
+        
+        # 同等匹配程度下按市值降序、代码升序排列
+        order = sorted(range(len(rows)), key=lambda i: (-(rows[i][4] or 0), self.codes[i]))
+        self.order = [0] * len(rows)
+        for position, i in enumerate(order):
+            self.order[i] = position
+        
+        self.code_keys = _SortedKeys((code, i) for i, code in enumerate(self.codes))
+        self.name_keys = _SortedKeys((name, i) for i, name in enumerate(self.names))
+        self.pinyin_keys = _SortedKeys((pinyin_initials(row[1]), i) for i, row in enumerate(rows))
+        
+        # 字符倒排索引，用于名称/代码子串匹配
+        self.char_postings: Dict[str, Set[int]] = {}
+        for i, (code, name) in enumerate(zip(self.codes, self.names)):
+            for char in set(code) | set(name):
+                self.char_postings.setdefault(char, set()).add(i)
+
+
+class StockSearchIndex:
+    """股票搜索索引"""
+    
+    def __init__(self):
+        self._snapshot = _Snapshot([])
+    
+    def rebuild(self, conn: sqlite3.Connection):
+        """
+        从 stock_info 表重建索引
+        
+        Args:
+            conn: 数据库连接
+        """
+        rows = conn.execute(
+            'SELECT code, name, industry, current_price, market_cap FROM stock_info'
+        ).fetchall()
+        snapshot = _Snapshot(rows, self._snapshot.generation + 1)
+        
+        # 整体替换，查询方始终看到完整的一份索引
+        self._snapshot = snapshot
+        logger.info(f"搜索索引已重建: {len(rows)} 只股票")
+    
+    def search(self, query: str, limit: int = 10) -> List[tuple]:
+        """
+        搜索股票
+        
+        Args:
+            query: 关键词（代码、名称或拼音首字母）
+            limit: 返回数量限制
+        
+        Returns:
+            按匹配程度排序的 (code, name, industry, current_price, market_cap) 列表
+        """
+        return [row for _, row in self.search_page(query, limit)]
+    
+    def search_page(self, query: str, limit: int = 10,
+                    after: Tuple[int, int, int] = None) -> List[Tuple[Tuple[int, int, int], tuple]]:
+        """
+        分页搜索股票
+        
+        结果按 (匹配级别, 同级内位置) 排序；位置只在同一份索引内有意义，
+        分页的排序键为 (索引版本, 匹配级别, 同级内位置)
+        
+        Args:
+            query: 关键词（代码、名称或拼音首字母）
+            limit: 返回数量限制
+            after: 上一页最后一条的排序键，只返回排在其后的结果
+        
+        Returns:
+            按匹配程度排序的 (排序键, (code, name, industry, current_price, market_cap)) 列表
+        
+        Raises:
+            ValueError: after 来自重建之前的索引
+        """
+        snapshot = self._snapshot
+        if after is not None:
+            if len(after) != 3 or not all(isinstance(value, int) for value in after):
+                raise ValueError("无效的分页游标")
+            if after[0] != snapshot.generation:
+                raise ValueError("分页游标已失效（股票数据已更新），请重新搜索")
+            after = after[1:]
+        
+        q = query.strip().lower()
+        if not q or limit <= 0:
+            return []
+        
+        results: List[Tuple[int, int]] = []
+        seen: Set[int] = set()
+        
+        # 按匹配程度由高到低逐级收集，凑满 limit 后不再计算更低的级别
+        for level, tier in enumerate(self._tiers(snapshot, q)):
+            matches = [idx for idx in tier() if idx not in seen]
+            # 前面级别已匹配的股票不在后面级别重复出现，跳过的级别也要记录
+            seen.update(matches)
+            if after is not None:
+                if level < after[0]:
+                    continue
+                if level == after[0]:
+                    matches = [idx for idx in matches if snapshot.order[idx] > after[1]]
+            
+            if len(results) + len(matches) > limit:
+                matches = heapq.nsmallest(limit - len(results), matches, key=snapshot.order.__getitem__)
+            else:
+                matches.sort(key=snapshot.order.__getitem__)
+            results.extend((level, idx) for idx in matches)
+            if len(results) >= limit:
+                break
+        
+        return [((snapshot.generation, level, snapshot.order[idx]), snapshot.rows[idx]) for level, idx in results]
+    
+    @staticmethod
+    def _tiers(snapshot: _Snapshot, q: str):
+        """各匹配级别的候选生成函数，按优先级排列"""
+        code_prefix = snapshot.code_keys.prefix(q)
+        
+        def substring():
+            # 先用字符倒排索引取交集缩小范围，再逐个校验
+            postings = [snapshot.char_postings.get(char) for char in set(q)]
+            if not all(postings):
+                return []
+            candidates = set.intersection(*postings)
+            return [idx for idx in candidates if q in snapshot.names[idx] or q in snapshot.codes[idx]]
+        
+        return [
+            lambda: [idx for idx in code_prefix if snapshot.codes[idx] == q],
+            lambda: code_prefix,
+            lambda: snapshot.name_keys.prefix(q),
+            lambda: snapshot.pinyin_keys.prefix(q),
+            substring
+        ]
@@ -0,0 +1,59 @@
+"""接口响应缓存的版本号读取"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from api_cache import ApiResponseCache
+from database import ConnectionPool
+
+
+class GenerationSource:
+    """记录读取次数的版本号来源"""
+    
+    def __init__(self):
+        self.value = 1
+        self.reads = 0
+    
+    async def __call__(self):
+        self.reads += 1
+        await asyncio.sleep(0)
+        return self.value
+
+
+def test_generation_is_read_asynchronously_and_throttled():
+    source = GenerationSource()
+    cache = ApiResponseCache(source, check_interval=60)
+    
+    async def scenario():
+        assert await cache.refresh() == 1
+        cache.put('key', b'[]', 1)
+        
+        source.value = 2
+        assert await cache.refresh() == 1
+        assert cache.get('key') is not None
+        
+        cache.invalidate()
+        assert await cache.refresh() == 2
+        assert cache.get('key') is None
+    
+    asyncio.run(scenario())
+    assert source.reads == 2
+
+
+def test_stale_generation_is_not_cached():
+    source = GenerationSource()
+    cache = ApiResponseCache(source)
+    asyncio.run(cache.refresh())
+    cache.put('key', b'[]', 0)
+    assert cache.get('key') is None
+
+
+def test_exhausted_pool_times_out(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(sqlite3.OperationalError):
+            with pool.connection():
+                pass
+    pool.close()
@@ -0,0 +1,78 @@
+"""本地日线行情存储：追加、原地覆盖和补写历史时重写"""
+
+import numpy as np
+import pandas as pd
+
+import bar_store
+from bar_store import DailyBarStore
+
+
+def bars(trade_date, prices):
+    """一个交易日的行情，prices 为 {ts_code: 收盘价}，其余字段取相同值"""
+    df = pd.DataFrame({'ts_code': list(prices), 'trade_date': trade_date, 'close': list(prices.values())})
+    for field in bar_store.FIELDS:
+        df[field] = df['close']
+    return df
+
+
+def closes(store):
+    return store.read_frame('close').to_dict(orient='index')
+
+
+def test_append_new_dates(tmp_path):
+    store = DailyBarStore(str(tmp_path))
+    assert store.append(bars('20240102', {'000001.SZ': 10.0, '600519.SH': 1600.0})) == 1
+    assert store.append(bars('20240103', {'000001.SZ': 10.5, '000002.SZ': 8.0})) == 1
+    
+    assert store.dates == ['20240102', '20240103']
+    assert store.codes == ['000001.SZ', '600519.SH', '000002.SZ']
+    frame = store.read_frame('close')
+    assert frame.loc['20240103', '000001.SZ'] == 10.5
+    assert np.isnan(frame.loc['20240102', '000002.SZ'])
+    assert np.isnan(frame.loc['20240103', '600519.SH'])
+    
+    # 追加不重写文件：容量不变，文件大小按交易日增长
+    assert store.capacity == bar_store.CAPACITY_STEP
+    assert (tmp_path / 'close.f32').stat().st_size == 2 * store.capacity * 4
+
+
+def test_existing_date_is_overwritten_in_place(tmp_path):
+    store = DailyBarStore(str(tmp_path))
+    store.append(bars('20240102', {'000001.SZ': 10.0, '600519.SH': 1600.0}))
+    store.append(bars('20240103', {'000001.SZ': 10.5}))
+    store.append(bars('20240102', {'000001.SZ': 9.9}))
+    
+    assert store.dates == ['20240102', '20240103']
+    assert closes(store)['20240102'] == {'000001.SZ': np.float32(9.9), '600519.SH': 1600.0}
+
+
+def test_backfill_rewrites_in_date_order(tmp_path):
+    store = DailyBarStore(str(tmp_path))
+    store.append(bars('20240103', {'000001.SZ': 10.5}))
+    store.append(bars('20240104', {'000001.SZ': 10.8}))
+    assert store.append(bars('20240102', {'000001.SZ': 10.0, '600519.SH': 1600.0})) == 1
+    
+    assert store.dates == ['20240102', '20240103', '20240104']
+    frame = store.read_frame('close')
+    assert list(frame['000001.SZ']) == [10.0, 10.5, np.float32(10.8)]
+    assert frame.loc['20240102', '600519.SH'] == 1600.0
+    assert np.isnan(frame.loc['20240104', '600519.SH'])
+    
+    # 其他实例（进程）重新读取元数据后看到重写后的数据
+    reopened = DailyBarStore(str(tmp_path))
+    assert reopened.dates == store.dates
+    pd.testing.assert_frame_equal(reopened.read_frame('close'), frame)
+
+
+def test_new_codes_beyond_capacity_rewrite(tmp_path, monkeypatch):
+    monkeypatch.setattr(bar_store, 'CAPACITY_STEP', 2)
+    store = DailyBarStore(str(tmp_path))
+    store.append(bars('20240102', {'000001.SZ': 10.0}))
+    store.append(bars('20240103', {'000002.SZ': 8.0, '600519.SH': 1600.0}))
+    
+    assert store.capacity == 4
+    assert store.dates == ['20240102', '20240103']
+    frame = store.read_frame('close')
+    assert frame.loc['20240102', '000001.SZ'] == 10.0
+    assert frame.loc['20240103', '600519.SH'] == 1600.0
+    assert (tmp_path / 'close.f32').stat().st_size == 2 * 4 * 4
@@ -0,0 +1,113 @@
+"""评分明细的生成和评分结果的分批写入"""
+
+import sqlite3
+
+from data_fetcher import SCORE_DETAIL_TEMPLATE, build_score_details, write_scores
+
+RESULT = {'stock_code': '600519', 'industry_score': 80.0, 'competitiveness_score': 90.0,
+          'growth_score': 70.0, 'timing_score': 60.0}
+
+
+def details(signals):
+    return {row[1]: (row[4], row[5]) for row in build_score_details(RESULT, signals)}
+
+
+def test_timing_details_follow_signals():
+    rows = details({'technical_trend': 'down', 'valuation_level': 'low', 'valuation_percentile': 0.125, 'rsi': 85.0})
+    assert rows['IND010'] == (12.5, '低估')
+    assert rows['IND011'] == (85.0, '超买')
+    assert rows['IND012'] == (None, '下降')
+
+
+def test_timing_details_without_signals():
+    rows = details(None)
+    assert rows['IND010'] == (None, '数据不足')
+    assert rows['IND011'] == (None, '数据不足')
+    assert rows['IND012'] == (None, '数据不足')
+    assert rows['IND001'] == (None, '成长期')
+
+
+SCORE_COLUMNS = '''
+    stock_code TEXT, stock_name TEXT, industry TEXT, current_price REAL, total_score REAL,
+    industry_score REAL, competitiveness_score REAL, growth_score REAL, timing_score REAL,
+    potential_level TEXT, score_date TEXT
+'''
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:', isolation_level=None)
+    conn.execute('CREATE TABLE stock_info (code TEXT PRIMARY KEY, name TEXT, industry TEXT,'
+                 ' current_price REAL, market_cap REAL)')
+    conn.execute(f"CREATE TABLE score_result (id INTEGER PRIMARY KEY AUTOINCREMENT, {SCORE_COLUMNS})")
+    conn.execute(f"CREATE TABLE latest_score ({SCORE_COLUMNS}, PRIMARY KEY (stock_code))")
+    conn.execute("CREATE UNIQUE INDEX uk_score_result_stock_date ON score_result(stock_code, score_date)")
+    conn.execute('CREATE TABLE score_details (id INTEGER PRIMARY KEY AUTOINCREMENT, stock_code TEXT, code TEXT,'
+                 ' name TEXT, dimension TEXT, value REAL, value_text TEXT, score REAL, max_score REAL, weight REAL)')
+    return conn
+
+
+def make_results(count, total=70.0):
+    stocks = [{'code': f'{i:06d}', 'name': f'股票{i}', 'industry': '银行', 'current_price': 10.0 + i}
+              for i in range(count)]
+    results = [
+        dict(RESULT, stock_code=stock['code'], stock_name=stock['name'], industry=stock['industry'],
+             current_price=stock['current_price'], total_score=total, potential_level='high',
+             score_date='2024-09-23')
+        for stock in stocks
+    ]
+    return stocks, results
+
+
+class Progress:
+    """记录写入阶段的批次大小"""
+    
+    def __init__(self):
+        self.batches = []
+    
+    def begin(self, stage, total=None):
+        self.total = total
+    
+    def advance(self, count=1):
+        self.batches.append(count)
+
+
+def ids(conn, table):
+    return dict(conn.execute(f'SELECT stock_code, MAX(id) FROM {table} GROUP BY stock_code'))
+
+
+def test_write_scores_in_batches():
+    conn = make_db()
+    stocks, results = make_results(5)
+    progress = Progress()
+    write_scores(conn, stocks, results, batch_size=2, progress=progress)
+    
+    assert progress.batches == [2, 2, 1]
+    assert conn.execute('SELECT COUNT(*) FROM stock_info').fetchone()[0] == 5
+    assert conn.execute('SELECT COUNT(*) FROM score_result').fetchone()[0] == 5
+    assert conn.execute('SELECT COUNT(*) FROM latest_score').fetchone()[0] == 5
+    assert conn.execute('SELECT COUNT(*) FROM score_details').fetchone()[0] == 5 * len(SCORE_DETAIL_TEMPLATE)
+
+
+def test_write_scores_skips_unchanged_results():
+    conn = make_db()
+    stocks, results = make_results(5)
+    write_scores(conn, stocks, results, batch_size=2)
+    score_ids, detail_ids = ids(conn, 'score_result'), ids(conn, 'score_details')
+    
+    # 只有一只股票的总分变化，且维度得分不变
+    results[3] = dict(results[3], total_score=71.0)
+    progress = Progress()
+    write_scores(conn, stocks, results, batch_size=2, progress=progress)
+    
+    assert progress.batches == [1]
+    new_score_ids = ids(conn, 'score_result')
+    assert {code for code in score_ids if new_score_ids[code] != score_ids[code]} == {'000003'}
+    assert ids(conn, 'score_details') == detail_ids
+    assert conn.execute("SELECT total_score FROM latest_score WHERE stock_code = '000003'").fetchone() == (71.0,)
+    
+    # 维度得分变化时重写该股票的评分明细
+    results[1] = dict(results[1], timing_score=65.0)
+    write_scores(conn, stocks, results, batch_size=2)
+    new_detail_ids = ids(conn, 'score_details')
+    assert {code for code in detail_ids if new_detail_ids[code] != detail_ids[code]} == {'000001'}
+    assert conn.execute('SELECT COUNT(*) FROM score_details').fetchone()[0] == 5 * len(SCORE_DETAIL_TEMPLATE)
@@ -0,0 +1,76 @@
+"""增量更新只重新评分输入有变化的股票"""
+
+import data_fetcher
+from database import connect
+from score_memo import ScoreMemo
+
+SCORE_COLUMNS = '''
+    stock_code TEXT, stock_name TEXT, industry TEXT, current_price REAL, total_score REAL,
+    industry_score REAL, competitiveness_score REAL, growth_score REAL, timing_score REAL,
+    potential_level TEXT, score_date TEXT
+'''
+
+FINANCIALS = {'roe': 0.15, 'netprofit_ratio': 0.12, 'grossprofit_ratio': 0.3, 'debt_to_assets': 0.4,
+              'current_ratio': 1.5, 'quick_ratio': 1.2}
+
+
+def make_db(path):
+    conn = connect(path)
+    conn.execute('CREATE TABLE stock_info (code TEXT PRIMARY KEY, name TEXT, industry TEXT,'
+                 ' current_price REAL, market_cap REAL)')
+    conn.execute(f"CREATE TABLE score_result (id INTEGER PRIMARY KEY AUTOINCREMENT, {SCORE_COLUMNS})")
+    conn.execute(f"CREATE TABLE latest_score ({SCORE_COLUMNS}, PRIMARY KEY (stock_code))")
+    conn.execute("CREATE UNIQUE INDEX uk_score_result_stock_date ON score_result(stock_code, score_date)")
+    conn.execute('CREATE TABLE score_details (id INTEGER PRIMARY KEY AUTOINCREMENT, stock_code TEXT, code TEXT,'
+                 ' name TEXT, dimension TEXT, value REAL, value_text TEXT, score REAL, max_score REAL, weight REAL)')
+    conn.commit()
+    conn.close()
+
+
+def run_update(monkeypatch, tmp_path, snapshot):
+    """用固定的行情快照执行一次增量更新，返回被重新评分的股票代码"""
+    scored = []
+    score_stocks = data_fetcher.score_stocks
+    
+    def record(scorer, stocks, *args, **kwargs):
+        scored.extend(stock['code'] for stock in stocks)
+        return score_stocks(scorer, stocks, *args, **kwargs)
+    
+    monkeypatch.setattr(data_fetcher, 'connect', lambda: connect(str(tmp_path / 'stock.db')))
+    monkeypatch.setattr(data_fetcher, 'create_default_cache', lambda: None)
+    monkeypatch.setattr(data_fetcher, 'create_default_memo', lambda ruleset: ScoreMemo(str(tmp_path / 'memo.db'), ruleset))
+    monkeypatch.setattr(data_fetcher, 'BAR_STORE_PATH', str(tmp_path / 'bars'))
+    monkeypatch.setattr(data_fetcher, 'VALUATION_STORE_PATH', str(tmp_path / 'valuation'))
+    monkeypatch.setattr(data_fetcher.TushareDataFetcher, 'get_market_snapshot', lambda self: snapshot)
+    monkeypatch.setattr(data_fetcher, 'score_stocks', record)
+    data_fetcher.update_database_with_real_data(incremental=True)
+    return scored
+
+
+def make_snapshot(codes):
+    # 最后一只股票没有当日收盘价（停牌），沿用已保存的价格
+    snapshot = {
+        code: {'trade_date': '20240923', 'close': 10.0 + i, 'end_date': '20240630', 'financials': dict(FINANCIALS)}
+        for i, code in enumerate(codes)
+    }
+    del snapshot[codes[-1]]['close']
+    return snapshot
+
+
+def test_unchanged_stocks_are_skipped(monkeypatch, tmp_path):
+    make_db(str(tmp_path / 'stock.db'))
+    monkeypatch.setattr(data_fetcher, 'create_default_cache', lambda: None)
+    codes = [stock['code'] for stock in data_fetcher.TushareDataFetcher().get_stock_list()]
+    snapshot = make_snapshot(codes)
+    
+    assert sorted(run_update(monkeypatch, tmp_path, snapshot)) == sorted(codes)
+    assert run_update(monkeypatch, tmp_path, snapshot) == []
+    
+    snapshot[codes[0]]['close'] += 1
+    assert run_update(monkeypatch, tmp_path, snapshot) == [codes[0]]
+    
+    conn = connect(str(tmp_path / 'stock.db'))
+    prices = dict(conn.execute('SELECT stock_code, current_price FROM latest_score'))
+    conn.close()
+    assert prices[codes[0]] == 11.0
+    assert prices[codes[-1]] is None
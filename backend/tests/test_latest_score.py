@@ -0,0 +1,56 @@
+"""按评分日期刷新最新评分表"""
+
+import sqlite3
+
+from database import refresh_latest_score
+
+SCORE_COLUMNS = '''
+    stock_code TEXT, stock_name TEXT, industry TEXT, current_price REAL, total_score REAL,
+    industry_score REAL, competitiveness_score REAL, growth_score REAL, timing_score REAL,
+    potential_level TEXT, score_date TEXT
+'''
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(f"CREATE TABLE score_result (id INTEGER PRIMARY KEY AUTOINCREMENT, {SCORE_COLUMNS})")
+    conn.execute(f"CREATE TABLE latest_score ({SCORE_COLUMNS}, PRIMARY KEY (stock_code))")
+    conn.execute("CREATE UNIQUE INDEX uk_score_result_stock_date ON score_result(stock_code, score_date)")
+    conn.execute("CREATE INDEX idx_score_result_date ON score_result(score_date)")
+    return conn
+
+
+def add_score(conn, code, score_date, total):
+    conn.execute(
+        "INSERT OR REPLACE INTO score_result (stock_code, stock_name, industry, current_price, total_score,"
+        " industry_score, competitiveness_score, growth_score, timing_score, potential_level, score_date)"
+        " VALUES (?, 'n', 'i', 1.0, ?, 0, 0, 0, 0, 'low', ?)",
+        (code, total, score_date)
+    )
+
+
+def latest(conn):
+    return {code: (score_date, total) for code, score_date, total in
+            conn.execute('SELECT stock_code, score_date, total_score FROM latest_score')}
+
+
+def test_refresh_by_date_only_touches_that_date():
+    conn = make_db()
+    add_score(conn, 'A', '2024-01-01', 10)
+    add_score(conn, 'B', '2024-01-01', 20)
+    refresh_latest_score(conn)
+    
+    add_score(conn, 'A', '2024-01-02', 11)
+    refresh_latest_score(conn, '2024-01-02')
+    assert latest(conn) == {'A': ('2024-01-02', 11), 'B': ('2024-01-01', 20)}
+
+
+def test_refresh_by_date_keeps_newer_scores():
+    conn = make_db()
+    add_score(conn, 'A', '2024-01-05', 15)
+    refresh_latest_score(conn)
+    
+    add_score(conn, 'A', '2024-01-02', 11)
+    refresh_latest_score(conn, '2024-01-02')
+    assert latest(conn) == {'A': ('2024-01-05', 15)}
+
@@ -0,0 +1,77 @@
+"""游标分页：游标编解码和按排序键定位"""
+
+import sqlite3
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, make_page, seek_condition
+
+# 总分有并列，检验 (总分, 代码) 作为排序键时翻页不重不漏
+SCORES = [('000001', 85.0), ('000002', 90.0), ('000858', 85.0), ('002415', 85.0),
+          ('600036', 70.0), ('600519', 90.0), ('600887', 60.0)]
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE latest_score (stock_code TEXT PRIMARY KEY, total_score REAL)')
+    conn.execute('CREATE INDEX idx_latest_score_total_score_code ON latest_score(total_score, stock_code)')
+    conn.executemany('INSERT INTO latest_score VALUES (?, ?)', SCORES)
+    return conn
+
+
+def fetch_pages(conn, limit, descending=True):
+    """按高潜力/排名接口的方式逐页读取，返回每页的股票代码"""
+    direction = 'DESC' if descending else 'ASC'
+    pages, cursor = [], None
+    while True:
+        where, params = '1 = 1', []
+        if cursor:
+            where += ' AND ' + seek_condition(['total_score', 'stock_code'], descending)
+            params += decode_cursor(cursor, 2)
+        rows = conn.execute(f'''
+            SELECT stock_code, total_score FROM latest_score
+            WHERE {where}
+            ORDER BY total_score {direction}, stock_code {direction}
+            LIMIT ?
+        ''', params + [limit + 1]).fetchall()
+        page = make_page(rows, limit, lambda row: (row[1], row[0]))
+        pages.append([row[0] for row in page.items])
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(85.5, '600519', '贵州茅台')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == [85.5, '600519', '贵州茅台']
+    assert decode_cursor(cursor, 3) == [85.5, '600519', '贵州茅台']
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor!', encode_cursor(1, 2, 3), encode_cursor([1], 'a'),
+                                    'eyJhIjoxfQ'])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 2)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 7, 10])
+@pytest.mark.parametrize('descending', [True, False])
+def test_pages_follow_full_order(limit, descending):
+    conn = make_db()
+    direction = 'DESC' if descending else 'ASC'
+    expected = [row[0] for row in conn.execute(
+        f'SELECT stock_code FROM latest_score ORDER BY total_score {direction}, stock_code {direction}'
+    )]
+    
+    pages = fetch_pages(conn, limit, descending)
+    assert [code for page in pages for code in page] == expected
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_last_full_page_has_no_cursor():
+    page = make_page([1, 2, 3], 3, lambda item: (item,))
+    assert page.next_cursor is None
+    page = make_page([1, 2, 3, 4], 3, lambda item: (item,))
+    assert page.items == [1, 2, 3]
+    assert decode_cursor(page.next_cursor) == [3]
@@ -0,0 +1,73 @@
+"""评分截面排名：名次、并列和百分位"""
+
+import sqlite3
+
+import pandas as pd
+
+from ranking import RANK_METRICS, compute_score_ranks, refresh_score_ranks
+
+ROWS = [
+    # stock_code, industry, total_score
+    ('000001', '银行', 90.0),
+    ('600036', '银行', 80.0),
+    ('601398', '银行', 80.0),
+    ('600519', '白酒', 80.0),
+    ('000858', '白酒', 60.0),
+]
+
+
+def make_scores(rows=ROWS):
+    scores = pd.DataFrame(rows, columns=['stock_code', 'industry', 'total_score'])
+    scores['score_date'] = '2024-09-23'
+    for metric in RANK_METRICS[1:]:
+        scores[metric] = scores['total_score']
+    return scores
+
+
+def total_ranks(ranks):
+    ranks = ranks[ranks['metric'] == 'total_score'].set_index('stock_code')
+    return ranks[['market_rank', 'market_size', 'market_percentile',
+                  'industry_rank', 'industry_size', 'industry_percentile']]
+
+
+def test_ties_share_the_best_rank():
+    ranks = total_ranks(compute_score_ranks(make_scores()))
+    assert ranks['market_rank'].to_dict() == {'000001': 1, '600036': 2, '601398': 2, '600519': 2, '000858': 5}
+    assert ranks['industry_rank'].to_dict() == {'000001': 1, '600036': 2, '601398': 2, '600519': 1, '000858': 2}
+    assert set(ranks['market_size']) == {5}
+    assert ranks.loc['600519', 'industry_size'] == 2
+
+
+def test_percentile_counts_scores_not_above():
+    ranks = total_ranks(compute_score_ranks(make_scores()))
+    # 4/5 的股票得分不高于 80 分
+    assert ranks['market_percentile'].to_dict() == {
+        '000001': 100.0, '600036': 80.0, '601398': 80.0, '600519': 80.0, '000858': 20.0
+    }
+    assert ranks.loc['600036', 'industry_percentile'] == round(2 / 3 * 100, 2)
+    assert ranks.loc['000858', 'industry_percentile'] == 50.0
+
+
+def test_missing_scores_are_not_ranked():
+    scores = make_scores()
+    scores.loc[scores['stock_code'] == '000858', 'growth_score'] = None
+    ranks = compute_score_ranks(scores)
+    growth = ranks[ranks['metric'] == 'growth_score']
+    assert '000858' not in set(growth['stock_code'])
+    assert set(growth['market_size']) == {4}
+    assert len(ranks[ranks['metric'] == 'total_score']) == 5
+
+
+def test_refresh_replaces_rank_table():
+    conn = sqlite3.connect(':memory:')
+    make_scores().to_sql('latest_score', conn, index=False)
+    assert refresh_score_ranks(conn) == len(ROWS) * len(RANK_METRICS)
+    
+    conn.execute("DELETE FROM latest_score WHERE stock_code = '000001'")
+    refresh_score_ranks(conn)
+    top = conn.execute(
+        "SELECT stock_code, market_rank FROM score_rank WHERE metric = 'total_score'"
+        " ORDER BY market_rank, stock_code LIMIT 1"
+    ).fetchone()
+    assert top == ('600036', 1)
+    assert conn.execute('SELECT COUNT(*) FROM score_rank').fetchone()[0] == 4 * len(RANK_METRICS)
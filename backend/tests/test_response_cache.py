@@ -0,0 +1,57 @@
+"""报告期数据的缓存过期时间"""
+
+from datetime import datetime
+
+import pytest
+
+from response_cache import (
+    DEFAULT_OPEN_PERIOD_TTL, ResponseCache, disclosure_deadline, next_report_period_timestamp,
+    report_period_expires_at
+)
+
+
+@pytest.mark.parametrize('period, deadline', [
+    ('20240331', datetime(2024, 5, 1)),
+    ('20240630', datetime(2024, 9, 1)),
+    ('20240930', datetime(2024, 11, 1)),
+    ('20241231', datetime(2025, 5, 1)),
+])
+def test_disclosure_deadline(period, deadline):
+    assert disclosure_deadline(period) == deadline
+
+
+def test_disclosure_deadline_rejects_non_quarter_end():
+    assert disclosure_deadline('20240315') is None
+    assert disclosure_deadline(None) is None
+
+
+def test_open_period_uses_short_ttl():
+    # 半年报披露截止前，只短期缓存
+    now = datetime(2024, 8, 10)
+    expires_at = report_period_expires_at({'period': '20240630'}, now)
+    assert expires_at == now.timestamp() + DEFAULT_OPEN_PERIOD_TTL
+
+
+def test_open_period_ttl_does_not_cross_deadline():
+    now = datetime(2024, 8, 31, 12)
+    assert report_period_expires_at({'period': '20240630'}, now) == datetime(2024, 9, 1).timestamp()
+
+
+def test_closed_period_cached_until_next_report_period():
+    now = datetime(2024, 9, 1)
+    expires_at = report_period_expires_at({'period': '20240630'}, now)
+    assert expires_at == next_report_period_timestamp(now) == datetime(2024, 10, 1).timestamp()
+
+
+def test_latest_filing_without_period_uses_short_ttl():
+    now = datetime(2024, 9, 15)
+    expires_at = report_period_expires_at({'ts_code': '000001.SZ', 'limit': 1}, now)
+    assert expires_at == now.timestamp() + DEFAULT_OPEN_PERIOD_TTL
+
+
+def test_cache_applies_report_period_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl={'fina_indicator_vip': 'report_period'},
+                          open_period_ttl=60)
+    before = datetime.now().timestamp()
+    assert cache._expires_at('fina_indicator_vip', {'period': '20000331'}) == next_report_period_timestamp()
+    assert cache._expires_at('fina_indicator_vip', {'period': '20990331'}) <= before + 61
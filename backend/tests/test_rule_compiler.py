@@ -0,0 +1,52 @@
+"""评分规则的编译和读取"""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from rule_compiler import compile_rule, load_default_rules, seed_indicator_definitions
+from score_calculator import StockScoreCalculator
+
+
+def test_calculator_uses_rule_table():
+    conn = sqlite3.connect(':memory:')
+    seed_indicator_definitions(conn)
+    default = StockScoreCalculator(conn=conn).calculate_indicator_score('roe', 20.0)
+    
+    conn.execute(
+        "UPDATE indicator_definitions SET scoring_criteria = ? WHERE code = 'roe'",
+        ('>15%:0-1分,8-15%:0-1分,<8%:0-1分',)
+    )
+    edited = StockScoreCalculator(conn=conn).calculate_indicator_score('roe', 20.0)
+    
+    assert default >= 8
+    assert edited <= 1
+
+
+def test_calculator_falls_back_to_default_definitions():
+    conn = sqlite3.connect(':memory:')
+    assert StockScoreCalculator(conn=conn).rules.keys() == load_default_rules(':memory:').keys()
+
+
+def test_default_rules_read_application_database(tmp_path):
+    path = str(tmp_path / 'scores.db')
+    conn = sqlite3.connect(path)
+    seed_indicator_definitions(conn)
+    conn.execute("UPDATE indicator_definitions SET scoring_criteria = '强品牌:0-1分' WHERE code = 'brand_value'")
+    conn.commit()
+    conn.close()
+    
+    assert load_default_rules(path)['brand_value'].criteria == '强品牌:0-1分'
+
+
+def test_single_band_numeric_criterion():
+    rule = compile_rule('x', '>0%:0-10分')
+    assert rule.numeric
+    scores = rule.score([5.0, 50.0, np.nan])
+    assert scores.tolist() == [5.0, 5.0, 0.0]
+    
+    calculator = StockScoreCalculator(rules={'x': rule})
+    indicators = [{'code': 'x', 'dimension': 'growth', 'weight': 1.0}]
+    results = calculator.batch_calculate_scores_columnar(pd.DataFrame({'x': [5.0]}, index=['000001']), indicators)
+    assert results[0]['growth_score'] == 5.0
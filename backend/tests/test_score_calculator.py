@@ -0,0 +1,86 @@
+"""列式评分与逐只评分的一致性"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rule_compiler import DEFAULT_INDICATOR_DEFINITIONS, compile_rules
+from score_calculator import StockScoreCalculator
+
+INDICATORS = [
+    {'code': code, 'dimension': dimension, 'weight': weight}
+    for code, _, dimension, weight, _, _ in DEFAULT_INDICATOR_DEFINITIONS
+]
+
+# 含缺失的数值、缺失的分类值和无法识别的文本值
+ROWS = {
+    '000001': {'industry_lifecycle': 'growth', 'market_growth_rate': 25.0, 'roe': 18.0,
+               'valuation_level': 'low', 'technical_trend': 'up', 'future_growth': 30.0},
+    '000002': {'industry_lifecycle': '未知阶段', 'market_growth_rate': np.nan, 'roe': 6.0,
+               'valuation_level': None, 'technical_trend': 'sideways', 'revenue_growth': 12.0},
+    '000003': {'market_share': 'high', 'profit_margin': 'bogus', 'new_business': '高潜力'},
+    '000004': {},
+}
+
+SCORE_FIELDS = ['total_score', 'industry_score', 'competitiveness_score', 'growth_score', 'timing_score',
+                'potential_level']
+
+
+def indicator_lists():
+    """逐只评分的输入：每只股票只列出有值的指标"""
+    data = {}
+    for stock_code, row in ROWS.items():
+        indicators = []
+        for indicator in INDICATORS:
+            value = row.get(indicator['code'])
+            if value is None:
+                continue
+            item = dict(indicator)
+            if isinstance(value, str):
+                item['value_text'] = value
+            else:
+                item['value'] = value
+            indicators.append(item)
+        data[stock_code] = indicators
+    return data
+
+
+def frame():
+    codes = [indicator['code'] for indicator in INDICATORS]
+    return pd.DataFrame.from_dict(ROWS, orient='index').reindex(index=list(ROWS), columns=codes)
+
+
+def by_code(results):
+    return {result['stock_code']: {field: result[field] for field in SCORE_FIELDS} for result in results}
+
+
+@pytest.mark.parametrize('as_matrix', [False, True])
+def test_columnar_matches_per_stock(as_matrix):
+    calculator = StockScoreCalculator(rules=compile_rules(DEFAULT_INDICATOR_DEFINITIONS))
+    expected = by_code(calculator.batch_calculate_scores(list(ROWS), indicator_lists()))
+    
+    data = frame()
+    if as_matrix:
+        results = calculator.batch_calculate_scores_columnar(data.to_numpy(dtype=object), INDICATORS, list(data.index))
+    else:
+        results = calculator.batch_calculate_scores_columnar(data, INDICATORS)
+    
+    # 没有任何指标的股票逐只评分时不产生结果
+    actual = by_code(results)
+    assert actual.pop('000004')['total_score'] == 0
+    assert actual == expected
+
+
+def test_missing_and_unknown_indicators_are_skipped():
+    calculator = StockScoreCalculator(rules=compile_rules(DEFAULT_INDICATOR_DEFINITIONS))
+    scores = calculator.calculate_indicator_score_matrix(frame(), INDICATORS)
+    
+    assert np.isnan(scores.loc['000002', 'industry_lifecycle'])
+    assert np.isnan(scores.loc['000002', 'market_growth_rate'])
+    assert np.isnan(scores.loc['000002', 'valuation_level'])
+    assert np.isnan(scores.loc['000003', 'profit_margin'])
+    assert not np.isnan(scores.loc['000003', 'market_share'])
+    
+    # 000002 的时机维度只有 technical_trend 有效，维度得分等于该指标得分
+    result = by_code(calculator.score_results_from_matrix(scores, INDICATORS))['000002']
+    assert result['timing_score'] == round(scores.loc['000002', 'technical_trend'], 2)
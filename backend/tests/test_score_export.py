@@ -0,0 +1,60 @@
+"""评分导出：分块读取时每只股票的明细不被拆开"""
+
+import csv
+import io
+import json
+import sqlite3
+
+import pytest
+
+from score_export import DETAIL_COLUMNS, SCORE_COLUMNS, export_chunks
+
+# 每只股票的明细条数，包括没有明细的股票
+DETAIL_COUNTS = {'000001': 3, '000002': 0, '000858': 1, '600519': 4, '600887': 0}
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(f"CREATE TABLE latest_score ({', '.join(SCORE_COLUMNS)})")
+    conn.execute(f"CREATE TABLE score_details (stock_code, {', '.join(DETAIL_COLUMNS)})")
+    for code, count in DETAIL_COUNTS.items():
+        conn.execute('INSERT INTO latest_score VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (code, '股票' + code, '行业', 10.0, 80.0, 80.0, 80.0, 80.0, 80.0, 'high', '2024-09-23'))
+        conn.executemany(
+            'INSERT INTO score_details VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(code, f'IND{i:03d}', '指标', 'growth', float(i), None, 80.0, 100, 0.1) for i in range(1, count + 1)]
+        )
+    return conn
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 3, 5, 100])
+def test_ndjson_groups_details_across_chunks(chunk_rows):
+    body = b''.join(export_chunks(make_db(), 'ndjson', chunk_rows)).decode('utf-8')
+    records = [json.loads(line) for line in body.splitlines()]
+    
+    assert [record['stock_code'] for record in records] == sorted(DETAIL_COUNTS)
+    for record in records:
+        codes = [detail['code'] for detail in record['details']]
+        assert codes == [f'IND{i:03d}' for i in range(1, DETAIL_COUNTS[record['stock_code']] + 1)]
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 4, 100])
+def test_csv_has_one_row_per_detail(chunk_rows):
+    body = b''.join(export_chunks(make_db(), 'csv', chunk_rows)).decode('utf-8-sig')
+    rows = list(csv.reader(io.StringIO(body)))
+    
+    assert rows[0] == SCORE_COLUMNS + ['detail_' + column for column in DETAIL_COLUMNS]
+    assert len(rows) - 1 == sum(max(count, 1) for count in DETAIL_COUNTS.values())
+
+
+def test_parquet_row_groups():
+    pq = pytest.importorskip('pyarrow.parquet')
+    body = b''.join(export_chunks(make_db(), 'parquet', 3))
+    table = pq.read_table(io.BytesIO(body))
+    assert table.num_rows == sum(max(count, 1) for count in DETAIL_COUNTS.values())
+    assert sorted(set(table.column('stock_code').to_pylist())) == sorted(DETAIL_COUNTS)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        export_chunks(make_db(), 'xlsx')
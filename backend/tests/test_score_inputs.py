@@ -0,0 +1,41 @@
+"""增量更新按评分输入的指纹判断是否需要重新评分"""
+
+import sqlite3
+
+from data_fetcher import score_input_hash
+from database import load_score_inputs, save_score_inputs
+
+STOCK = {'code': '600519', 'name': '贵州茅台', 'industry': '白酒', 'list_date': '20010827', 'current_price': 1680.0}
+FINANCIALS = {'roe': 0.3, 'netprofit_ratio': 0.5, 'grossprofit_ratio': 0.9, 'debt_to_assets': 0.2, 'quick_ratio': 3.0}
+SIGNALS = {'technical_trend': 'up', 'valuation_level': 'medium', 'rsi': 55.0}
+
+
+def test_hash_ignores_fields_the_score_does_not_use():
+    base = score_input_hash(STOCK, FINANCIALS, SIGNALS)
+    assert score_input_hash(dict(STOCK, trade_date='20240102'), dict(FINANCIALS, quick_ratio=1.0), SIGNALS) == base
+
+
+def test_hash_changes_with_score_inputs():
+    base = score_input_hash(STOCK, FINANCIALS, SIGNALS)
+    assert score_input_hash(dict(STOCK, current_price=1700.0), FINANCIALS, SIGNALS) != base
+    assert score_input_hash(STOCK, dict(FINANCIALS, roe=0.25), SIGNALS) != base
+    assert score_input_hash(STOCK, FINANCIALS, dict(SIGNALS, technical_trend='down')) != base
+    assert score_input_hash(STOCK, FINANCIALS, None) != base
+
+
+def test_unknown_financials_have_no_hash():
+    assert score_input_hash(STOCK, None, SIGNALS) is None
+
+
+def test_score_inputs_table_is_migrated():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE score_inputs (
+            stock_code TEXT PRIMARY KEY, trade_date TEXT, end_date TEXT, scored_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute("INSERT INTO score_inputs VALUES ('000001', '20240102', '20230930', '2024-01-02')")
+    
+    assert load_score_inputs(conn) == {'000001': None}
+    save_score_inputs(conn, [('000001', '20240103', '20230930', 'abc')])
+    assert load_score_inputs(conn) == {'000001': 'abc'}
@@ -0,0 +1,112 @@
+"""评分记忆表：命中统计、规则版本淘汰，以及在批量评分和数据更新评分中的复用"""
+
+import logging
+
+import pytest
+
+import data_fetcher
+from data_fetcher import StockScorer, score_input_hash, score_stocks
+from rule_compiler import DEFAULT_INDICATOR_DEFINITIONS, compile_rules
+from score_calculator import StockScoreCalculator
+from score_memo import ScoreMemo
+
+from test_score_calculator import ROWS, SCORE_FIELDS, by_code, indicator_lists
+
+
+def test_hits_misses_and_persistence(tmp_path):
+    path = str(tmp_path / 'memo.db')
+    memo = ScoreMemo(path, 'v1')
+    key = memo.indicator_key('roe', 18.004)
+    assert memo.get_indicator(key) is None
+    memo.put_indicator(key, 80.0)
+    assert memo.get_indicator(memo.indicator_key('roe', 17.996)) == 80.0
+    memo.put_dimension('000001', 'growth', 'fp', 70.0)
+    assert memo.get_dimension('000001', 'growth', 'other') is None
+    memo.flush()
+    
+    stats = memo.stats()
+    assert (stats['indicator_hits'], stats['indicator_misses']) == (1, 1)
+    assert (stats['dimension_hits'], stats['dimension_misses']) == (0, 1)
+    
+    reopened = ScoreMemo(path, 'v1')
+    assert reopened.get_indicator(key) == 80.0
+    assert reopened.get_dimension('000001', 'growth', 'fp') == 70.0
+
+
+def test_other_ruleset_is_evicted(tmp_path):
+    path = str(tmp_path / 'memo.db')
+    memo = ScoreMemo(path, 'v1')
+    memo.put_indicator(memo.indicator_key('roe', 18.0), 80.0)
+    memo.put_dimension('000001', 'growth', 'fp', 70.0)
+    memo.flush()
+    
+    memo = ScoreMemo(path, 'v2')
+    assert memo.stats()['indicator_entries'] == 0
+    assert memo.stats()['dimension_entries'] == 0
+    assert ScoreMemo(path, 'v1').stats()['indicator_entries'] == 0
+
+
+def test_memo_must_match_calculator_rules():
+    with pytest.raises(ValueError):
+        StockScoreCalculator(rules=compile_rules(DEFAULT_INDICATOR_DEFINITIONS), memo=ScoreMemo(':memory:', 'v1'))
+
+
+def test_memoized_batch_matches_plain_batch(tmp_path):
+    rules = compile_rules(DEFAULT_INDICATOR_DEFINITIONS)
+    expected = by_code(StockScoreCalculator(rules=rules).batch_calculate_scores(list(ROWS), indicator_lists()))
+    
+    ruleset = StockScoreCalculator(rules=rules).ruleset
+    path = str(tmp_path / 'memo.db')
+    for run in range(2):
+        memo = ScoreMemo(path, ruleset)
+        calculator = StockScoreCalculator(rules=rules, memo=memo)
+        results = by_code(calculator.batch_calculate_scores(list(ROWS), indicator_lists()))
+        for code, result in expected.items():
+            for field in SCORE_FIELDS:
+                assert results[code][field] == pytest.approx(result[field]), (run, code, field)
+    
+    # 第二次运行的输入未变化，全部命中
+    assert memo.stats()['indicator_misses'] == 0
+    assert memo.stats()['dimension_misses'] == 0
+
+
+STOCKS = [
+    {'code': '600519', 'name': '贵州茅台', 'industry': '白酒', 'list_date': '20010827', 'current_price': 1680.0},
+    {'code': '000001', 'name': '平安银行', 'industry': '银行', 'list_date': '19910403', 'current_price': 10.5},
+]
+MARKET = {
+    stock['code']: {'financials': {'roe': 0.25, 'netprofit_ratio': 0.3, 'grossprofit_ratio': 0.5,
+                                   'debt_to_assets': 0.2}}
+    for stock in STOCKS
+}
+
+
+def score_with_memo(scorer, memo, market=MARKET):
+    inputs = {
+        stock['code']: (None, None, score_input_hash(stock, market[stock['code']]['financials']))
+        for stock in STOCKS
+    }
+    return score_stocks(scorer, [dict(stock) for stock in STOCKS], logging.getLogger(__name__), market,
+                        score_inputs=inputs, memo=memo)
+
+
+def test_update_scoring_reuses_unchanged_stocks(monkeypatch):
+    scorer = StockScorer(data_fetcher=None)
+    memo = ScoreMemo(':memory:', scorer.ruleset)
+    expected = score_with_memo(scorer, memo)
+    
+    calls = []
+    calculate = scorer.calculate_total_score
+    monkeypatch.setattr(scorer, 'calculate_total_score', lambda stock, *args: calls.append(stock['code'])
+                        or calculate(stock, *args))
+    
+    assert score_with_memo(scorer, memo) == expected
+    assert calls == []
+    assert memo.stats()['dimension_hits'] == len(STOCKS) * len(data_fetcher.SCORE_DIMENSIONS)
+    
+    # 只有财务指标变化的股票重新评分
+    market = dict(MARKET, **{'000001': {'financials': dict(MARKET['000001']['financials'], roe=0.05)}})
+    results = score_with_memo(scorer, memo, market)
+    assert calls == ['000001']
+    assert results[0] == expected[0]
+    assert results[1]['competitiveness_score'] < expected[1]['competitiveness_score']
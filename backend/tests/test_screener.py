@@ -0,0 +1,110 @@
+"""选股表达式编译和执行"""
+
+import sqlite3
+
+import pytest
+
+from screener import MAX_CONDITIONS, MAX_DEPTH, MAX_IN_VALUES, compile_screen, run_screen
+
+ROWS = [
+    ('600519', '贵州茅台', '白酒', 1680.0, 90.0, 21200.0),
+    ('000858', '五粮液', '白酒', 165.8, 80.0, 6400.0),
+    ('600036', '招商银行', '银行业', 42.3, 80.0, 10900.0),
+    ('000001', '平安银行', '银行业', 12.5, 60.0, 2400.0),
+    ('000002', '万科A', '房地产', 18.3, None, 2100.0),
+]
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE latest_score (
+            stock_code TEXT PRIMARY KEY, stock_name TEXT, industry TEXT, current_price REAL,
+            total_score REAL, industry_score REAL, competitiveness_score REAL, growth_score REAL,
+            timing_score REAL, potential_level TEXT, score_date TEXT
+        )
+    ''')
+    conn.execute('CREATE TABLE stock_info (code TEXT PRIMARY KEY, market_cap REAL)')
+    for code, name, industry, price, total, market_cap in ROWS:
+        conn.execute(
+            "INSERT INTO latest_score VALUES (?, ?, ?, ?, ?, 50, 50, 50, 50, 'high', '2024-01-02')",
+            (code, name, industry, price, total)
+        )
+        conn.execute('INSERT INTO stock_info VALUES (?, ?)', (code, market_cap))
+    return conn
+
+
+def codes(result):
+    return [item['stock_code'] for item in result['items']]
+
+
+def test_compiles_to_parameterized_sql():
+    sql, params = compile_screen({'and': [
+        {'field': 'industry', 'op': 'in', 'value': ['白酒', "x' OR 1=1 --"]},
+        {'not': {'field': 'total_score', 'op': '<', 'value': 70}},
+    ]}, limit=10)
+    assert "OR 1=1" not in sql
+    assert '(l.industry IN (?, ?) AND NOT l.total_score < ?)' in sql
+    assert params == ['白酒', "x' OR 1=1 --", 70, 11]
+
+
+def test_filter_sort_and_tie_break():
+    conn = make_db()
+    result = run_screen(conn, {'field': 'total_score', 'op': '>=', 'value': 80}, limit=10)
+    # 同分按股票代码同方向排序，排序字段为空的股票不返回
+    assert codes(result) == ['600519', '600036', '000858']
+    assert result['next_cursor'] is None
+    
+    result = run_screen(conn, {'field': 'market_cap', 'op': 'between', 'value': [2000, 7000]},
+                        sort='market_cap', descending=False, limit=10)
+    assert codes(result) == ['000002', '000001', '000858']
+    
+    result = run_screen(conn, {'or': [{'field': 'industry', 'op': '=', 'value': '房地产'},
+                                      {'field': 'total_score', 'op': 'is null'}]}, limit=10)
+    assert codes(result) == []
+
+
+def test_cursor_pages_through_results():
+    conn = make_db()
+    first = run_screen(conn, None, limit=2)
+    second = run_screen(conn, None, limit=2, cursor=first['next_cursor'])
+    assert codes(first) + codes(second) == ['600519', '600036', '000858', '000001']
+    assert second['next_cursor'] is None
+    
+    with pytest.raises(ValueError):
+        run_screen(conn, None, sort='growth_score', limit=2, cursor=first['next_cursor'])
+
+
+@pytest.mark.parametrize('expression', [
+    {'field': 'password', 'op': '=', 'value': 1},
+    {'field': 'total_score', 'op': 'like', 'value': 1},
+    {'field': 'total_score', 'op': '=', 'value': [1]},
+    {'field': 'total_score', 'op': '=', 'value': None},
+    {'field': 'total_score', 'op': 'in', 'value': []},
+    {'field': 'total_score', 'op': 'in', 'value': [{'a': 1}]},
+    {'field': 'total_score', 'op': 'not in', 'value': [[1]]},
+    {'field': 'total_score', 'op': 'between', 'value': [1]},
+    {'field': 'total_score', 'op': 'between', 'value': [[1], [2]]},
+    {'and': []},
+    {'and': [{'field': 'total_score', 'op': 'is null'}] * (MAX_CONDITIONS + 1)},
+    {'field': 'total_score', 'op': 'in', 'value': list(range(MAX_IN_VALUES + 1))},
+    'total_score > 1',
+])
+def test_invalid_expressions_raise_value_error(expression):
+    with pytest.raises(ValueError):
+        compile_screen(expression)
+
+
+def test_nesting_limit():
+    expression = {'field': 'total_score', 'op': 'is null'}
+    for _ in range(MAX_DEPTH + 1):
+        expression = {'not': expression}
+    with pytest.raises(ValueError):
+        compile_screen(expression)
+
+
+def test_invalid_sort_and_cursor():
+    with pytest.raises(ValueError):
+        compile_screen(None, sort='stock_name')
+    with pytest.raises(ValueError):
+        compile_screen(None, cursor='not-a-cursor')
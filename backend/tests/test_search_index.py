@@ -0,0 +1,49 @@
+"""股票搜索索引的分页"""
+
+import sqlite3
+
+import pytest
+
+from search_index import StockSearchIndex
+
+STOCKS = [
+    ('600519', '贵州茅台', '白酒', 1680.0, 21200.0),
+    ('000858', '五粮液', '白酒', 165.8, 6400.0),
+    ('600036', '招商银行', '银行业', 42.3, 10900.0),
+    ('000001', '平安银行', '银行业', 12.5, 2400.0),
+    ('601398', '工商银行', '银行业', 5.1, 18000.0),
+]
+
+
+def make_index(stocks=STOCKS):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE stock_info (code TEXT, name TEXT, industry TEXT, current_price REAL, market_cap REAL)')
+    conn.executemany('INSERT INTO stock_info VALUES (?, ?, ?, ?, ?)', stocks)
+    index = StockSearchIndex()
+    index.rebuild(conn)
+    return index, conn
+
+
+def test_pages_cover_all_results_once():
+    index, _ = make_index()
+    full = [row[0] for row in index.search('银行', 10)]
+    
+    first = index.search_page('银行', 2)
+    second = index.search_page('银行', 2, after=first[-1][0])
+    assert [row[0] for _, row in first + second] == full
+    # 同级按市值降序
+    assert full == ['601398', '600036', '000001']
+
+
+def test_cursor_from_rebuilt_index_is_rejected():
+    index, conn = make_index()
+    after = index.search_page('银行', 1)[-1][0]
+    index.rebuild(conn)
+    with pytest.raises(ValueError):
+        index.search_page('银行', 1, after=after)
+
+
+def test_malformed_cursor_is_rejected():
+    index, _ = make_index()
+    with pytest.raises(ValueError):
+        index.search_page('银行', 1, after=[1, 'a', 0])
@@ -0,0 +1,182 @@
+"""Tushare 客户端的限流、分页请求和数据更新"""
+
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import tushare_client
+from tushare_client import StockDataUpdater, TokenBucketRateLimiter, TushareProAPI, TushareRequestError
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+    
+    def raise_for_status(self):
+        pass
+    
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """按 (接口名, offset) 返回预设的响应，'error' 表示接口报错"""
+    
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+    
+    def post(self, url, json, timeout):
+        key = (json['api_name'], json['params'].get('offset'))
+        self.calls.append(key)
+        page = self.pages.get(key, [])
+        if page == 'error':
+            return FakeResponse({'code': 40203, 'msg': '没有接口访问权限'})
+        return FakeResponse({'code': 0, 'data': {'fields': ['ts_code', 'close'], 'items': page}})
+
+
+def make_api(monkeypatch, pages):
+    monkeypatch.setattr(tushare_client, 'RETRY_DELAY', 0)
+    monkeypatch.setattr(tushare_client, 'create_default_cache', lambda: None)
+    api = TushareProAPI(token='test', rate_limiter=TokenBucketRateLimiter(60000, capacity=1000))
+    api.session = FakeSession(pages)
+    return api
+
+
+def test_paged_request_reads_until_short_page(monkeypatch):
+    api = make_api(monkeypatch, {
+        ('daily', 0): [['000001.SZ', 1.0], ['000002.SZ', 2.0]],
+        ('daily', 2): [['600519.SH', 3.0]],
+    })
+    df = api._make_paged_request('daily', {'trade_date': '20240923'}, page_size=2)
+    assert list(df['ts_code']) == ['000001.SZ', '000002.SZ', '600519.SH']
+
+
+def test_paged_request_stops_on_empty_page(monkeypatch):
+    api = make_api(monkeypatch, {('daily', 0): [['000001.SZ', 1.0], ['000002.SZ', 2.0]]})
+    df = api._make_paged_request('daily', {'trade_date': '20240923'}, page_size=2)
+    assert len(df) == 2
+    assert api.session.calls == [('daily', 0), ('daily', 2)]
+
+
+def test_failed_middle_page_raises(monkeypatch):
+    api = make_api(monkeypatch, {
+        ('daily', 0): [['000001.SZ', 1.0], ['000002.SZ', 2.0]],
+        ('daily', 2): 'error',
+    })
+    with pytest.raises(TushareRequestError):
+        api._make_paged_request('daily', {'trade_date': '20240923'}, page_size=2)
+
+
+def test_financial_update_falls_back_to_per_stock(monkeypatch):
+    api = make_api(monkeypatch, {('fina_indicator_vip', 0): 'error'})
+    fetched = []
+    monkeypatch.setattr(api, 'get_fina_indicator',
+                        lambda ts_code, limit: fetched.append(ts_code) or pd.DataFrame({'ts_code': [ts_code]}))
+    updater = StockDataUpdater(api, bulk=True, bar_store=object(), valuation_store=object())
+    
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE stock_info (code TEXT PRIMARY KEY, name TEXT, industry TEXT,'
+                 ' current_price REAL, market_cap REAL)')
+    conn.executemany("INSERT INTO stock_info (code, name, industry) VALUES (?, 'n', 'i')", [('000001',), ('600519',)])
+    conn.commit()
+    
+    assert updater.update_financial_data(conn)
+    assert sorted(fetched) == ['000001.SZ', '600519.SH']
+
+
+class StockBasicAPI:
+    """只提供 get_stock_basic 的客户端"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def get_stock_basic(self):
+        return pd.DataFrame(self.rows, columns=['ts_code', 'symbol', 'name', 'area'])
+
+
+def test_stock_basic_diff_upsert_delete():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE stock_info (code TEXT PRIMARY KEY, name TEXT, industry TEXT,'
+                 ' current_price REAL, market_cap REAL)')
+    conn.executemany('INSERT INTO stock_info VALUES (?, ?, ?, ?, ?)', [
+        ('000001', '平安银行', '深圳', 10.5, 10500.0),
+        ('000002', '万科A', '深圳', 8.0, 8000.0),
+        ('600000', '浦发银行', '上海', 7.0, 7000.0),
+    ])
+    conn.commit()
+    
+    updater = StockDataUpdater(StockBasicAPI([
+        ['000001.SZ', '000001', '平安银行', '深圳'],     # 未变化
+        ['000002.SZ', '000002', '万  科A', '深圳'],      # 改名
+        ['600519.SH', None, '贵州茅台', None],            # 新增，缺少 symbol 和 area
+    ]), bulk=False, bar_store=object(), valuation_store=object())
+    
+    changes = conn.total_changes
+    assert updater.update_stock_basic(conn)
+    # 只写入改名和新增的两只，删除退市的一只
+    assert conn.total_changes - changes == 3
+    
+    rows = {row[0]: row[1:] for row in conn.execute('SELECT * FROM stock_info')}
+    assert rows == {
+        '000001': ('平安银行', '深圳', 10.5, 10500.0),
+        '000002': ('万  科A', '深圳', 8.0, 8000.0),
+        '600519': ('贵州茅台', '其他', None, None),
+    }
+    
+    changes = conn.total_changes
+    assert updater.update_stock_basic(conn)
+    assert conn.total_changes == changes
+
+
+class FakeClock:
+    """可控的时钟，sleep 直接推进时间"""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def acquire_times(limiter, clock, count):
+    times = []
+    for _ in range(count):
+        limiter.acquire()
+        times.append(clock.now)
+    return times
+
+
+def test_rate_limiter_allows_burst_then_paces(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tushare_client, 'time', clock)
+    limiter = TokenBucketRateLimiter(60, capacity=2)
+    
+    assert acquire_times(limiter, clock, 5) == pytest.approx([0, 0, 1, 2, 3])
+
+
+def test_rate_limiter_refills_up_to_capacity(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tushare_client, 'time', clock)
+    limiter = TokenBucketRateLimiter(120, capacity=3)
+    acquire_times(limiter, clock, 3)
+    
+    # 空闲很久也只攒满桶容量
+    clock.now += 100
+    assert acquire_times(limiter, clock, 5) == pytest.approx([100, 100, 100, 100.5, 101])
+
+
+def test_rate_limiter_is_shared_between_threads():
+    limiter = TokenBucketRateLimiter(6000, capacity=1)  # 每 10ms 一个令牌
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: limiter.acquire(), range(11)))
+    assert time.monotonic() - started >= 0.09
@@ -0,0 +1,83 @@
+"""数据更新任务管理"""
+
+import threading
+import time
+
+from update_jobs import UpdateJobManager
+
+
+def wait_finished(job, timeout=5.0):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return job.finished
+
+
+def test_single_flight_and_success():
+    release = threading.Event()
+    
+    def runner(job):
+        job.begin('score', 2)
+        release.wait(5)
+        job.advance(2)
+    
+    manager = UpdateJobManager(runner)
+    job, created = manager.submit()
+    again, created_again = manager.submit()
+    assert created and not created_again and again is job
+    
+    release.set()
+    assert wait_finished(job)
+    state = job.to_dict()
+    assert state['status'] == 'succeeded'
+    assert state['scored'] == 2
+    assert state['finished_at'] is not None
+    assert state['stages']['score']['finished_at'] is not None
+    assert state['eta_seconds'] is None
+
+
+def test_cancel_and_failure():
+    def runner(job):
+        job.begin('fetch', 1000)
+        for _ in range(1000):
+            time.sleep(0.005)
+            job.advance()
+    
+    manager = UpdateJobManager(runner)
+    job, _ = manager.submit()
+    time.sleep(0.05)
+    assert manager.cancel(job.id) is True
+    assert wait_finished(job)
+    assert job.to_dict()['status'] == 'cancelled'
+    assert manager.cancel(job.id) is False
+    assert manager.cancel('missing') is None
+    
+    def failing(job):
+        raise RuntimeError('boom')
+    
+    manager = UpdateJobManager(failing)
+    job, _ = manager.submit()
+    assert wait_finished(job)
+    assert job.to_dict()['status'] == 'failed'
+    assert job.to_dict()['error'] == 'boom'
+
+
+def test_status_snapshots_while_running():
+    def runner(job):
+        for stage in ('fetch', 'score', 'write'):
+            job.begin(stage, 200)
+            for _ in range(200):
+                job.advance()
+    
+    manager = UpdateJobManager(runner)
+    job, _ = manager.submit()
+    snapshots = []
+    while not job.finished:
+        snapshots.append(manager.status()['update_job'])
+    snapshots.append(manager.status()['update_job'])
+    
+    for state in snapshots:
+        assert state['status'] in ('pending', 'running', 'succeeded')
+        if state['status'] == 'succeeded':
+            assert state['finished_at'] is not None and state['eta_seconds'] is None
+    assert snapshots[-1]['written'] == 200
@@ -4,12 +4,15 @@ Tushare Pro数据获取器
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import time
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterable, List, Optional, Any
 import sqlite3
 import sys
 import os
@@ -17,6 +20,10 @@ import os
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from bar_store import VALUATION_FIELDS, DailyBarStore
+from database import bump_data_generation, connect
+from response_cache import ResponseCache, create_default_cache
+
 try:
     from tushare_config import *
 except ImportError:
@@ -26,25 +33,99 @@ except ImportError:
     REQUEST_TIMEOUT = 30
     MAX_RETRIES = 3
     RETRY_DELAY = 1
+    CALLS_PER_MINUTE = 200
+    MAX_WORKERS = 8
+    BULK_FETCH = True
+    PAGE_SIZE = 5000
+    BAR_STORE_PATH = "bar_store"
+    VALUATION_STORE_PATH = "valuation_store"
+
+def recent_report_periods(count: int) -> List[str]:
+    """最近的若干个季度报告期（季末日期，YYYYMMDD），从最近一个已结束的季度开始"""
+    quarter_ends = ['0331', '0630', '0930', '1231']
+    today = datetime.now()
+    year = today.year
+    quarter = (today.month - 1) // 3 - 1  # 上一个已结束的季度
+    
+    periods = []
+    while len(periods) < count:
+        if quarter < 0:
+            quarter += 4
+            year -= 1
+        periods.append(f"{year}{quarter_ends[quarter]}")
+        quarter -= 1
+    
+    return periods
+
+
+class TushareRequestError(Exception):
+    """Tushare API请求失败（重试后仍然出错），区别于正常返回的空数据"""
+
+
+class TokenBucketRateLimiter:
+    """令牌桶限流器，多个线程共享同一调用配额"""
+    
+    def __init__(self, calls_per_minute: int, capacity: int = None):
+        """
+        初始化限流器
+        
+        Args:
+            calls_per_minute: 每分钟允许的调用次数
+            capacity: 令牌桶容量（允许的突发调用数），默认为每秒调用数
+        """
+        self.rate = calls_per_minute / 60.0
+        self.capacity = capacity or max(1, int(round(self.rate)))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                wait = (1 - self.tokens) / self.rate
+            
+            time.sleep(wait)
+
 
 class TushareProAPI:
     """Tushare Pro API客户端"""
     
-    def __init__(self, token: str = None):
+    def __init__(self, token: str = None, rate_limiter: TokenBucketRateLimiter = None, max_workers: int = None,
+                 cache: ResponseCache = None):
         """
         初始化Tushare Pro API客户端
         
         Args:
             token: Tushare Pro API Token，如果为None则从配置文件读取
+            rate_limiter: 共享的限流器，如果为None则按配置的每分钟调用次数创建
+            max_workers: 并发请求线程数，如果为None则从配置文件读取
+            cache: 本地响应缓存，如果为None则按配置文件创建
         """
         self.token = token or TUSHARE_TOKEN
+        self.cache = cache or create_default_cache()
         self.api_url = TUSHARE_API_URL
+        self.max_workers = max_workers or globals().get('MAX_WORKERS', 8)
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter(globals().get('CALLS_PER_MINUTE', 200))
         self.session = requests.Session()
         self.session.headers.update({
             'Content-Type': 'application/json',
             'User-Agent': 'StockScoringApp/1.0'
         })
         
+        # 连接池大小与并发线程数一致
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         # 设置日志
         logging.basicConfig(
             level=getattr(logging, LOG_LEVEL) if 'LOG_LEVEL' in globals() else logging.INFO,
@@ -56,7 +137,8 @@ class TushareProAPI:
         if self.token == "请在此处填入您的Tushare Pro Token":
             self.logger.warning("Tushare Token未配置，将使用模拟数据")
     
-    def _make_request(self, api_name: str, params: Dict = None, fields: str = None) -> pd.DataFrame:
+    def _make_request(self, api_name: str, params: Dict = None, fields: str = None,
+                      raise_errors: bool = False) -> pd.DataFrame:
         """
         发送API请求
         
@@ -64,7 +146,8 @@ class TushareProAPI:
             api_name: API接口名称
             params: 请求参数
             fields: 返回字段列表，逗号分隔
-            
+            raise_errors: 请求失败时抛出 TushareRequestError，而不是返回模拟数据
+        
         Returns:
             DataFrame格式的数据
         """
@@ -81,8 +164,16 @@ class TushareProAPI:
         if fields:
             payload['fields'] = fields
         
+        # 优先读取本地缓存
+        if self.cache is not None:
+            cached = self.cache.get(api_name, params, fields)
+            if cached is not None:
+                self.logger.info(f"命中缓存 [{api_name}]: {len(cached['items'])} 条记录")
+                return pd.DataFrame(cached['items'], columns=cached['fields'])
+        
         for attempt in range(MAX_RETRIES):
             try:
+                self.rate_limiter.acquire()
                 response = self.session.post(
                     self.api_url, 
                     json=payload, 
@@ -96,6 +187,8 @@ class TushareProAPI:
                     error_msg = data.get('msg', '未知错误')
                     self.logger.error(f"Tushare API错误 [{api_name}]: {error_msg}")
                     if attempt == MAX_RETRIES - 1:
+                        if raise_errors:
+                            raise TushareRequestError(f"Tushare API错误 [{api_name}]: {error_msg}")
                         return self._get_mock_data(api_name, params)
                     continue
                 
@@ -106,21 +199,95 @@ class TushareProAPI:
                     self.logger.warning(f"Tushare API返回空数据 [{api_name}]")
                     return pd.DataFrame()
                 
+                if self.cache is not None:
+                    self.cache.set(api_name, params, fields, {'fields': columns, 'items': items})
+                
                 df = pd.DataFrame(items, columns=columns)
                 self.logger.info(f"成功获取数据 [{api_name}]: {len(df)} 条记录")
                 return df
-                
+            
             except requests.exceptions.RequestException as e:
                 self.logger.error(f"请求失败 [{api_name}], 尝试 {attempt + 1}/{MAX_RETRIES}: {e}")
                 if attempt == MAX_RETRIES - 1:
+                    if raise_errors:
+                        raise TushareRequestError(f"请求失败 [{api_name}]: {e}") from e
                     return self._get_mock_data(api_name, params)
                 time.sleep(RETRY_DELAY)
+            except TushareRequestError:
+                raise
             except Exception as e:
                 self.logger.error(f"未知错误 [{api_name}]: {e}")
+                if raise_errors:
+                    raise TushareRequestError(f"未知错误 [{api_name}]: {e}") from e
                 return self._get_mock_data(api_name, params)
         
         return pd.DataFrame()
     
+    def _make_paged_request(self, api_name: str, params: Dict = None, fields: str = None, page_size: int = None) -> pd.DataFrame:
+        """
+        分页发送API请求，用于不带 ts_code 的全市场查询
+        
+        只有接口正常返回空页或不满一页时才结束分页；任何一页请求失败都抛出
+        TushareRequestError，避免把中途失败误当作数据已取完而返回不完整的结果
+        
+        Args:
+            api_name: API接口名称
+            params: 请求参数
+            fields: 返回字段列表，逗号分隔
+            page_size: 每页行数，如果为None则从配置文件读取
+        
+        Returns:
+            合并所有分页后的DataFrame
+        
+        Raises:
+            TushareRequestError: 某一页请求失败
+        """
+        page_size = page_size or globals().get('PAGE_SIZE', 5000)
+        frames = []
+        offset = 0
+        
+        while True:
+            page_params = dict(params or {}, limit=page_size, offset=offset)
+            df = self._make_request(api_name, params=page_params, fields=fields, raise_errors=True)
+            if df.empty:
+                break
+            
+            frames.append(df)
+            if len(df) < page_size:
+                break
+            offset += page_size
+        
+        if not frames:
+            return pd.DataFrame()
+        
+        return pd.concat(frames, ignore_index=True)
+    
+    def fetch_concurrent(self, func: Callable[[Any], Any], items: Iterable, max_workers: int = None) -> List[Any]:
+        """
+        并发执行请求，调用频率由共享限流器控制
+        
+        Args:
+            func: 对单个参数发起请求的函数，如 lambda ts_code: api.get_daily_data(ts_code=ts_code)
+            items: 参数列表
+            max_workers: 并发线程数，如果为None则使用客户端配置
+        
+        Returns:
+            与 items 顺序一致的结果列表，失败的项为空DataFrame
+        """
+        items = list(items)
+        if not items:
+            return []
+        
+        def run(item):
+            try:
+                return func(item)
+            except Exception as e:
+                self.logger.error(f"并发请求失败 [{item}]: {e}")
+                return pd.DataFrame()
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers or self.max_workers, len(items))) as executor:
+            return list(executor.map(run, items))
+    
     def _get_mock_data(self, api_name: str, params: Dict = None) -> pd.DataFrame:
         """获取模拟数据"""
         self.logger.info(f"使用模拟数据 [{api_name}]")
@@ -148,7 +315,7 @@ class TushareProAPI:
             ]
             return pd.DataFrame(mock_data, columns=['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'vol', 'amount'])
         
-        elif api_name == 'fina_indicator':
+        elif api_name in ('fina_indicator', 'fina_indicator_vip'):
             mock_data = [
                 ['000001.SZ', '20240630', 0.152, 0.123, 0.185, 0.085, 1.25, 15.8, 12.5, 8.5],
                 ['600519.SZ', '20240630', 0.528, 0.458, 0.585, 0.258, 3.85, 35.2, 28.5, 18.9]
@@ -186,6 +353,31 @@ class TushareProAPI:
         fields = 'ts_code,end_date,roe,netprofit_ratio,grossprofit_ratio,debt_to_assets,current_ratio,qoq_yoy,or_yoy,profit_yoy'
         return self._make_request('fina_indicator', params=params, fields=fields)
     
+    def get_daily_data_bulk(self, trade_date: str) -> pd.DataFrame:
+        """按交易日获取全市场日线行情数据"""
+        fields = 'ts_code,trade_date,open,high,low,close,vol,amount'
+        return self._make_paged_request('daily', params={'trade_date': trade_date}, fields=fields)
+    
+    def get_fina_indicator_bulk(self, period: str) -> pd.DataFrame:
+        """按报告期获取全市场财务指标数据（fina_indicator_vip 接口）"""
+        fields = 'ts_code,end_date,roe,netprofit_ratio,grossprofit_ratio,debt_to_assets,current_ratio,qoq_yoy,or_yoy,profit_yoy'
+        return self._make_paged_request('fina_indicator_vip', params={'period': period}, fields=fields)
+    
+    def get_daily_basic_bulk(self, trade_date: str) -> pd.DataFrame:
+        """按交易日获取全市场每日估值指标（PE/PB）"""
+        fields = 'ts_code,trade_date,pe_ttm,pb'
+        return self._make_paged_request('daily_basic', params={'trade_date': trade_date}, fields=fields)
+    
+    def get_trade_calendar(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """获取交易日历（仅开市日）"""
+        params = {'exchange': 'SSE', 'start_date': start_date, 'end_date': end_date, 'is_open': '1'}
+        return self._make_request('trade_cal', params=params, fields='cal_date,is_open')
+    
+    def get_moneyflow_bulk(self, trade_date: str) -> pd.DataFrame:
+        """按交易日获取全市场资金流向数据"""
+        fields = 'ts_code,trade_date,buy_sm_vol,sell_sm_vol,buy_md_vol,sell_md_vol,buy_lg_vol,sell_lg_vol,buy_elg_vol,sell_elg_vol'
+        return self._make_paged_request('moneyflow', params={'trade_date': trade_date}, fields=fields)
+    
     def get_moneyflow(self, ts_code: str = None, trade_date: str = None, limit: int = None) -> pd.DataFrame:
         """获取资金流向数据"""
         params = {}
@@ -216,44 +408,70 @@ class TushareProAPI:
 class StockDataUpdater:
     """股票数据更新器"""
     
-    def __init__(self, api_client: TushareProAPI = None):
+    def __init__(self, api_client: TushareProAPI = None, bulk: bool = None, bar_store: DailyBarStore = None,
+                 valuation_store: DailyBarStore = None):
         """
         初始化数据更新器
         
         Args:
             api_client: Tushare Pro API客户端
+            bulk: 是否按交易日/报告期批量获取全市场数据，如果为None则从配置文件读取
+            bar_store: 本地日线行情存储，如果为None则按配置文件创建
+            valuation_store: 本地每日估值（PE/PB）存储，如果为None则按配置文件创建
         """
         self.api = api_client or TushareProAPI()
+        self.bulk = globals().get('BULK_FETCH', True) if bulk is None else bulk
+        self.bar_store = bar_store or DailyBarStore(globals().get('BAR_STORE_PATH', 'bar_store'))
+        self.valuation_store = valuation_store or DailyBarStore(
+            globals().get('VALUATION_STORE_PATH', 'valuation_store'), fields=VALUATION_FIELDS
+        )
         self.logger = logging.getLogger(__name__)
     
     def update_stock_basic(self, conn: sqlite3.Connection) -> bool:
-        """更新股票基础信息"""
+        """更新股票基础信息（只写入有变化的股票）"""
         try:
             df = self.api.get_stock_basic()
             if df.empty:
                 self.logger.warning("获取股票基础信息失败")
                 return False
             
+            # 按列清洗数据
+            latest = pd.DataFrame({
+                'code': df['symbol'].where(df['symbol'].notna(), df['ts_code'].str[:6]),
+                'name': df['name'].fillna(''),
+                'industry': df['area'].fillna('其他')
+            }).drop_duplicates(subset='code', keep='last')
+            
             cursor = conn.cursor()
+            cursor.execute("SELECT code, name, industry FROM stock_info")
+            current = pd.DataFrame(cursor.fetchall(), columns=['code', 'name', 'industry'])
             
-            # 清空原有数据
-            cursor.execute("DELETE FROM stock_info")
+            # 与现有数据比对
+            merged = latest.merge(current, on='code', how='left', suffixes=('', '_old'), indicator=True)
+            changed = merged[
+                (merged['_merge'] == 'left_only')
+                | (merged['name'] != merged['name_old'])
+                | (merged['industry'] != merged['industry_old'])
+            ]
+            removed = current.loc[~current['code'].isin(latest['code']), 'code']
             
-            # 插入新数据
-            for _, row in df.iterrows():
-                code = row['symbol'] if pd.notna(row['symbol']) else row['ts_code'][:6]
-                name = row['name'] if pd.notna(row['name']) else ''
-                industry = row['area'] if pd.notna(row['area']) else '其他'
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO stock_info (code, name, industry, current_price, market_cap)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (code, name, industry, 0.0, 0.0))
+            # 新增和变化的股票一次性写入，保留已有的价格和市值（新股票在取得行情前没有价格）；已退市的股票删除
+            # 所有修改在同一事务中提交，读取方不会看到空表
+            cursor.executemany('''
+                INSERT INTO stock_info (code, name, industry, current_price, market_cap)
+                VALUES (?, ?, ?, NULL, NULL)
+                ON CONFLICT(code) DO UPDATE SET
+                    name = excluded.name,
+                    industry = excluded.industry
+            ''', changed[['code', 'name', 'industry']].itertuples(index=False, name=None))
+            cursor.executemany("DELETE FROM stock_info WHERE code = ?", [(code,) for code in removed])
             
             conn.commit()
-            self.logger.info(f"成功更新 {len(df)} 只股票基础信息")
+            self.logger.info(
+                f"成功更新 {len(latest)} 只股票基础信息（写入 {len(changed)} 只，删除 {len(removed)} 只）"
+            )
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"更新股票基础信息失败: {e}")
             conn.rollback()
@@ -261,20 +479,26 @@ class StockDataUpdater:
     
     def update_daily_prices(self, conn: sqlite3.Connection) -> bool:
         """更新日线价格数据"""
+        if self.bulk:
+            return self.update_daily_prices_bulk(conn)
+        
         try:
             cursor = conn.cursor()
             cursor.execute("SELECT code FROM stock_info")
             stocks = cursor.fetchall()
             
+            codes = [stock[0] for stock in stocks]
+            ts_codes = [f"{code}.{'SH' if code.startswith('6') else 'SZ'}" for code in codes]
+            
+            # 并发获取最新价格数据，调用频率由限流器控制
+            frames = self.api.fetch_concurrent(
+                lambda ts_code: self.api.get_daily_data(ts_code=ts_code, limit=1),
+                ts_codes
+            )
+            
             updated_count = 0
             
-            for stock in stocks:
-                code = stock[0]
-                ts_code = f"{code}.{'SH' if code.startswith('6') else 'SZ'}"
-                
-                # 获取最新价格数据
-                df = self.api.get_daily_data(ts_code=ts_code, limit=1)
-                
+            for code, df in zip(codes, frames):
                 if not df.empty:
                     latest_price = df.iloc[0]['close']
                     
@@ -286,14 +510,11 @@ class StockDataUpdater:
                     ''', (latest_price, code))
                     
                     updated_count += 1
-                
-                # 避免请求过于频繁
-                time.sleep(0.1)
             
             conn.commit()
             self.logger.info(f"成功更新 {updated_count} 只股票的价格数据")
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"更新价格数据失败: {e}")
             conn.rollback()
@@ -301,42 +522,193 @@ class StockDataUpdater:
     
     def update_financial_data(self, conn: sqlite3.Connection) -> bool:
         """更新财务数据"""
+        if self.bulk:
+            if self.update_financial_data_bulk(conn):
+                return True
+            # 账户没有 fina_indicator_vip 权限或批量接口失败时，改为逐只获取
+            self.logger.warning("批量获取财务数据失败，改为逐只获取")
+        
         try:
             cursor = conn.cursor()
             cursor.execute("SELECT code FROM stock_info")
             stocks = cursor.fetchall()
             
+            ts_codes = [f"{stock[0]}.{'SH' if stock[0].startswith('6') else 'SZ'}" for stock in stocks]
+            
+            # 并发获取财务指标，调用频率由限流器控制
+            frames = self.api.fetch_concurrent(
+                lambda ts_code: self.api.get_fina_indicator(ts_code=ts_code, limit=1),
+                ts_codes
+            )
+            
             updated_count = 0
             
-            for stock in stocks:
-                code = stock[0]
-                ts_code = f"{code}.{'SH' if code.startswith('6') else 'SZ'}"
-                
-                # 获取财务指标
-                df = self.api.get_fina_indicator(ts_code=ts_code, limit=1)
-                
+            for df in frames:
                 if not df.empty:
                     # 这里可以存储详细的财务数据
                     # 目前只是记录更新状态
                     updated_count += 1
-                
-                # 避免请求过于频繁
-                time.sleep(0.2)
             
             conn.commit()
             self.logger.info(f"成功更新 {updated_count} 只股票的财务数据")
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"更新财务数据失败: {e}")
             conn.rollback()
             return False
     
+    def fetch_latest_daily_bulk(self, lookback_days: int = 10) -> pd.DataFrame:
+        """
+        获取最近一个交易日的全市场日线数据
+        
+        Args:
+            lookback_days: 向前查找的自然日天数（跳过周末和节假日）
+        """
+        today = datetime.now()
+        for offset in range(lookback_days):
+            trade_date = (today - timedelta(days=offset)).strftime('%Y%m%d')
+            df = self.api.get_daily_data_bulk(trade_date)
+            if not df.empty:
+                return df
+        
+        return pd.DataFrame()
+    
+    def fetch_latest_fina_bulk(self, periods: int = 2) -> pd.DataFrame:
+        """
+        获取最近几个报告期的全市场财务指标，每只股票保留最新一期
+        
+        Args:
+            periods: 向前获取的报告期数量（财报季内最新一期尚未披露完整）
+        """
+        frames = []
+        for period in recent_report_periods(periods):
+            df = self.api.get_fina_indicator_bulk(period)
+            if not df.empty:
+                frames.append(df)
+        
+        if not frames:
+            return pd.DataFrame()
+        
+        df = pd.concat(frames, ignore_index=True)
+        df = df.sort_values('end_date', ascending=False)
+        return df.drop_duplicates(subset='ts_code', keep='first')
+    
+    def backfill_bars(self, start_date: str, end_date: str = None) -> int:
+        """
+        按交易日批量补齐本地行情存储中的历史日线
+        
+        Args:
+            start_date: 起始日期，YYYYMMDD
+            end_date: 结束日期，YYYYMMDD，默认为今天
+        
+        Returns:
+            写入的交易日数量
+        """
+        end_date = end_date or datetime.now().strftime('%Y%m%d')
+        
+        calendar = self.api.get_trade_calendar(start_date, end_date)
+        if not calendar.empty and 'cal_date' in calendar:
+            trade_dates = sorted(calendar['cal_date'].astype(str))
+        else:
+            # 无法获取交易日历时按工作日请求，节假日返回空数据
+            trade_dates = [d.strftime('%Y%m%d') for d in pd.bdate_range(start_date, end_date)]
+        
+        stored = set(self.bar_store.dates)
+        missing = [date for date in trade_dates if date not in stored]
+        if not missing:
+            return 0
+        
+        frames = self.api.fetch_concurrent(self.api.get_daily_data_bulk, missing)
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return 0
+        
+        written = self.bar_store.append(pd.concat(frames, ignore_index=True))
+        self.logger.info(f"成功补齐 {written} 个交易日的日线数据")
+        
+        # 同步补齐每日估值，供估值百分位计算
+        stored = set(self.valuation_store.dates)
+        frames = self.api.fetch_concurrent(
+            self.api.get_daily_basic_bulk, [date for date in trade_dates if date not in stored]
+        )
+        frames = [df for df in frames if not df.empty]
+        if frames:
+            self.valuation_store.append(pd.concat(frames, ignore_index=True))
+        
+        return written
+    
+    def update_daily_prices_bulk(self, conn: sqlite3.Connection) -> bool:
+        """按交易日批量更新全市场价格数据"""
+        try:
+            df = self.fetch_latest_daily_bulk()
+            if df.empty:
+                self.logger.warning("获取全市场日线数据失败")
+                return False
+            
+            # 追加到本地行情存储
+            self.bar_store.append(df)
+            trade_date = str(df['trade_date'].iloc[0])
+            try:
+                valuation = self.api.get_daily_basic_bulk(trade_date)
+            except TushareRequestError as e:
+                # 估值只用于估值百分位，获取失败不影响价格更新
+                self.logger.warning(f"获取每日估值失败: {e}")
+                valuation = pd.DataFrame()
+            if not valuation.empty:
+                self.valuation_store.append(valuation)
+            
+            # 按股票代码分发到每只股票
+            rows = list(zip(df['close'].astype(float), df['ts_code'].str[:6]))
+            
+            cursor = conn.cursor()
+            # 只写入价格有变化的股票
+            cursor.executemany('''
+                UPDATE stock_info 
+                SET current_price = ? 
+                WHERE code = ? AND current_price IS NOT ?
+            ''', [(price, code, price) for price, code in rows])
+            updated_count = cursor.rowcount
+            
+            conn.commit()
+            self.logger.info(f"成功更新 {updated_count} 只股票的价格数据")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"批量更新价格数据失败: {e}")
+            conn.rollback()
+            return False
+    
+    def update_financial_data_bulk(self, conn: sqlite3.Connection) -> bool:
+        """按报告期批量更新全市场财务数据"""
+        try:
+            df = self.fetch_latest_fina_bulk()
+            if df.empty:
+                self.logger.warning("获取全市场财务数据失败")
+                return False
+            
+            cursor = conn.cursor()
+            cursor.execute("SELECT code FROM stock_info")
+            codes = {row[0] for row in cursor.fetchall()}
+            
+            # 这里可以存储详细的财务数据
+            # 目前只是记录更新状态
+            updated_count = int(df['ts_code'].str[:6].isin(codes).sum())
+            
+            conn.commit()
+            self.logger.info(f"成功更新 {updated_count} 只股票的财务数据")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"批量更新财务数据失败: {e}")
+            conn.rollback()
+            return False
+    
     def update_all_data(self) -> bool:
         """更新所有数据"""
         try:
             # 连接数据库
-            conn = sqlite3.connect('stock_scoring.db', check_same_thread=False)
+            conn = connect()
             
             self.logger.info("开始更新股票数据...")
             
@@ -352,9 +724,15 @@ class StockDataUpdater:
             if not self.update_financial_data(conn):
                 return False
             
+            # 数据版本号加一，使接口缓存失效
+            bump_data_generation(conn)
+            conn.commit()
+            
             self.logger.info("数据更新完成!")
+            if self.api.cache is not None:
+                self.logger.info(f"缓存统计: {self.api.cache.stats()}")
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"数据更新失败: {e}")
             return False
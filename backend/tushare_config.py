@@ -16,9 +16,42 @@ LOG_LEVEL = "INFO"   # 日志级别：DEBUG, INFO, WARNING, ERROR
 
 # 数据更新配置
 UPDATE_INTERVAL = 86400  # 数据更新间隔（秒），默认24小时
+SCHEDULED_UPDATE = False  # API服务运行期间是否按 UPDATE_INTERVAL 定时增量更新（默认关闭，需要时开启）
 BATCH_SIZE = 100         # 批量处理大小
 SAVE_TO_DATABASE = True  # 是否保存到数据库
 
+# 并发请求配置
+CALLS_PER_MINUTE = 200   # 每分钟最大调用次数，按Tushare积分档位设置
+MAX_WORKERS = 8          # 并发请求线程数
+
+# 批量（按交易日/报告期全市场）获取配置
+BULK_FETCH = True        # 是否按交易日/报告期一次获取全市场数据
+PAGE_SIZE = 5000         # 单次请求返回的最大行数，超过时分页获取
+
+# 本地日线行情存储配置
+BAR_STORE_PATH = "bar_store"     # 存储目录（按字段的内存映射文件）
+VALUATION_STORE_PATH = "valuation_store"  # 每日估值（PE/PB）存储目录
+
+# 本地响应缓存配置
+CACHE_ENABLED = True             # 是否启用本地缓存
+CACHE_PATH = "tushare_cache.db"  # 缓存文件路径
+CACHE_MAX_SIZE_MB = 200          # 缓存容量上限（MB），超出时按LRU淘汰
+CACHE_TTL = {                    # 各接口缓存时间（秒），"report_period"表示按报告期的披露截止日决定
+    "stock_basic": 86400,
+    "daily": 3600,
+    "fina_indicator": "report_period",
+    "fina_indicator_vip": "report_period",
+}
+CACHE_OPEN_PERIOD_TTL = 86400    # 仍在披露中的报告期的缓存时间（秒），披露截止后缓存到下一个报告期
+
+# 接口配置
+VALIDATE_RESPONSES = False  # 是否按响应模型校验接口返回的数据（调试用，会降低列表接口性能）
+
+# 评分记忆表配置（按指标输入指纹复用得分）
+SCORE_MEMO_ENABLED = True          # 是否启用评分记忆表
+SCORE_MEMO_PATH = "score_memo.db"  # 记忆表文件路径
+SCORE_MEMO_RESOLUTION = 0.01       # 数值型指标值的分桶精度
+
 # 数据源配置
 DATA_SOURCES = {
     "stock_basic": True,      # 股票基本信息
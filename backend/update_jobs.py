@@ -0,0 +1,266 @@
+"""
+数据更新任务管理
+同一时间只运行一个更新任务（重复提交返回正在运行的任务），按阶段记录进度并估算剩余时间，
+支持取消，并可按 UPDATE_INTERVAL 定时发起增量更新
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 更新流程的阶段及对应的计数名称
+STAGES = OrderedDict([('fetch', 'fetched'), ('score', 'scored'), ('write', 'written')])
+
+# 保留的历史任务数
+JOB_HISTORY = 20
+
+# 任务结束时的状态
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+
+class UpdateCancelled(Exception):
+    """更新任务已被取消"""
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+class UpdateJob:
+    """
+    一次数据更新任务
+    
+    同时作为进度对象传给 update_database_with_real_data：各阶段开始时调用 begin，
+    处理一批数据后调用 advance；advance 在任务被取消时抛出 UpdateCancelled
+    
+    状态和进度由工作线程修改、由接口线程读取，都在 _lock 下进行
+    """
+    
+    def __init__(self, incremental: bool = False, trigger: str = 'manual'):
+        self.id = uuid.uuid4().hex[:12]
+        self.incremental = incremental
+        self.trigger = trigger
+        self.status = 'pending'
+        self.stage: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stages: Dict[str, Dict] = {
+            stage: {'done': 0, 'total': None, 'started_at': None, 'finished_at': None} for stage in STAGES
+        }
+        
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+    
+    @property
+    def finished(self) -> bool:
+        with self._lock:
+            return self.status in FINISHED_STATUSES
+    
+    def start(self):
+        """任务开始运行"""
+        with self._lock:
+            self.status = 'running'
+            self.started_at = time.time()
+    
+    def finish(self, status: str, error: str = None):
+        """任务结束，记录结果并结束当前阶段"""
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            if self.stage is not None and self.stages[self.stage]['finished_at'] is None:
+                self.stages[self.stage]['finished_at'] = self.finished_at
+    
+    def begin(self, stage: str, total: int = None):
+        """进入新阶段，total 为该阶段要处理的股票数（未知时为None）"""
+        self.check_cancelled()
+        now = time.time()
+        with self._lock:
+            if self.stage is not None:
+                self.stages[self.stage]['finished_at'] = now
+            self.stage = stage
+            self.stages[stage].update(done=0, total=total, started_at=now, finished_at=None)
+    
+    def advance(self, n: int = 1):
+        """当前阶段又处理了 n 只股票"""
+        with self._lock:
+            self.stages[self.stage]['done'] += n
+        self.check_cancelled()
+    
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise UpdateCancelled(f"更新任务 {self.id} 已取消")
+    
+    def cancel(self) -> bool:
+        """请求取消，任务在下一个检查点停止；已结束的任务返回False"""
+        with self._lock:
+            if self.status in FINISHED_STATUSES:
+                return False
+            self._cancel.set()
+        return True
+    
+    def eta_seconds(self) -> Optional[float]:
+        """按当前阶段的处理速度估算该阶段的剩余时间（秒）"""
+        with self._lock:
+            return self._eta_seconds()
+    
+    def _eta_seconds(self) -> Optional[float]:
+        # 调用方持有 _lock
+        if self.stage is None:
+            return None
+        progress = self.stages[self.stage]
+        done, total, started_at = progress['done'], progress['total'], progress['started_at']
+        if not total or not done:
+            return None
+        elapsed = time.time() - started_at
+        return round(elapsed / done * max(0, total - done), 1)
+    
+    def to_dict(self) -> Dict:
+        """任务状态（用于接口返回），在锁内取一致的快照"""
+        with self._lock:
+            status, stage, error = self.status, self.stage, self.error
+            started_at, finished_at = self.started_at, self.finished_at
+            stages = {name: dict(progress) for name, progress in self.stages.items()}
+            eta = None if status in FINISHED_STATUSES else self._eta_seconds()
+        result = {
+            'job_id': self.id,
+            'status': status,
+            'incremental': self.incremental,
+            'trigger': self.trigger,
+            'stage': stage,
+            'created_at': _timestamp(self.created_at),
+            'started_at': _timestamp(started_at),
+            'finished_at': _timestamp(finished_at),
+            'eta_seconds': eta,
+            'error': error,
+            'cancel_requested': self._cancel.is_set(),
+            'stages': {
+                name: {
+                    'done': progress['done'],
+                    'total': progress['total'],
+                    'started_at': _timestamp(progress['started_at']),
+                    'finished_at': _timestamp(progress['finished_at'])
+                }
+                for name, progress in stages.items()
+            }
+        }
+        # 各阶段的计数：fetched / scored / written
+        for stage, counter in STAGES.items():
+            result[counter] = stages[stage]['done']
+        return result
+
+
+class UpdateJobManager:
+    """数据更新任务管理器"""
+    
+    def __init__(self, runner: Callable[[UpdateJob], None], history: int = JOB_HISTORY):
+        """
+        初始化任务管理器
+        
+        Args:
+            runner: 执行一次更新的函数，参数为任务对象（同时作为进度对象）
+            history: 保留的历史任务数
+        """
+        self.runner = runner
+        self.history = history
+        self.interval: Optional[float] = None
+        self.next_run_at: Optional[float] = None
+        
+        self._jobs: "OrderedDict[str, UpdateJob]" = OrderedDict()
+        self._current: Optional[UpdateJob] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+    
+    def submit(self, incremental: bool = False, trigger: str = 'manual') -> Tuple[UpdateJob, bool]:
+        """
+        提交更新任务
+        
+        Returns:
+            (任务, 是否新建)；已有任务在运行时返回该任务，不会重复启动
+        """
+        with self._lock:
+            if self._current is not None and not self._current.finished:
+                return self._current, False
+            
+            job = UpdateJob(incremental, trigger)
+            self._current = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        
+        threading.Thread(target=self._run, args=(job,), name=f"update-{job.id}", daemon=True).start()
+        return job, True
+    
+    def _run(self, job: UpdateJob):
+        job.start()
+        logger.info(f"数据更新任务开始: {job.id}（{job.trigger}，增量={job.incremental}）")
+        status, error = 'failed', None
+        try:
+            self.runner(job)
+            status = 'succeeded'
+        except UpdateCancelled:
+            status = 'cancelled'
+        except Exception as e:
+            error = str(e)
+            logger.error(f"数据更新任务失败: {job.id}: {e}")
+        finally:
+            job.finish(status, error)
+            logger.info(f"数据更新任务结束: {job.id} {status}")
+    
+    def get(self, job_id: str) -> Optional[UpdateJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def current(self) -> Optional[UpdateJob]:
+        """正在运行或最近一次的任务"""
+        with self._lock:
+            return self._current
+    
+    def cancel(self, job_id: str) -> Optional[bool]:
+        """取消任务；任务不存在返回None，已结束返回False"""
+        job = self.get(job_id)
+        return None if job is None else job.cancel()
+    
+    def start_schedule(self, interval: float):
+        """每隔 interval 秒发起一次增量更新（首次在启动 interval 秒之后）"""
+        if self._scheduler is not None:
+            return
+        self.interval = interval
+        self._stop.clear()
+        self._scheduler = threading.Thread(target=self._schedule_loop, name="update-scheduler", daemon=True)
+        self._scheduler.start()
+    
+    def stop_schedule(self):
+        self._stop.set()
+        self._scheduler = None
+        self.next_run_at = None
+    
+    def _schedule_loop(self):
+        # 按固定节拍推进，不受单次更新耗时影响
+        self.next_run_at = time.time() + self.interval
+        while not self._stop.wait(max(0.0, self.next_run_at - time.time())):
+            job, created = self.submit(incremental=True, trigger='schedule')
+            if not created:
+                logger.info(f"定时更新跳过：任务 {job.id} 仍在运行")
+            self.next_run_at += self.interval
+            # 长时间停顿（如休眠）后不补跑错过的节拍
+            while self.next_run_at <= time.time():
+                self.next_run_at += self.interval
+    
+    def status(self) -> Dict:
+        """任务管理器状态"""
+        job = self.current()
+        return {
+            'update_job': job.to_dict() if job is not None else None,
+            'update_interval': self.interval,
+            'next_scheduled_update': _timestamp(self.next_run_at)
+        }
@@ -63,6 +63,28 @@ CREATE TABLE score_result (
     INDEX idx_date (date)
 );
 
+-- 最新评分表（每只股票保留最新一期评分，由数据更新流程维护）
+CREATE TABLE latest_score (
+    stock_code VARCHAR(6) PRIMARY KEY COMMENT '股票代码',
+    stock_name VARCHAR(50) NOT NULL COMMENT '股票名称',
+    industry VARCHAR(100) NOT NULL COMMENT '所属行业',
+    current_price DECIMAL(10,2) COMMENT '评分时股价',
+    total_score DECIMAL(5,2) NOT NULL COMMENT '总分(0-100)',
+    industry_score DECIMAL(5,2) NOT NULL COMMENT '行业维度得分',
+    competitiveness_score DECIMAL(5,2) NOT NULL COMMENT '竞争力维度得分',
+    growth_score DECIMAL(5,2) NOT NULL COMMENT '成长潜力维度得分',
+    timing_score DECIMAL(5,2) NOT NULL COMMENT '时机维度得分',
+    potential_level VARCHAR(20) NOT NULL COMMENT '潜力等级(very_high,high,medium,low)',
+    score_date DATE NOT NULL COMMENT '评分日期',
+    FOREIGN KEY (stock_code) REFERENCES stock_info(code),
+    INDEX idx_total_score_code (total_score, stock_code),
+    INDEX idx_industry (industry),
+    INDEX idx_industry_score (industry_score),
+    INDEX idx_competitiveness_score (competitiveness_score),
+    INDEX idx_growth_score (growth_score),
+    INDEX idx_timing_score (timing_score)
+);
+
 -- 评分明细表
 CREATE TABLE score_details (
     id INT PRIMARY KEY AUTO_INCREMENT,